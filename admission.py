@@ -0,0 +1,297 @@
+"""Admission control for the ADK agent endpoint.
+
+Every POST to the agent path starts a run that fans out into Gemini and MCP
+tool calls. This module bounds how many of those runs execute at once (both
+globally and per ``x-user-id``), queues the rest, and sheds load with
+429/503 + ``Retry-After`` once the queue is too deep. Runs that resume from a
+``confirm_weather_query`` HITL confirmation jump the queue, since the user is
+already waiting on an in-progress conversation.
+"""
+from __future__ import annotations
+
+import asyncio
+import itertools
+import json
+import math
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any
+
+from answer_cache import HITL_TOOL_NAME
+
+PRIORITY_RESUME = 0
+PRIORITY_NORMAL = 1
+
+
+class AdmissionRejected(Exception):
+    """Raised when a run cannot be admitted; carries the HTTP response details."""
+
+    def __init__(self, status_code: int, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    seq: int
+    user_id: str = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+    enqueued_at: float = field(compare=False)
+
+
+class AdmissionController:
+    """Bounded run queue with global and per-user concurrency limits."""
+
+    def __init__(
+        self,
+        max_concurrent_runs: int = 8,
+        max_runs_per_user: int = 2,
+        max_queue_depth: int = 32,
+        max_queued_per_user: int = 4,
+        max_wait_seconds: float = 30.0,
+    ):
+        self.max_concurrent_runs = max_concurrent_runs
+        self.max_runs_per_user = max_runs_per_user
+        self.max_queue_depth = max_queue_depth
+        self.max_queued_per_user = max_queued_per_user
+        self.max_wait_seconds = max_wait_seconds
+
+        self._running: dict[str, int] = {}
+        self._queued: dict[str, int] = {}
+        self._waiters: list[_Waiter] = []
+        self._seq = itertools.count()
+
+        # Metrics
+        self._admitted = 0
+        self._rejected = {429: 0, 503: 0}
+        self._timed_out = 0
+        self._wait_times: deque[float] = deque(maxlen=1000)
+        self._run_times: deque[float] = deque(maxlen=200)
+
+    @classmethod
+    def from_env(cls) -> "AdmissionController":
+        """Build a controller from ``AGENT_*`` environment variables."""
+        return cls(
+            max_concurrent_runs=int(os.getenv("AGENT_MAX_CONCURRENT_RUNS", "8")),
+            max_runs_per_user=int(os.getenv("AGENT_MAX_RUNS_PER_USER", "2")),
+            max_queue_depth=int(os.getenv("AGENT_MAX_QUEUE_DEPTH", "32")),
+            max_queued_per_user=int(os.getenv("AGENT_MAX_QUEUED_PER_USER", "4")),
+            max_wait_seconds=float(os.getenv("AGENT_MAX_QUEUE_WAIT_SECONDS", "30")),
+        )
+
+    @property
+    def running(self) -> int:
+        return sum(self._running.values())
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    def _can_run(self, user_id: str) -> bool:
+        return (
+            self.running < self.max_concurrent_runs
+            and self._running.get(user_id, 0) < self.max_runs_per_user
+        )
+
+    def _start(self, user_id: str) -> None:
+        self._running[user_id] = self._running.get(user_id, 0) + 1
+        self._admitted += 1
+
+    def retry_after(self) -> int:
+        """Estimate seconds until a queued run would get a slot."""
+        avg_run = (
+            sum(self._run_times) / len(self._run_times) if self._run_times else 5.0
+        )
+        backlog = (self.queue_depth + 1) / max(self.max_concurrent_runs, 1)
+        return max(1, math.ceil(avg_run * backlog))
+
+    def _reject(self, status_code: int, reason: str) -> AdmissionRejected:
+        self._rejected[status_code] += 1
+        return AdmissionRejected(status_code, reason, self.retry_after())
+
+    async def acquire(self, user_id: str, priority: int = PRIORITY_NORMAL) -> None:
+        """Wait for a run slot, or raise ``AdmissionRejected`` to shed load."""
+        if not self._waiters and self._can_run(user_id):
+            self._start(user_id)
+            self._wait_times.append(0.0)
+            return
+
+        if self._queued.get(user_id, 0) >= self.max_queued_per_user:
+            raise self._reject(429, f"Too many queued runs for user {user_id}")
+        # HITL resumes finish conversations that are already under way, so they
+        # are never shed for queue depth.
+        if priority != PRIORITY_RESUME and self.queue_depth >= self.max_queue_depth:
+            raise self._reject(503, "Agent run queue is full")
+
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(priority, next(self._seq), user_id, loop.create_future(), time.monotonic())
+        self._waiters.append(waiter)
+        self._waiters.sort()
+        self._queued[user_id] = self._queued.get(user_id, 0) + 1
+        # Waiters ahead of this one may be blocked only by their own per-user
+        # limit, so a global slot can be free for this one right now
+        self._dispatch()
+
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), self.max_wait_seconds)
+        except asyncio.TimeoutError:
+            if waiter.future.done():
+                # Granted a slot right as the timeout fired - keep it.
+                return
+            self._timed_out += 1
+            raise self._reject(503, "Timed out waiting for an agent run slot")
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                self.release(user_id)
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+                self._dequeued(user_id)
+
+    def _dequeued(self, user_id: str) -> None:
+        self._queued[user_id] -= 1
+        if not self._queued[user_id]:
+            del self._queued[user_id]
+
+    def release(self, user_id: str, run_seconds: float | None = None) -> None:
+        """Free a run slot and hand it to the next eligible waiter."""
+        self._running[user_id] -= 1
+        if not self._running[user_id]:
+            del self._running[user_id]
+        if run_seconds is not None:
+            self._run_times.append(run_seconds)
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        for waiter in list(self._waiters):
+            if self.running >= self.max_concurrent_runs:
+                break
+            if waiter.future.done() or not self._can_run(waiter.user_id):
+                continue
+            self._waiters.remove(waiter)
+            self._dequeued(waiter.user_id)
+            self._start(waiter.user_id)
+            self._wait_times.append(time.monotonic() - waiter.enqueued_at)
+            waiter.future.set_result(None)
+
+    def metrics(self) -> dict[str, Any]:
+        waits = sorted(self._wait_times)
+        return {
+            "running": self.running,
+            "queue_depth": self.queue_depth,
+            "queued_resumes": sum(1 for w in self._waiters if w.priority == PRIORITY_RESUME),
+            "admitted_total": self._admitted,
+            "rejected_429_total": self._rejected[429],
+            "rejected_503_total": self._rejected[503],
+            "queue_timeouts_total": self._timed_out,
+            "queue_wait_seconds": {
+                "avg": round(sum(waits) / len(waits), 4) if waits else 0.0,
+                "p95": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 4) if waits else 0.0,
+                "max": round(waits[-1], 4) if waits else 0.0,
+            },
+            "limits": {
+                "max_concurrent_runs": self.max_concurrent_runs,
+                "max_runs_per_user": self.max_runs_per_user,
+                "max_queue_depth": self.max_queue_depth,
+                "max_queued_per_user": self.max_queued_per_user,
+            },
+        }
+
+
+def is_hitl_resume(body: Any) -> bool:
+    """True if the run carries the user's answer to ``confirm_weather_query``.
+
+    Malformed bodies are not resumes; they are admitted as normal runs and
+    rejected by the endpoint's own validation.
+    """
+    messages = body.get("messages") if isinstance(body, dict) else None
+    if not isinstance(messages, list) or not messages:
+        return False
+    last = messages[-1]
+    if not isinstance(last, dict) or last.get("role") != "tool":
+        return False
+    tool_call_id = last.get("toolCallId") or last.get("tool_call_id")
+    for message in reversed(messages[:-1]):
+        if not isinstance(message, dict):
+            continue
+        calls = message.get("toolCalls") or message.get("tool_calls")
+        for call in calls if isinstance(calls, list) else []:
+            if isinstance(call, dict) and call.get("id") == tool_call_id:
+                function = call.get("function")
+                return isinstance(function, dict) and function.get("name") == HITL_TOOL_NAME
+    # The originating assistant message isn't always echoed back; a trailing
+    # tool result still means the run is a resume.
+    return True
+
+
+class AdmissionMiddleware:
+    """ASGI middleware applying an ``AdmissionController`` to the agent route.
+
+    The slot is held for the whole streaming response, so the limit covers
+    the full Gemini + MCP run rather than just the request handshake.
+    """
+
+    def __init__(self, app, controller: AdmissionController, path: str = "/"):
+        self.app = app
+        self.controller = controller
+        self.path = path
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] != self.path:
+            await self.app(scope, receive, send)
+            return
+
+        # Buffer the body so we can look for a HITL resume, then replay it.
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        body_bytes = b"".join(chunks)
+        try:
+            body = json.loads(body_bytes or b"{}")
+        except ValueError:
+            body = {}
+
+        headers = dict(scope["headers"])
+        user_id = headers.get(b"x-user-id", b"default_user").decode("latin-1")
+        priority = PRIORITY_RESUME if is_hitl_resume(body) else PRIORITY_NORMAL
+
+        try:
+            await self.controller.acquire(user_id, priority)
+        except AdmissionRejected as rejected:
+            payload = json.dumps({"error": rejected.reason, "retryAfter": rejected.retry_after}).encode()
+            await send({
+                "type": "http.response.start",
+                "status": rejected.status_code,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"retry-after", str(rejected.retry_after).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": payload})
+            return
+
+        replayed = False
+
+        async def replay_receive():
+            nonlocal replayed
+            if not replayed:
+                replayed = True
+                return {"type": "http.request", "body": body_bytes, "more_body": False}
+            return await receive()
+
+        started = time.monotonic()
+        try:
+            await self.app(scope, replay_receive, send)
+        finally:
+            self.controller.release(user_id, time.monotonic() - started)
@@ -0,0 +1,326 @@
+"""Delta delivery of weather alerts per conversation.
+
+``get_alerts`` returns every active alert in a state with full text. In a
+long-lived conversation, asking again re-sends the same alerts to both the
+model and the UI. ``AlertsFeed`` instead:
+
+- keeps one snapshot of active alerts per state, shared by all sessions and
+  refreshed by a single background poll while anyone is subscribed;
+- remembers which alerts each thread has already been shown;
+- answers ``get_alerts`` with only the new and updated alerts in full, plus
+  short references to unchanged and expired ones;
+- mirrors the delivered set into the agent state under ``alerts`` (state code
+  -> alert id -> alert) with JSON Patch ``STATE_DELTA`` events. Changes picked
+  up by the poll between runs are sent at the start of the thread's next run.
+
+The agent's ``get_alerts`` MCP call is answered by ``AlertsFeedPlugin``; the
+fast path asks the feed directly.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional
+
+from ag_ui.core import (
+    BaseEvent,
+    EventType,
+    RunAgentInput,
+    StateDeltaEvent,
+    StateSnapshotEvent,
+    ToolCallResultEvent,
+    ToolCallStartEvent,
+)
+from google.adk.plugins.base_plugin import BasePlugin
+from google.adk.tools.base_tool import BaseTool
+from google.adk.tools.tool_context import ToolContext
+
+from answer_cache import ALERTS_TOOL_NAME, tool_payload
+
+logger = logging.getLogger(__name__)
+
+ALERTS_STATE_KEY = "alerts"
+
+
+def _pointer(*tokens: str) -> str:
+    """JSON Pointer (RFC 6901) for ``/alerts/<tokens>``."""
+    escaped = (t.replace("~", "~0").replace("/", "~1") for t in (ALERTS_STATE_KEY, *tokens))
+    return "/" + "/".join(escaped)
+
+
+def _alert_id(alert: dict[str, Any]) -> str:
+    return alert.get("id") or f"{alert.get('event')}|{alert.get('area')}|{alert.get('sent')}"
+
+
+def _brief(alert: dict[str, Any]) -> dict[str, Any]:
+    return {key: alert.get(key) for key in ("id", "event", "severity", "area")}
+
+
+def mcp_result(payload: dict[str, Any]) -> dict[str, Any]:
+    """Wrap ``payload`` the way the weather MCP server's tool results look."""
+    text = json.dumps(payload)
+    return {"content": [{"type": "text", "text": text}], "structuredContent": {"result": text}, "isError": False}
+
+
+def diff_alerts(
+    delivered: dict[str, dict[str, Any]], current: list[dict[str, Any]]
+) -> tuple[list[dict], list[dict], list[dict], list[dict]]:
+    """Split ``current`` against what a thread was shown: new, updated, unchanged, expired.
+
+    NWS issues updates as new alerts that reference the ones they replace,
+    so an alert referencing a delivered id counts as an update of it.
+    """
+    new, updated, unchanged = [], [], []
+    replaced: set[str] = set()
+    current_ids = set()
+    for alert in current:
+        alert_id = _alert_id(alert)
+        current_ids.add(alert_id)
+        previous = delivered.get(alert_id)
+        if previous is not None:
+            (unchanged if previous == alert else updated).append(alert)
+            continue
+        refs = [ref for ref in alert.get("replaces") or () if ref in delivered]
+        if refs:
+            replaced.update(refs)
+            updated.append(alert)
+        else:
+            new.append(alert)
+    expired = [a for i, a in delivered.items() if i not in current_ids and i not in replaced]
+    return new, updated, unchanged, expired
+
+
+class AlertsFeed:
+    """Shared per-state alert snapshots and per-thread delivery tracking."""
+
+    def __init__(
+        self,
+        fetch: Callable[[str], Awaitable[Optional[list[dict[str, Any]]]]],
+        poll_seconds: float = 60.0,
+        idle_seconds: float = 1800.0,
+        max_threads: int = 10000,
+    ):
+        self.fetch = fetch
+        self.poll_seconds = poll_seconds
+        self.idle_seconds = idle_seconds
+        self.max_threads = max_threads
+
+        # state code -> (fetched at, active alerts)
+        self._snapshots: dict[str, tuple[float, list[dict[str, Any]]]] = {}
+        self._fetching: dict[str, asyncio.Future] = {}
+        # thread id -> state code -> alert id -> alert as last delivered
+        self._delivered: OrderedDict[str, dict[str, dict[str, dict[str, Any]]]] = OrderedDict()
+        self._last_seen: dict[str, float] = {}
+        # thread id -> patch ops not yet sent to the client
+        self._outbox: dict[str, list[dict[str, Any]]] = {}
+        self._poll_task: asyncio.Task | None = None
+
+        # Metrics
+        self._upstream_fetches = 0
+        self._deliveries = 0
+        self._full_bytes = 0
+        self._sent_bytes = 0
+        self._patch_ops = 0
+
+    @classmethod
+    def from_tool_client(cls, tool_client, **kwargs) -> "AlertsFeed":
+        """Feed that polls the weather MCP server's ``get_alerts`` tool."""
+
+        async def fetch(state: str) -> Optional[list[dict[str, Any]]]:
+            try:
+                payload = tool_payload(await tool_client.call_tool(ALERTS_TOOL_NAME, {"state": state}))
+            except Exception:
+                logger.exception("Alerts poll for %s failed", state)
+                return None
+            if not isinstance(payload, dict) or "error" in payload:
+                return None
+            return payload.get("alerts") or []
+
+        return cls(fetch, **kwargs)
+
+    # ----- upstream ---------------------------------------------------------
+
+    async def current(self, state: str) -> Optional[list[dict[str, Any]]]:
+        """Active alerts for ``state``, fetching once for all callers when stale."""
+        snapshot = self._snapshots.get(state)
+        if snapshot is not None and time.monotonic() - snapshot[0] < self.poll_seconds:
+            return snapshot[1]
+        future = self._fetching.get(state)
+        if future is None:
+            future = asyncio.ensure_future(self._refresh(state))
+            self._fetching[state] = future
+            future.add_done_callback(lambda _: self._fetching.pop(state, None))
+        alerts = await asyncio.shield(future)
+        if alerts is None and snapshot is not None:
+            return snapshot[1]  # keep serving the last good snapshot
+        return alerts
+
+    async def _refresh(self, state: str) -> Optional[list[dict[str, Any]]]:
+        self._upstream_fetches += 1
+        alerts = await self.fetch(state)
+        if alerts is not None:
+            self._snapshots[state] = (time.monotonic(), alerts)
+        return alerts
+
+    def _subscribed_states(self) -> set[str]:
+        cutoff = time.monotonic() - self.idle_seconds
+        return {
+            state
+            for thread_id, states in self._delivered.items()
+            if self._last_seen.get(thread_id, 0) >= cutoff
+            for state in states
+        }
+
+    async def _poll_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            states = self._subscribed_states()
+            for state in list(self._snapshots):
+                if state not in states:
+                    del self._snapshots[state]
+            await asyncio.gather(*(self._refresh(state) for state in states), return_exceptions=True)
+
+    def _ensure_polling(self) -> None:
+        if self._poll_task is None or self._poll_task.done():
+            self._poll_task = asyncio.get_running_loop().create_task(self._poll_loop())
+
+    # ----- delivery ---------------------------------------------------------
+
+    def _touch(self, thread_id: str) -> dict[str, dict[str, dict[str, Any]]]:
+        threads = self._delivered
+        if thread_id not in threads:
+            threads[thread_id] = {}
+        threads.move_to_end(thread_id)
+        self._last_seen[thread_id] = time.monotonic()
+        while len(threads) > self.max_threads:
+            stale, _ = threads.popitem(last=False)
+            self._last_seen.pop(stale, None)
+            self._outbox.pop(stale, None)
+        return threads[thread_id]
+
+    def _deliver(self, thread_id: str, state: str, alerts: list[dict[str, Any]]):
+        """Record ``alerts`` as shown to the thread; return the diff and patch ops."""
+        states = self._touch(thread_id)
+        first_for_thread = not states
+        delivered = states.get(state)
+        new, updated, unchanged, expired = diff_alerts(delivered or {}, alerts)
+        view = {_alert_id(a): a for a in alerts}
+
+        if delivered is None:
+            ops = [{"op": "add", "path": _pointer(state), "value": view}]
+            if first_for_thread:
+                ops = [{"op": "add", "path": _pointer(), "value": {state: view}}]
+        else:
+            current_ids = set(view)
+            ops = [{"op": "remove", "path": _pointer(state, i)} for i in delivered if i not in current_ids]
+            ops += [{"op": "add", "path": _pointer(state, _alert_id(a)), "value": a} for a in new + updated]
+        states[state] = view
+        if ops:
+            self._outbox.setdefault(thread_id, []).extend(ops)
+            self._patch_ops += len(ops)
+        return new, updated, unchanged, expired
+
+    async def tool_result(self, thread_id: str, state: str) -> Optional[dict[str, Any]]:
+        """``get_alerts`` payload for the thread: full text only for what changed."""
+        state = (state or "").strip().upper()
+        alerts = await self.current(state)
+        if alerts is None:
+            return None
+        self._ensure_polling()
+        new, updated, unchanged, expired = self._deliver(thread_id, state, alerts)
+
+        payload: dict[str, Any] = {"state": state, "count": len(alerts)}
+        if not alerts:
+            payload["message"] = "No active alerts for this state."
+        if new:
+            payload["new"] = new
+        if updated:
+            payload["updated"] = updated
+        if unchanged:
+            payload["unchanged"] = [_brief(a) for a in unchanged]
+            payload["note"] = "Unchanged alerts were already shown to the user."
+        if expired:
+            payload["expired"] = [_brief(a) for a in expired]
+
+        self._deliveries += 1
+        self._full_bytes += len(json.dumps({"alerts": alerts, "count": len(alerts)}))
+        self._sent_bytes += len(json.dumps(payload))
+        return payload
+
+    def _pending_changes(self, thread_id: str) -> None:
+        """Queue ops for changes the poll found since the thread's last delivery."""
+        states = self._delivered.get(thread_id)
+        if not states:
+            return
+        for state in list(states):
+            snapshot = self._snapshots.get(state)
+            if snapshot is not None:
+                self._deliver(thread_id, state, snapshot[1])
+
+    def _flush(self, thread_id: str) -> Optional[StateDeltaEvent]:
+        ops = self._outbox.pop(thread_id, None)
+        if not ops:
+            return None
+        return StateDeltaEvent(type=EventType.STATE_DELTA, delta=ops)
+
+    def _view(self, thread_id: str) -> dict[str, dict[str, dict[str, Any]]]:
+        return {state: dict(view) for state, view in self._delivered.get(thread_id, {}).items()}
+
+    async def stream(self, input: RunAgentInput, events: AsyncIterator[BaseEvent]) -> AsyncIterator[BaseEvent]:
+        """Pass a run's events through, adding the thread's alert state deltas.
+
+        Deltas go out right after ``RUN_STARTED`` (changes since the last
+        run) and after each ``get_alerts`` result. The end-of-run state
+        snapshot from ag_ui_adk is built from the state the client sent, so
+        its ``alerts`` entry is replaced with what the thread was shown.
+        """
+        thread_id = input.thread_id
+        alert_calls: set[str] = set()
+        async for event in events:
+            if event.type == EventType.STATE_SNAPSHOT and thread_id in self._delivered:
+                snapshot = dict(event.snapshot or {})
+                snapshot[ALERTS_STATE_KEY] = self._view(thread_id)
+                event = StateSnapshotEvent(type=EventType.STATE_SNAPSHOT, snapshot=snapshot)
+                self._outbox.pop(thread_id, None)
+            yield event
+            if isinstance(event, ToolCallStartEvent) and event.tool_call_name == ALERTS_TOOL_NAME:
+                alert_calls.add(event.tool_call_id)
+                continue
+            if event.type == EventType.RUN_STARTED:
+                self._pending_changes(thread_id)
+            elif not (isinstance(event, ToolCallResultEvent) and event.tool_call_id in alert_calls):
+                continue
+            delta = self._flush(thread_id)
+            if delta is not None:
+                yield delta
+
+    def metrics(self) -> dict[str, Any]:
+        return {
+            "threads": len(self._delivered),
+            "states_polled": len(self._snapshots),
+            "upstream_fetches_total": self._upstream_fetches,
+            "deliveries_total": self._deliveries,
+            "patch_ops_total": self._patch_ops,
+            "full_payload_bytes_total": self._full_bytes,
+            "sent_payload_bytes_total": self._sent_bytes,
+        }
+
+
+class AlertsFeedPlugin(BasePlugin):
+    """Answers the agent's ``get_alerts`` calls from an ``AlertsFeed``."""
+
+    def __init__(self, feed: AlertsFeed):
+        super().__init__(name="alerts_feed")
+        self.feed = feed
+
+    async def before_tool_callback(
+        self, *, tool: BaseTool, tool_args: dict[str, Any], tool_context: ToolContext
+    ) -> Optional[dict]:
+        if tool.name != ALERTS_TOOL_NAME:
+            return None
+        payload = await self.feed.tool_result(tool_context.session.id, tool_args.get("state", ""))
+        # None lets the MCP tool run as usual
+        return mcp_result(payload) if payload is not None else None
@@ -0,0 +1,291 @@
+"""Answer cache for confirmed weather questions.
+
+Most traffic is "what's the weather in <big city>": after the
+``confirm_weather_query`` step, every such run makes the same MCP calls and
+Gemini writes an equivalent summary. This cache keys a finished run on the
+normalized intent the user confirmed -- resolved location, selected actions
+and the forecast validity window -- and replays its tool-call and text events
+(with fresh ids) to later runs that ask for the same thing.
+
+Caching is opt-in per request (``x-answer-cache: 1`` header or
+``forwardedProps.answerCache``). Answers that include weather alerts are never
+cached: ``get_alerts`` results are per-thread deltas from ``alerts_feed``
+(only what that thread has not seen yet), so replaying one to another thread
+would show it the wrong alerts. Entries expire at the end of the forecast
+period they describe and are dropped as soon as a live ``get_forecast`` call
+reports a newer NWS ``updated`` timestamp for the same location.
+"""
+from __future__ import annotations
+
+import json
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, AsyncIterator, Awaitable, Callable
+
+from ag_ui.core import (
+    BaseEvent,
+    EventType,
+    RunAgentInput,
+    RunFinishedEvent,
+    RunStartedEvent,
+    ToolMessage,
+)
+
+HITL_TOOL_NAME = "confirm_weather_query"
+ALERTS_TOOL_NAME = "get_alerts"
+
+# Events that make up the visible answer; everything else (run lifecycle,
+# state and message snapshots) is regenerated or belongs to the live session.
+REPLAYED_EVENT_TYPES = {
+    EventType.TEXT_MESSAGE_START,
+    EventType.TEXT_MESSAGE_CONTENT,
+    EventType.TEXT_MESSAGE_END,
+    EventType.TEXT_MESSAGE_CHUNK,
+    EventType.TOOL_CALL_START,
+    EventType.TOOL_CALL_ARGS,
+    EventType.TOOL_CALL_END,
+    EventType.TOOL_CALL_CHUNK,
+    EventType.TOOL_CALL_RESULT,
+}
+
+# AG-UI event fields holding message and tool call ids
+EVENT_ID_FIELDS = ("message_id", "tool_call_id", "parent_message_id")
+
+
+def tool_payload(content: Any) -> dict[str, Any] | None:
+    """Decode the JSON an MCP tool returned from a ``TOOL_CALL_RESULT`` content.
+
+    ADK wraps MCP results as ``{"content": [{"type": "text", "text": ...}]}``
+    (sometimes itself JSON-encoded), and the tools in ``weather.py`` return a
+    JSON string inside that text part.
+    """
+    if isinstance(content, str):
+        try:
+            content = json.loads(content)
+        except ValueError:
+            return None
+    if isinstance(content, dict) and isinstance(content.get("content"), list):
+        for part in content["content"]:
+            if isinstance(part, dict) and part.get("type") == "text":
+                return tool_payload(part.get("text"))
+        return None
+    if isinstance(content, dict) and "result" in content and len(content) == 1:
+        return tool_payload(content["result"])
+    return content if isinstance(content, dict) else None
+
+
+def _parse_time(value: Any) -> float | None:
+    if not isinstance(value, str):
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+def _location_key(latitude: float, longitude: float) -> tuple[float, float]:
+    # ~1 km - well inside a 2.5 km NWS grid cell.
+    return (round(float(latitude), 2), round(float(longitude), 2))
+
+
+@dataclass
+class CachedAnswer:
+    events: list[BaseEvent]
+    location: tuple[float, float]
+    forecast_updated: str | None
+    expires_at: float
+    hits: int = 0
+
+
+class AnswerCache:
+    """LRU cache of replayable answers keyed by confirmed intent."""
+
+    def __init__(self, max_entries: int = 512, window_seconds: int = 3600):
+        self.max_entries = max_entries
+        self.window_seconds = window_seconds
+        self._entries: OrderedDict[tuple, CachedAnswer] = OrderedDict()
+        self._forecast_updated: dict[tuple[float, float], str] = {}
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+
+    @staticmethod
+    def confirmation(input: RunAgentInput) -> dict[str, Any] | None:
+        """Return the accepted ``confirm_weather_query`` answer this run resumes."""
+        if not input.messages or not isinstance(input.messages[-1], ToolMessage):
+            return None
+        try:
+            answer = json.loads(input.messages[-1].content)
+        except (TypeError, ValueError):
+            return None
+        if not isinstance(answer, dict) or not answer.get("accepted"):
+            return None
+        if answer.get("latitude") is None or answer.get("longitude") is None:
+            return None
+        return answer
+
+    @staticmethod
+    def cacheable(answer: dict[str, Any]) -> bool:
+        """Whether the confirmed actions can be answered from the cache (not alerts)."""
+        return "alerts" not in (answer.get("selected_actions") or [])
+
+    def key(self, answer: dict[str, Any], now: float | None = None) -> tuple:
+        """Normalized intent: location, selected actions, validity window."""
+        now = time.time() if now is None else now
+        actions = tuple(sorted(set(answer.get("selected_actions") or [])))
+        return (
+            _location_key(answer["latitude"], answer["longitude"]),
+            actions,
+            int(now // self.window_seconds),
+        )
+
+    def get(self, key: tuple, now: float | None = None) -> CachedAnswer | None:
+        now = time.time() if now is None else now
+        entry = self._entries.get(key)
+        if entry is None or entry.expires_at <= now:
+            if entry is not None:
+                del self._entries[key]
+            self._misses += 1
+            return None
+        self._entries.move_to_end(key)
+        entry.hits += 1
+        self._hits += 1
+        return entry
+
+    def put(self, key: tuple, events: list[BaseEvent], now: float | None = None) -> None:
+        """Store a finished run's events, deriving its lifetime from the forecast.
+
+        Runs that called ``get_alerts`` are not stored; see the module docstring.
+        """
+        now = time.time() if now is None else now
+        location = key[0]
+        expires_at = now + self.window_seconds
+        forecast_updated = None
+        for event in events:
+            if event.type == EventType.TOOL_CALL_START and event.tool_call_name == ALERTS_TOOL_NAME:
+                return
+            if event.type != EventType.TOOL_CALL_RESULT:
+                continue
+            payload = tool_payload(event.content) or {}
+            if "periods" in payload:
+                forecast_updated = payload.get("updated")
+                valid_until = _parse_time(payload.get("validUntil"))
+                if valid_until:
+                    expires_at = min(expires_at, valid_until)
+        if expires_at <= now:
+            return
+        self._entries[key] = CachedAnswer(events, location, forecast_updated, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def observe_forecast(self, payload: dict[str, Any], latitude: float, longitude: float) -> None:
+        """Invalidate cached answers when a live forecast has been refreshed upstream."""
+        updated = payload.get("updated")
+        if not updated:
+            return
+        location = _location_key(latitude, longitude)
+        previous = self._forecast_updated.get(location)
+        self._forecast_updated[location] = updated
+        if previous is not None and previous != updated:
+            self.invalidate_location(*location)
+
+    def invalidate_location(self, latitude: float, longitude: float) -> int:
+        location = _location_key(latitude, longitude)
+        stale = [k for k, entry in self._entries.items() if entry.location == location]
+        for k in stale:
+            del self._entries[k]
+        self._invalidations += len(stale)
+        return len(stale)
+
+    def metrics(self) -> dict[str, Any]:
+        lookups = self._hits + self._misses
+        return {
+            "entries": len(self._entries),
+            "hits_total": self._hits,
+            "misses_total": self._misses,
+            "hit_ratio": round(self._hits / lookups, 4) if lookups else 0.0,
+            "invalidations_total": self._invalidations,
+        }
+
+
+def answer_cache_requested(input: RunAgentInput) -> bool:
+    """Opt-in check: ``x-answer-cache`` header (extracted into state) or forwarded prop."""
+    state = input.state if isinstance(input.state, dict) else {}
+    headers = state.get("headers") if isinstance(state.get("headers"), dict) else {}
+    if str(headers.get("answer_cache", "")).lower() in ("1", "true", "yes"):
+        return True
+    props = input.forwarded_props if isinstance(input.forwarded_props, dict) else {}
+    return bool(props.get("answerCache"))
+
+
+def _replay(entry: CachedAnswer, input: RunAgentInput) -> list[BaseEvent]:
+    """Re-issue cached events under the current run with fresh message/tool ids."""
+    id_map: dict[str, str] = {}
+    events: list[BaseEvent] = [
+        RunStartedEvent(type=EventType.RUN_STARTED, thread_id=input.thread_id, run_id=input.run_id)
+    ]
+    for event in entry.events:
+        update = {}
+        for name in EVENT_ID_FIELDS:
+            old = getattr(event, name, None)
+            if old:
+                update[name] = id_map.setdefault(old, str(uuid.uuid4()))
+        events.append(event.model_copy(update=update))
+    events.append(
+        RunFinishedEvent(type=EventType.RUN_FINISHED, thread_id=input.thread_id, run_id=input.run_id)
+    )
+    return events
+
+
+async def cached_run(
+    cache: AnswerCache,
+    run: Callable[[RunAgentInput], AsyncIterator[BaseEvent]],
+    input: RunAgentInput,
+    record: Callable[[RunAgentInput, list[BaseEvent]], Awaitable[None]] | None = None,
+) -> AsyncIterator[BaseEvent]:
+    """Serve ``input`` from ``cache`` when possible, otherwise run and record it.
+
+    Every live run is watched for ``get_forecast`` results so refreshed NWS
+    forecasts invalidate cached answers even when the caller did not opt in.
+    A hit never reaches the ADK runner, so the confirmation it answers is
+    still pending in the ADK session; ``record(input, events)`` (see
+    ``session_sync.record_turn``) writes the replayed turn into the session
+    before it is sent, otherwise the next run would submit the confirmation
+    again and re-run its tools.
+    """
+    answer = cache.confirmation(input)
+    opted_in = answer is not None and answer_cache_requested(input) and cache.cacheable(answer)
+    key = cache.key(answer) if opted_in else None
+
+    if key is not None:
+        entry = cache.get(key)
+        if entry is not None:
+            events = _replay(entry, input)
+            if record is not None:
+                await record(input, events)
+            for event in events:
+                yield event
+            return
+
+    recorded: list[BaseEvent] = []
+    failed = False
+    async for event in run(input):
+        if event.type == EventType.RUN_ERROR:
+            failed = True
+        elif event.type == EventType.TOOL_CALL_RESULT and answer is not None:
+            payload = tool_payload(event.content)
+            if payload and "periods" in payload:
+                cache.observe_forecast(payload, answer["latitude"], answer["longitude"])
+        if key is not None and event.type in REPLAYED_EVENT_TYPES:
+            recorded.append(event)
+        yield event
+
+    has_text = any(
+        e.type in (EventType.TEXT_MESSAGE_CONTENT, EventType.TEXT_MESSAGE_CHUNK) for e in recorded
+    )
+    if key is not None and not failed and has_text:
+        cache.put(key, recorded)
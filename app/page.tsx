@@ -64,9 +64,38 @@ const Chat = () => {
     ],
     render: ({ args, result, status }) => {
       if (status !== "complete" || !result) {
+        // Partial results streamed by the backend as agent state deltas
+        const progress = (agent?.state as any)?.forecast_progress;
+        const partial =
+          progress &&
+          progress.latitude === args.latitude &&
+          progress.longitude === args.longitude
+            ? progress
+            : null;
+
+        if (partial && partial.conditions !== undefined) {
+          return (
+            <WeatherCard
+              location={partial.location}
+              temperature={partial.temperature}
+              temperature_f={partial.temperature_f}
+              conditions={partial.conditions}
+              windSpeed={partial.windSpeed}
+              windSpeedText={partial.windSpeedText}
+              windDirection={partial.windDirection}
+              feelsLike={partial.feelsLike}
+              humidity={partial.humidity || 0}
+              themeColor={getThemeColor(partial.conditions || "clear")}
+              status="executing"
+            />
+          );
+        }
+
         return (
           <div className="bg-[#667eea] text-white p-4 rounded-lg max-w-md">
-            <span className="animate-spin">⚙️ Retrieving weather forecast...</span>
+            <span className="animate-spin">
+              ⚙️ Retrieving weather forecast{partial?.location ? ` for ${partial.location}` : ""}...
+            </span>
           </div>
         );
       }
@@ -107,8 +136,13 @@ const Chat = () => {
         );
       }
 
-      const alerts = result.alerts || [];
-      const count = result.count || 0;
+      // The backend sends each thread's alerts as state deltas; the tool result
+      // only carries full text for alerts that are new to this conversation
+      const delivered = (agent?.state as any)?.alerts?.[result.state || args.state];
+      const alerts: Alert[] = delivered
+        ? Object.values(delivered)
+        : result.alerts || [...(result.new || []), ...(result.updated || [])];
+      const count = delivered ? alerts.length : result.count || 0;
 
       return (
         <AlertsCard
@@ -374,6 +408,7 @@ function getThemeColor(conditions: string): string {
 }
 
 interface Alert {
+  id?: string;
   event: string;
   area: string;
   severity: string;
@@ -381,6 +416,10 @@ interface Alert {
   instructions: string;
 }
 
+function degrees(value: number | null | undefined, unit: string, space = " ") {
+  return value === null || value === undefined ? "n/a" : `${value}°${space}${unit}`;
+}
+
 function WeatherCard({
   location,
   temperature,
@@ -395,13 +434,14 @@ function WeatherCard({
   status,
 }: {
   location?: string;
-  temperature: number;
-  temperature_f: number;
+  // Missing when NWS has no temperature for the period
+  temperature?: number | null;
+  temperature_f?: number | null;
   conditions: string;
   windSpeed: number;
   windSpeedText?: string;
   windDirection?: string;
-  feelsLike: number;
+  feelsLike?: number | null;
   humidity: number;
   themeColor: string;
   status: "inProgress" | "executing" | "complete";
@@ -424,10 +464,10 @@ function WeatherCard({
         </div>
         <div className="mt-4 flex items-end justify-between">
           <div className="text-3xl font-bold text-white">
-            <span className="">{temperature}° C</span>
+            <span className="">{degrees(temperature, "C")}</span>
             <span className="text-sm text-white/50">
               {" / "}
-              {temperature_f}° F
+              {degrees(temperature_f, "F")}
         </span>
           </div>
           <div className="text-sm text-white capitalize">{conditions}</div>
@@ -446,7 +486,7 @@ function WeatherCard({
             </div>
             <div data-testid="weather-feels-like">
               <p className="text-white text-xs">Feels Like</p>
-              <p className="text-white font-medium">{feelsLike}°C</p>
+              <p className="text-white font-medium">{degrees(feelsLike, "C", "")}</p>
           </div>
           </div>
         </div>
@@ -1,14 +1,29 @@
 """Weather Assistant with MCP Tools and HITL."""
 from __future__ import annotations
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from ag_ui.core import Tool
 from ag_ui_adk import ADKAgent, add_adk_fastapi_endpoint
 from google.adk.agents import Agent
-from google.adk.tools.mcp_tool import McpToolset, StdioConnectionParams
-from mcp import StdioServerParameters
+from google.adk.agents.context_cache_config import ContextCacheConfig
+from google.adk.apps import App
+from google.adk.runners import Runner
+import asyncio
 import os
 from dotenv import load_dotenv
 import json
+from typing import Any
+
+from admission import AdmissionController, AdmissionMiddleware
+from alerts_feed import AlertsFeed, AlertsFeedPlugin
+from answer_cache import HITL_TOOL_NAME, AnswerCache, cached_run
+from fast_path import FastPathRouter, McpToolClient
+from mcp_launch import weather_server_params
+from mcp_pool import McpServerPool, PooledMcpToolset
+from prompt_stats import PromptStatsPlugin
+from session_budget import BoundedSessionService, DiscardingMemoryService
+from session_sync import record_turn
 
 # Load environment variables from .env.local file
 load_dotenv(".env.local")
@@ -21,28 +36,22 @@ if not gemini_api_key:
 # Set it as GOOGLE_API_KEY which is what the Google SDK expects
 os.environ["GOOGLE_API_KEY"] = gemini_api_key
 
-# Get the absolute path to the weather directory
-weather_dir = os.path.join(os.path.dirname(__file__), "weather")
-weather_script = os.path.join(weather_dir, "weather.py")
-
-# Setup MCP weather toolset
-weather_toolset = McpToolset(
-    connection_params=StdioConnectionParams(
-        server_params=StdioServerParameters(
-            command="uv",
-            args=["run", "python", weather_script],
-            env={"UV_NO_CACHE": "1"}
-        )
-    )
-)
+# Active + warm standby weather MCP server processes (spawned over stdio);
+# failover and SIGHUP reloads keep tool calls succeeding while a server is
+# replaced. Servers start on the first call, after the startup preflight.
+mcp_pool = McpServerPool.from_env(weather_server_params())
+
+# Setup MCP weather toolset (agent tool calls go through the pool)
+weather_toolset = PooledMcpToolset(mcp_pool)
 
-# Human-in-the-loop confirmation tool schema (for agent instructions reference)
-# NOTE: This must be defined BEFORE the agent so it can be referenced in the f-string
-# NOTE: This is NOT added to the agent's tools - it's intercepted by the frontend
+# Human-in-the-loop confirmation tool schema
+# NOTE: This is NOT added to the agent's tools - it's a client-side tool rendered
+# by the frontend. WeatherADKAgent declares it on every run (see with_confirm_tool)
+# so the model sees the full function schema instead of a copy in the prompt.
 CONFIRM_WEATHER_TOOL = {
     "type": "function",
     "function": {
-        "name": "confirm_weather_query",
+        "name": HITL_TOOL_NAME,
         "description": "Request human confirmation before fetching weather data with selected options",
         "parameters": {
             "type": "object",
@@ -97,116 +106,178 @@ CONFIRM_WEATHER_TOOL = {
     }
 }
 
+# Smallest prompt Gemini accepts for an explicit context cache, by model
+# family. ADK tries to create a cache for any prompt above min_tokens, and a
+# smaller one costs a failed API call per turn.
+CONTEXT_CACHE_MIN_TOKENS = {"gemini-2.5-flash": 1024, "gemini-2.5-pro": 4096, "gemini-2.0-flash": 4096}
+
+
+def context_cache_min_tokens(model: str) -> int:
+    """Explicit-cache minimum for ``model`` (4096 when unknown)."""
+    for prefix, tokens in CONTEXT_CACHE_MIN_TOKENS.items():
+        if model.startswith(prefix):
+            return tokens
+    return 4096
+
+
 # Create the weather agent with clear instructions
 weather_agent = Agent(
     model='gemini-2.0-flash',
     name='default',
-    instruction=f"""
+    instruction="""
 You are a helpful weather assistant with MCP tools and human-in-the-loop approval.
 
-**Available MCP Tools:**
-1. geocode_location(location: str) - Converts location names to coordinates
-   Returns: {{"latitude": float, "longitude": float, "display_name": str}}
-
-2. get_forecast(latitude: float, longitude: float) - Gets detailed weather forecast
-   Returns: {{
-     "temperature": float (Celsius),
-     "temperature_f": float (Fahrenheit),
-     "conditions": "clear" | "rain" | "cloudy" | "snow" | "storm",
-     "windSpeed": int,
-     "windSpeedText": str,
-     "location": str,
-     "periods": [array of forecast periods]
-   }}
-
-3. get_alerts(state: str) - Gets weather alerts for a US state (2-letter code like "CA", "NY")
-   Returns: {{"alerts": [array of alert objects], "count": int}}
-
-**Workflow for weather requests:**
-
-1. When user asks about weather for a location:
-   a. Call geocode_location(location) to get coordinates
-   b. Parse the display_name to extract state code (last 2 letters if US location)
-   c. Call confirm_weather_query with the location info and both options enabled
-   d. The user will see a UI with checkboxes to select which information they want
-   e. After user confirms, you'll receive their selected actions
-   f. Based on the user's selection:
-      - If "forecast" selected: call get_forecast(lat, lon) and describe the weather
-      - If "alerts" selected: call get_alerts(state_code) and summarize alerts
-      - If both selected: call both tools and present both results
-   g. Present results naturally in your response
-
-2. When presenting forecast results, mention:
-   - Temperature in both Celsius and Fahrenheit
-   - Weather conditions
-   - Wind speed and direction
-   - Location name
-
-3. When presenting alerts, summarize:
-   - Number of active alerts
-   - Most severe alerts first
-   - Brief description of each
-
-**Example conversation:**
-User: "What's the weather in San Francisco?"
-
-Step 1: Call geocode_location("San Francisco")
-Result: {{"latitude": 37.7749, "longitude": -122.4194, "display_name": "San Francisco, California, United States"}}
-
-Step 2: Extract state code "CA" from display_name
-
-Step 3: Call confirm_weather_query(
-    location="San Francisco",
-    latitude=37.7749,
-    longitude=-122.4194,
-    display_name="San Francisco, California, United States",
-    state_code="CA",
-    options=[
-        {{"description": "Get current forecast", "status": "enabled", "action": "forecast"}},
-        {{"description": "Check weather alerts", "status": "enabled", "action": "alerts"}}
-    ]
+Workflow for weather requests:
+1. Call geocode_location(location) to get coordinates and the US state_code.
+2. Call confirm_weather_query with the location, coordinates, display_name, state_code and
+   two enabled options: "Get current forecast" (action "forecast") and "Check weather alerts"
+   (action "alerts"). ALWAYS do this before get_forecast or get_alerts; the user picks options in the UI.
+3. The user's answer lists selected_actions. Call only the selected tools:
+   get_forecast(latitude, longitude) for "forecast", get_alerts(state_code) for "alerts".
+4. Present the results naturally. The tools render UI cards on the frontend.
+
+For forecasts mention the temperature in Celsius and Fahrenheit, conditions, wind speed and
+direction, and the location name. For alerts give the number of active alerts, most severe
+first, with a brief description of each new or updated one. get_alerts lists alerts the user
+has already seen as unchanged; mention them only briefly, and say which have expired.
+    """,
+    tools=[weather_toolset],
 )
 
-Step 4: [User sees UI with checkboxes and confirms their selection]
+def with_confirm_tool(input):
+    """Declare confirm_weather_query with its full schema for this run.
 
-Step 5: Parse the response and call selected tools:
-- If forecast selected: get_forecast(37.7749, -122.4194)
-- If alerts selected: get_alerts("CA")
+    The frontend's useHumanInTheLoop declaration has no item schema for
+    ``options``, so the backend's definition replaces it.
+    """
+    confirm = CONFIRM_WEATHER_TOOL["function"]
+    tools = [t for t in input.tools or [] if t.name != confirm["name"]]
+    tools.append(Tool(name=confirm["name"], description=confirm["description"], parameters=confirm["parameters"]))
+    return input.model_copy(update={"tools": tools})
 
-Step 6: Present the results naturally
 
-**Important Notes:**
-- ALWAYS call confirm_weather_query after geocoding and BEFORE calling get_forecast or get_alerts
-- Extract state code from display_name (usually last part before country)
-- The confirm_weather_query tool will show a UI to the user with checkboxes
-- Only call the MCP tools (get_forecast, get_alerts) that the user selected in their response
-- The tools (get_forecast, get_alerts) will render UI cards automatically on the frontend
+class WeatherADKAgent(ADKAgent):
+    """ADKAgent with the weather app's run-level optimizations layered on."""
 
-Tool reference: {CONFIRM_WEATHER_TOOL}
-    """,
-    tools=[weather_toolset],
+    def __init__(self, *args, answer_cache: AnswerCache, fast_path: FastPathRouter | None = None,
+                 alerts_feed: AlertsFeed | None = None,
+                 context_cache_config: ContextCacheConfig | None = None, plugins=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.answer_cache = answer_cache
+        self.fast_path = fast_path
+        self.alerts_feed = alerts_feed
+        self.context_cache_config = context_cache_config
+        self.plugins = list(plugins or [])
+
+    def _create_runner(self, adk_agent, user_id, app_name):
+        # Run through an App so Gemini context caching and plugins apply
+        app = App(
+            name=app_name,
+            root_agent=adk_agent,
+            plugins=self.plugins,
+            context_cache_config=self.context_cache_config,
+        )
+        return Runner(
+            app=app,
+            session_service=self._session_manager._session_service,
+            artifact_service=self._artifact_service,
+            memory_service=self._memory_service,
+            credential_service=self._credential_service,
+        )
+
+    def _route(self, input):
+        # Simple "weather in X" requests skip the LLM planning turns
+        if self.fast_path is None:
+            return super().run(input)
+        return self.fast_path.run(input, super().run, record=self._record_turn)
+
+    async def _record_turn(self, input, events):
+        # Turns answered without the ADK runner still belong in its session
+        await record_turn(self, input, events)
+
+    def run(self, input):
+        # Confirmed weather questions can be replayed from the answer cache
+        events = cached_run(self.answer_cache, self._route, with_confirm_tool(input), record=self._record_turn)
+        if self.alerts_feed is None:
+            return events
+        # Alerts the thread has already seen are sent as state deltas only
+        return self.alerts_feed.stream(input, events)
+
+
+# Input tokens, cached tokens and latency per Gemini turn
+prompt_stats = PromptStatsPlugin()
+
+# Backend-initiated tool calls (fast path, alerts poll) share the same pool
+tool_client = McpToolClient(mcp_pool)
+
+# Shared alerts poll; each thread only receives alerts it hasn't seen
+alerts_feed = (
+    AlertsFeed.from_tool_client(tool_client, poll_seconds=float(os.getenv("ALERTS_POLL_SECONDS", "60")))
+    if os.getenv("ALERTS_FEED_ENABLED", "1") == "1"
+    else None
 )
 
+# Sessions stay in memory, bounded by per-session and global byte budgets
+session_service = BoundedSessionService.from_env()
+
 # Create ADK middleware agent instance
-weather_adk_agent = ADKAgent(
+weather_adk_agent = WeatherADKAgent(
     adk_agent=weather_agent,
     app_name="weather_app",
     user_id="default_user",  # Default user ID, can be overridden per request
     session_timeout_seconds=3600,
+    # Runs paused on confirm_weather_query keep an execution slot until resumed;
+    # live runs are already bounded by the admission middleware
+    max_concurrent_executions=int(os.getenv("AGENT_MAX_EXECUTIONS", "10000")),
     use_in_memory_services=True,
+    session_service=session_service,
+    memory_service=DiscardingMemoryService(),  # nothing reads expired sessions back
+    answer_cache=AnswerCache(
+        max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "512")),
+        window_seconds=int(os.getenv("ANSWER_CACHE_WINDOW_SECONDS", "3600")),
+    ),
+    fast_path=(
+        FastPathRouter(tool_client, model=weather_agent.model, alerts_feed=alerts_feed)
+        if os.getenv("FAST_PATH_ENABLED", "1") == "1"
+        else None
+    ),
+    # Cache the static prefix (instruction + tool declarations) across turns
+    context_cache_config=(
+        ContextCacheConfig(
+            cache_intervals=int(os.getenv("CONTEXT_CACHE_INTERVALS", "10")),
+            ttl_seconds=int(os.getenv("CONTEXT_CACHE_TTL_SECONDS", "1800")),
+            min_tokens=int(os.getenv("CONTEXT_CACHE_MIN_TOKENS") or context_cache_min_tokens(weather_agent.model)),
+        )
+        if os.getenv("CONTEXT_CACHE_ENABLED", "1") == "1"
+        else None
+    ),
+    alerts_feed=alerts_feed,
+    plugins=[prompt_stats] + ([AlertsFeedPlugin(alerts_feed)] if alerts_feed else []),
 )
 
 # Create FastAPI app
 app = FastAPI(title="Weather ADK Agent with MCP Tools and HITL")
 
+# Bound concurrent agent runs (globally and per x-user-id) and shed load
+# with 429/503 + Retry-After once the run queue is too deep
+admission_controller = AdmissionController.from_env()
+app.add_middleware(AdmissionMiddleware, controller=admission_controller, path="/")
+
 # Add the ADK endpoint - this registers the agent
 add_adk_fastapi_endpoint(
     app, 
     weather_adk_agent, 
     path="/",
-    extract_headers=["x-user-id"]  # Extract user ID from headers if provided
+    extract_headers=["x-user-id", "x-answer-cache"]  # User ID and answer-cache opt-in
 )
 
+# Sync weather/.venv if uv.lock changed (off the event loop) so each spawn
+# runs its Python directly, and reload the MCP server on SIGHUP
+@app.on_event("startup")
+async def prepare_mcp_server():
+    mcp_pool.server_params = await asyncio.to_thread(weather_server_params, sync=True)
+    mcp_pool.install_reload_signal()
+
 # Health check
 @app.get("/health")
 async def health():
@@ -225,3 +296,47 @@ async def info():
             }
         },
     }
+
+# Forecast for the Next.js /api/weather/forecast route, served by the pooled
+# MCP server so it shares its grid cache and parsed forecasts
+def forecast_coordinates(body: Any) -> tuple[float, float] | None:
+    """``(latitude, longitude)`` from a ``/forecast`` body, or ``None`` if missing or out of range."""
+    if not isinstance(body, dict):
+        return None
+    latitude, longitude = body.get("latitude"), body.get("longitude")
+    for value, limit in ((latitude, 90), (longitude, 180)):
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not -limit <= value <= limit:
+            return None
+    return latitude, longitude
+
+@app.post("/forecast")
+async def forecast(request: Request):
+    try:
+        body = await request.json()
+    except ValueError:
+        body = None
+    coordinates = forecast_coordinates(body)
+    if coordinates is None:
+        return JSONResponse({"error": "Invalid latitude or longitude"}, status_code=400)
+    latitude, longitude = coordinates
+    try:
+        result = await mcp_pool.call_tool("get_forecast", {"latitude": latitude, "longitude": longitude})
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=502)
+    text = result.content[0].text if result.content else ""
+    if result.isError:
+        return JSONResponse({"error": text or "Failed to fetch forecast"}, status_code=502)
+    return {"result": text}
+
+# Runtime metrics (admission queue, answer cache, fast path, model turns, sessions, alerts, MCP servers)
+@app.get("/metrics")
+async def metrics():
+    return {
+        "admission": admission_controller.metrics(),
+        "answer_cache": weather_adk_agent.answer_cache.metrics(),
+        "fast_path": weather_adk_agent.fast_path.metrics() if weather_adk_agent.fast_path else None,
+        "model": prompt_stats.metrics(),
+        "sessions": session_service.metrics(),
+        "alerts_feed": alerts_feed.metrics() if alerts_feed else None,
+        "mcp": mcp_pool.metrics(),
+    }
@@ -0,0 +1,484 @@
+"""Deterministic fast path for simple "weather in X" requests.
+
+For a plain weather question the agent spends a whole Gemini turn deciding
+to call ``geocode_location`` and another deciding to call
+``confirm_weather_query``. The router here recognizes those messages with a
+regex, calls the MCP tools itself and emits the same AG-UI ``TOOL_CALL_*``
+events the ADK agent would, including the ``confirm_weather_query`` HITL
+step. When the user answers the confirmation it runs the selected tools and
+only uses Gemini to write the final summary.
+
+Anything it is not sure about (follow-up turns, unrecognized phrasing,
+locations outside the US, geocoding failures) goes to the ADK agent.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import re
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Awaitable, Callable
+
+from ag_ui.core import (
+    AssistantMessage,
+    BaseEvent,
+    EventType,
+    RunAgentInput,
+    RunErrorEvent,
+    RunFinishedEvent,
+    RunStartedEvent,
+    StateDeltaEvent,
+    TextMessageContentEvent,
+    TextMessageEndEvent,
+    TextMessageStartEvent,
+    ToolCallArgsEvent,
+    ToolCallEndEvent,
+    ToolCallResultEvent,
+    ToolCallStartEvent,
+    ToolMessage,
+    UserMessage,
+)
+
+from alerts_feed import AlertsFeed, mcp_result
+from answer_cache import ALERTS_TOOL_NAME, HITL_TOOL_NAME, tool_payload
+
+logger = logging.getLogger(__name__)
+
+SIMPLE_WEATHER_INTENT = re.compile(
+    r"^\s*(?:(?:what(?:'s| is)|how(?:'s| is)|show me|tell me|get|check)\s+)?"
+    r"(?:me\s+)?(?:the\s+)?(?:current\s+)?(?:weather|forecast)(?:\s+like)?\s+"
+    r"(?:in|for|at)\s+(?P<location>[A-Za-z][A-Za-z .,'-]{1,80}?)"
+    r"(?:\s+(?:right\s+)?now|\s+today)?\s*[?.!]*\s*$",
+    re.IGNORECASE,
+)
+
+# Words that make a request more than a simple lookup - let Gemini handle it.
+AMBIGUOUS_WORDS = re.compile(
+    r"\b(?:and|or|vs|versus|compare|tomorrow|weekend|week|tonight|yesterday|next|last|"
+    r"between|near|alerts?|warnings?)\b",
+    re.IGNORECASE,
+)
+
+US_STATES = {
+    "alabama": "AL", "alaska": "AK", "arizona": "AZ", "arkansas": "AR",
+    "california": "CA", "colorado": "CO", "connecticut": "CT", "delaware": "DE",
+    "district of columbia": "DC", "florida": "FL", "georgia": "GA", "hawaii": "HI",
+    "idaho": "ID", "illinois": "IL", "indiana": "IN", "iowa": "IA", "kansas": "KS",
+    "kentucky": "KY", "louisiana": "LA", "maine": "ME", "maryland": "MD",
+    "massachusetts": "MA", "michigan": "MI", "minnesota": "MN", "mississippi": "MS",
+    "missouri": "MO", "montana": "MT", "nebraska": "NE", "nevada": "NV",
+    "new hampshire": "NH", "new jersey": "NJ", "new mexico": "NM", "new york": "NY",
+    "north carolina": "NC", "north dakota": "ND", "ohio": "OH", "oklahoma": "OK",
+    "oregon": "OR", "pennsylvania": "PA", "rhode island": "RI", "south carolina": "SC",
+    "south dakota": "SD", "tennessee": "TN", "texas": "TX", "utah": "UT",
+    "vermont": "VT", "virginia": "VA", "washington": "WA", "west virginia": "WV",
+    "wisconsin": "WI", "wyoming": "WY", "puerto rico": "PR",
+}
+
+WEATHER_OPTIONS = [
+    {"description": "Get current forecast", "status": "enabled", "action": "forecast"},
+    {"description": "Check weather alerts", "status": "enabled", "action": "alerts"},
+]
+
+ACTION_TOOLS = {"forecast": "get_forecast", "alerts": ALERTS_TOOL_NAME}
+
+# Agent state key the frontend reads partial get_forecast results from
+FORECAST_PROGRESS_STATE_KEY = "forecast_progress"
+
+SUMMARY_PROMPT = """You are a helpful weather assistant. Write a short, natural reply to the user's question using only the tool results below.
+
+For forecasts mention the temperature in both Celsius and Fahrenheit, the conditions, wind speed and direction, and the location name.
+For alerts give the number of active alerts, most severe first, with a brief description of each new or updated one; alerts listed as unchanged were already shown to the user, so only mention them briefly, and say which expired.
+
+User question: {question}
+
+Tool results:
+{results}
+"""
+
+
+def match_simple_intent(text: str) -> str | None:
+    """Return the location of a plain "weather in X" request, or ``None``."""
+    match = SIMPLE_WEATHER_INTENT.match(text)
+    if not match:
+        return None
+    location = match.group("location").strip(" .,")
+    if AMBIGUOUS_WORDS.search(location):
+        return None
+    return location
+
+
+def state_code_from_geocode(result: dict[str, Any]) -> str | None:
+    """US state code from a ``geocode_location`` result."""
+    if result.get("state_code"):
+        return result["state_code"]
+    parts = [p.strip().lower() for p in result.get("display_name", "").split(",")]
+    if not parts or parts[-1] not in ("united states", "united states of america"):
+        return None
+    for part in reversed(parts[:-1]):
+        if part in US_STATES:
+            return US_STATES[part]
+    return None
+
+
+class McpToolClient:
+    """Calls the weather tools directly through the shared ``McpServerPool``."""
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    async def call_tool(
+        self, name: str, arguments: dict[str, Any], progress_callback: Callable | None = None
+    ) -> str:
+        """Call ``name`` and return the result serialized as ADK would emit it.
+
+        ``progress_callback(progress, total, message)`` receives the tool's
+        MCP progress notifications (``get_forecast`` sends partial results).
+        """
+        result = await self.pool.call_tool(name, arguments, progress_callback=progress_callback)
+        return json.dumps(result.model_dump(exclude_none=True, mode="json"), ensure_ascii=False)
+
+    async def close(self) -> None:
+        await self.pool.close()
+
+
+def _tool_call_events(
+    tool_call_id: str, name: str, args: dict[str, Any], parent_message_id: str, result: str | None
+) -> list[BaseEvent]:
+    events: list[BaseEvent] = [
+        ToolCallStartEvent(
+            type=EventType.TOOL_CALL_START,
+            tool_call_id=tool_call_id,
+            tool_call_name=name,
+            parent_message_id=parent_message_id,
+        ),
+        ToolCallArgsEvent(type=EventType.TOOL_CALL_ARGS, tool_call_id=tool_call_id, delta=json.dumps(args)),
+        ToolCallEndEvent(type=EventType.TOOL_CALL_END, tool_call_id=tool_call_id),
+    ]
+    if result is not None:
+        events.append(_tool_result_event(tool_call_id, result))
+    return events
+
+
+def _tool_result_event(tool_call_id: str, result: str) -> ToolCallResultEvent:
+    return ToolCallResultEvent(
+        type=EventType.TOOL_CALL_RESULT,
+        message_id=str(uuid.uuid4()),
+        tool_call_id=tool_call_id,
+        content=result,
+    )
+
+
+def _new_id() -> str:
+    return str(uuid.uuid4())
+
+
+class FastPathRouter:
+    """Serves simple weather intents without an LLM planning turn."""
+
+    def __init__(
+        self,
+        tool_client: McpToolClient,
+        model: str = "gemini-2.0-flash",
+        max_pending_threads: int = 10000,
+        alerts_feed: AlertsFeed | None = None,
+    ):
+        self.tool_client = tool_client
+        self.model = model
+        self.alerts_feed = alerts_feed
+        self.max_pending_threads = max_pending_threads
+        # thread_id -> (confirm tool call id, original question, confirm args)
+        self._pending: OrderedDict[str, tuple[str, str, dict[str, Any]]] = OrderedDict()
+        self._genai_client = None
+
+        self._runs = 0
+        self._fast_runs = {"intent": 0, "resume": 0}
+        self._fallbacks = 0
+        self._durations: dict[str, dict[str, list[float]]] = {
+            phase: {"fast": [0.0, 0], "llm": [0.0, 0]} for phase in ("intent", "resume")
+        }
+        self._saved_seconds = 0.0
+
+    # -- routing ---------------------------------------------------------
+
+    @staticmethod
+    def _conversation(input: RunAgentInput) -> list[Any]:
+        return [m for m in input.messages if isinstance(m, (UserMessage, AssistantMessage, ToolMessage))]
+
+    def _simple_intent(self, input: RunAgentInput) -> str | None:
+        conversation = self._conversation(input)
+        if len(conversation) != 1 or not isinstance(conversation[0], UserMessage):
+            return None
+        if not isinstance(conversation[0].content, str):
+            return None
+        return match_simple_intent(conversation[0].content)
+
+    def _fast_resume(self, input: RunAgentInput) -> tuple[str, str, dict[str, Any]] | None:
+        pending = self._pending.get(input.thread_id)
+        if pending is None or not input.messages:
+            return None
+        last = input.messages[-1]
+        if isinstance(last, ToolMessage) and last.tool_call_id == pending[0]:
+            return pending
+        return None
+
+    @staticmethod
+    def _phase(input: RunAgentInput) -> str | None:
+        if input.messages and isinstance(input.messages[-1], ToolMessage):
+            return "resume"
+        if len(FastPathRouter._conversation(input)) == 1:
+            return "intent"
+        return None
+
+    async def run(
+        self,
+        input: RunAgentInput,
+        fallback: Callable[[RunAgentInput], AsyncIterator[BaseEvent]],
+        record: Callable[[RunAgentInput, list[BaseEvent]], Awaitable[None]] | None = None,
+    ) -> AsyncIterator[BaseEvent]:
+        """Serve ``input`` on the fast path if possible, else via ``fallback``.
+
+        ``record(input, events)`` (see ``session_sync.record_turn``) writes a
+        fast-path turn into the ADK session before its ``RUN_FINISHED``, so
+        follow-up messages that go to the agent see the conversation and
+        ag_ui_adk does not replay the turn's messages.
+        """
+        self._runs += 1
+        started = time.monotonic()
+
+        resume = self._fast_resume(input)
+        if resume is not None:
+            self._pending.pop(input.thread_id, None)
+            emitted: list[BaseEvent] = []
+            async for event in self._resume(input, *resume):
+                if event.type == EventType.RUN_FINISHED and record is not None:
+                    await record(input, emitted)
+                emitted.append(event)
+                yield event
+            self._record("resume", "fast", time.monotonic() - started)
+            return
+
+        location = self._simple_intent(input)
+        if location is not None:
+            events = await self._intent(input, location)
+            if events is not None:
+                if record is not None:
+                    await record(input, events)
+                for event in events:
+                    yield event
+                self._record("intent", "fast", time.monotonic() - started)
+                return
+
+        self._fallbacks += 1
+        phase = self._phase(input)
+        async for event in fallback(input):
+            yield event
+        if phase is not None:
+            self._record(phase, "llm", time.monotonic() - started)
+
+    async def _intent(self, input: RunAgentInput, location: str) -> list[BaseEvent] | None:
+        """Geocode and ask for confirmation; ``None`` means "let the LLM decide"."""
+        try:
+            geocode_content = await self.tool_client.call_tool("geocode_location", {"location": location})
+        except Exception:
+            logger.exception("Fast path geocode_location failed; falling back to the agent")
+            return None
+        geocode = tool_payload(geocode_content) or {}
+        if "error" in geocode or "latitude" not in geocode:
+            return None
+        state_code = state_code_from_geocode(geocode)
+        if state_code is None:
+            return None
+
+        message_id = _new_id()
+        confirm_id = _new_id()
+        confirm_args = {
+            "location": location,
+            "latitude": geocode["latitude"],
+            "longitude": geocode["longitude"],
+            "display_name": geocode.get("display_name", location),
+            "state_code": state_code,
+            "options": WEATHER_OPTIONS,
+        }
+        self._pending[input.thread_id] = (confirm_id, input.messages[-1].content, confirm_args)
+        self._pending.move_to_end(input.thread_id)
+        while len(self._pending) > self.max_pending_threads:
+            self._pending.popitem(last=False)
+
+        return [
+            RunStartedEvent(type=EventType.RUN_STARTED, thread_id=input.thread_id, run_id=input.run_id),
+            *_tool_call_events(_new_id(), "geocode_location", {"location": location}, message_id, geocode_content),
+            *_tool_call_events(confirm_id, HITL_TOOL_NAME, confirm_args, message_id, None),
+            RunFinishedEvent(type=EventType.RUN_FINISHED, thread_id=input.thread_id, run_id=input.run_id),
+        ]
+
+    @staticmethod
+    def _tool_args(tool: str, answer: dict[str, Any], confirm_args: dict[str, Any]) -> dict[str, Any]:
+        """Arguments for ``tool``, preferring the answer's values over the ones we proposed."""
+        def pick(key: str, kind: type | tuple[type, ...]) -> Any:
+            value = answer.get(key)
+            ok = isinstance(value, kind) and not isinstance(value, bool)
+            return value if ok else confirm_args[key]
+
+        if tool == "get_forecast":
+            return {"latitude": pick("latitude", (int, float)), "longitude": pick("longitude", (int, float))}
+        return {"state": pick("state_code", str)}
+
+    async def _resume(
+        self, input: RunAgentInput, confirm_id: str, question: str, confirm_args: dict[str, Any]
+    ) -> AsyncIterator[BaseEvent]:
+        yield RunStartedEvent(type=EventType.RUN_STARTED, thread_id=input.thread_id, run_id=input.run_id)
+        try:
+            answer = json.loads(input.messages[-1].content)
+        except (TypeError, ValueError):
+            answer = None
+        selected = (answer.get("selected_actions") or []) if isinstance(answer, dict) else None
+        if not isinstance(selected, list):
+            yield RunErrorEvent(
+                type=EventType.RUN_ERROR,
+                code="INVALID_CONFIRMATION",
+                message=f"Malformed {HITL_TOOL_NAME} answer; expected a JSON object.",
+            )
+            return
+
+        message_id = _new_id()
+        results: dict[str, Any] = {}
+        if answer.get("accepted"):
+            for action in selected:
+                tool = ACTION_TOOLS.get(action) if isinstance(action, str) else None
+                if tool is None:
+                    continue
+                args = self._tool_args(tool, answer, confirm_args)
+                tool_call_id = _new_id()
+                for event in _tool_call_events(tool_call_id, tool, args, message_id, None):
+                    yield event
+                content = None
+                if tool == ALERTS_TOOL_NAME and self.alerts_feed is not None:
+                    # Only alerts this thread hasn't seen come back in full
+                    payload = await self.alerts_feed.tool_result(input.thread_id, args["state"])
+                    if payload is not None:
+                        content = json.dumps(mcp_result(payload))
+                if content is None:
+                    async for event in self._call_streaming(tool, args, tool_call_id):
+                        if isinstance(event, str):
+                            content = event
+                        else:
+                            yield event
+                results[tool] = tool_payload(content) or content
+                yield _tool_result_event(tool_call_id, content)
+
+        yield TextMessageStartEvent(type=EventType.TEXT_MESSAGE_START, message_id=message_id, role="assistant")
+        if not answer.get("accepted"):
+            yield self._text(message_id, "Okay, I won't fetch the weather for that location.")
+        elif not results:
+            yield self._text(message_id, "No weather information was selected.")
+        else:
+            async for delta in self._summarize(question, results):
+                yield self._text(message_id, delta)
+        yield TextMessageEndEvent(type=EventType.TEXT_MESSAGE_END, message_id=message_id)
+        yield RunFinishedEvent(type=EventType.RUN_FINISHED, thread_id=input.thread_id, run_id=input.run_id)
+
+    async def _call_streaming(
+        self, tool: str, args: dict[str, Any], tool_call_id: str
+    ) -> AsyncIterator[BaseEvent | str]:
+        """Run a tool, yielding a state delta per progress notification, then its result.
+
+        Partial results accumulate under ``forecast_progress`` in the agent
+        state (tagged with the tool call id and coordinates) so the frontend
+        card can render the location and current period before the full
+        forecast arrives.
+        """
+        updates: asyncio.Queue = asyncio.Queue()
+
+        async def on_progress(progress: float, total: float | None, message: str | None) -> None:
+            try:
+                update = json.loads(message or "")
+            except ValueError:
+                return
+            if isinstance(update, dict):
+                updates.put_nowait(update)
+
+        async def call() -> str:
+            try:
+                return await self.tool_client.call_tool(tool, args, progress_callback=on_progress)
+            except Exception as e:
+                logger.exception("Fast path %s failed", tool)
+                return json.dumps({"error": str(e)})
+
+        task = asyncio.ensure_future(call())
+        partial = {"toolCallId": tool_call_id, **args}
+        try:
+            while True:
+                next_update = asyncio.ensure_future(updates.get())
+                done, _ = await asyncio.wait({task, next_update}, return_when=asyncio.FIRST_COMPLETED)
+                if next_update not in done:
+                    next_update.cancel()
+                    break
+                partial.update(next_update.result())
+                yield StateDeltaEvent(
+                    type=EventType.STATE_DELTA,
+                    delta=[{"op": "add", "path": f"/{FORECAST_PROGRESS_STATE_KEY}", "value": dict(partial)}],
+                )
+        finally:
+            if not task.done():
+                task.cancel()
+        yield task.result()
+
+    @staticmethod
+    def _text(message_id: str, delta: str) -> TextMessageContentEvent:
+        return TextMessageContentEvent(type=EventType.TEXT_MESSAGE_CONTENT, message_id=message_id, delta=delta)
+
+    async def _summarize(self, question: str, results: dict[str, Any]) -> AsyncIterator[str]:
+        """Stream Gemini's natural-language summary of the tool results."""
+        prompt = SUMMARY_PROMPT.format(question=question, results=json.dumps(results, indent=2))
+        try:
+            if self._genai_client is None:
+                from google import genai
+
+                self._genai_client = genai.Client()
+            stream = await self._genai_client.aio.models.generate_content_stream(
+                model=self.model, contents=prompt
+            )
+            async for chunk in stream:
+                if chunk.text:
+                    yield chunk.text
+        except Exception:
+            logger.exception("Fast path summary failed")
+            yield "Here is the weather information you asked for."
+
+    # -- metrics ---------------------------------------------------------
+
+    def _record(self, phase: str, path: str, seconds: float) -> None:
+        total = self._durations[phase][path]
+        total[0] += seconds
+        total[1] += 1
+        if path == "fast":
+            self._fast_runs[phase] += 1
+            llm_total, llm_count = self._durations[phase]["llm"]
+            if llm_count:
+                self._saved_seconds += max(0.0, llm_total / llm_count - seconds)
+
+    def metrics(self) -> dict[str, Any]:
+        fast = sum(self._fast_runs.values())
+
+        def avg_ms(phase: str, path: str) -> float:
+            total, count = self._durations[phase][path]
+            return round(total / count * 1000, 1) if count else 0.0
+
+        return {
+            "runs_total": self._runs,
+            "fast_path_runs_total": fast,
+            "fast_path_intent_runs": self._fast_runs["intent"],
+            "fast_path_resume_runs": self._fast_runs["resume"],
+            "fallback_runs_total": self._fallbacks,
+            "fast_path_fraction": round(fast / self._runs, 4) if self._runs else 0.0,
+            "avg_latency_ms": {
+                phase: {"fast": avg_ms(phase, "fast"), "llm": avg_ms(phase, "llm")}
+                for phase in ("intent", "resume")
+            },
+            "latency_saved_ms_total": round(self._saved_seconds * 1000, 1),
+            "pending_confirmations": len(self._pending),
+        }
@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+"""Load test for the HITL confirmation flow.
+
+Serves the backend's FastAPI app in-process with uvicorn and drives many
+simulated users through the full conversation:
+
+    user message -> geocode_location -> confirm_weather_query (run pauses)
+    -> think time -> resume with selected actions -> get_forecast/get_alerts
+
+Gemini is replaced by a scripted ADK model and the weather MCP server by
+in-process tools returning canned NWS-sized payloads, so the run measures
+the backend itself: admission control, ag_ui_adk session handling and the
+cost of keeping HITL runs suspended. It reports RSS, server-side connection
+count, suspended sessions and resume latency.
+
+    python load_test_hitl.py --users 2000 --think-min 5 --think-max 30
+
+The backend's environment settings (``AGENT_*`` admission limits,
+``SESSION_*`` budgets) apply as usual.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+import time
+import uuid
+
+os.environ.setdefault("GEMINI_API_KEY", "load-test")  # never used: the model is scripted
+
+import httpx
+import uvicorn
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_response import LlmResponse
+from google.adk.tools import FunctionTool
+from google.genai import types
+
+import backend_tool_rendering as backend
+from answer_cache import ALERTS_TOOL_NAME, HITL_TOOL_NAME
+
+LOCATIONS = ["Austin, TX", "Denver", "Seattle", "Portland, ME", "Miami", "Chicago", "Boston", "Phoenix"]
+
+
+# ----- stub LLM -------------------------------------------------------------
+
+class ScriptedLlm(BaseLlm):
+    """Deterministic stand-in for Gemini that walks the weather workflow."""
+
+    latency: float = 0.05
+
+    async def generate_content_async(self, llm_request, stream=False):
+        await asyncio.sleep(self.latency)
+        last = llm_request.contents[-1] if llm_request.contents else None
+        responses = {
+            p.function_response.name: p.function_response.response or {}
+            for p in (last.parts if last and last.parts else [])
+            if p.function_response
+        }
+        if "geocode_location" in responses:
+            geo = responses["geocode_location"]
+            yield self._calls((HITL_TOOL_NAME, {
+                **{k: geo.get(k) for k in ("latitude", "longitude", "display_name", "state_code")},
+                "location": geo.get("display_name"),
+                "options": [
+                    {"label": "Get current forecast", "action": "forecast", "status": "enabled"},
+                    {"label": "Check weather alerts", "action": "alerts", "status": "enabled"},
+                ],
+            }))
+        elif HITL_TOOL_NAME in responses:
+            answer = responses[HITL_TOOL_NAME]
+            calls = []
+            if answer.get("accepted"):
+                if "forecast" in answer.get("selected_actions", []):
+                    calls.append(("get_forecast", {"latitude": answer["latitude"], "longitude": answer["longitude"]}))
+                if "alerts" in answer.get("selected_actions", []):
+                    calls.append((ALERTS_TOOL_NAME, {"state": answer.get("state_code") or "TX"}))
+            yield self._calls(*calls) if calls else self._text("Okay, I won't look that up.")
+        elif responses:
+            yield self._text("It's 22°C (72°F) and partly cloudy with a light south wind. No active alerts.")
+        else:
+            text = "".join(p.text or "" for p in (last.parts if last and last.parts else []))
+            match = re.search(r"weather in (.+?)\??$", text)
+            yield self._calls(("geocode_location", {"location": match.group(1) if match else text}))
+
+    @staticmethod
+    def _calls(*calls):
+        parts = [
+            types.Part(function_call=types.FunctionCall(id=f"call_{uuid.uuid4().hex[:12]}", name=name, args=args))
+            for name, args in calls
+        ]
+        return LlmResponse(content=types.Content(role="model", parts=parts), turn_complete=True)
+
+    @staticmethod
+    def _text(text):
+        return LlmResponse(content=types.Content(role="model", parts=[types.Part(text=text)]), turn_complete=True)
+
+
+# ----- fake upstream (stands in for the weather MCP server) -----------------
+
+UPSTREAM_LATENCY = 0.1
+
+
+async def geocode_location(location: str) -> dict:
+    """Convert a location name to coordinates."""
+    await asyncio.sleep(UPSTREAM_LATENCY)
+    return {
+        "latitude": 30.2672, "longitude": -97.7431,
+        "display_name": f"{location}, United States", "state_code": "TX",
+        "location_type": "city", "importance": 0.8,
+    }
+
+
+async def get_forecast(latitude: float, longitude: float) -> dict:
+    """Get weather forecast for a location."""
+    await asyncio.sleep(UPSTREAM_LATENCY)
+    periods = [
+        {
+            "name": f"Period {i}", "temperature": 72 - i, "temperatureUnit": "F",
+            "windSpeed": "5 to 10 mph", "windDirection": "S",
+            "shortForecast": "Partly Cloudy",
+            "detailedForecast": "Partly cloudy, with a high near 72. South wind 5 to 10 mph. " * 3,
+        }
+        for i in range(14)
+    ]
+    return {
+        "temperature": 22.2, "feelsLike": 22.2, "humidity": 0, "windSpeed": 12.9, "windGust": 0,
+        "conditions": "Partly Cloudy", "location": f"{latitude}, {longitude}", "periods": periods,
+    }
+
+
+async def get_alerts(state: str) -> str:
+    """Get weather alerts for a US state."""
+    await asyncio.sleep(UPSTREAM_LATENCY)
+    return "No active alerts for this state."
+
+
+async def fetch_alerts(state: str) -> list:
+    """Active alerts as the shared alerts poll sees them."""
+    await asyncio.sleep(UPSTREAM_LATENCY)
+    return [{
+        "id": f"urn:oid:load-test.{state}.1", "sent": "2025-01-01T00:00:00Z", "expires": None, "replaces": [],
+        "event": "Heat Advisory", "area": state, "severity": "Moderate",
+        "description": "Heat index values up to 108 expected. " * 5, "instructions": "Drink plenty of fluids.",
+    }]
+
+
+def install_stubs(llm_latency: float, upstream_latency: float):
+    """Point the backend agent at the scripted model and fake tools."""
+    global UPSTREAM_LATENCY
+    UPSTREAM_LATENCY = upstream_latency
+    agent = backend.weather_adk_agent
+    agent._adk_agent = backend.weather_agent.model_copy(update={
+        "model": ScriptedLlm(model="scripted", latency=llm_latency),
+        "tools": [FunctionTool(geocode_location), FunctionTool(get_forecast), FunctionTool(get_alerts)],
+    })
+    agent.fast_path = None            # would spawn the real MCP server
+    if agent.alerts_feed is not None:
+        agent.alerts_feed.fetch = fetch_alerts
+    agent.context_cache_config = None  # Gemini-only
+
+
+# ----- simulated users ------------------------------------------------------
+
+class Stats:
+    def __init__(self):
+        self.first_run = []
+        self.resume_ttfb = []
+        self.resume_total = []
+        self.completed = 0
+        self.failed = 0
+        self.rejected = {429: 0, 503: 0}
+        self.connection_resets = 0
+        self.suspended = 0
+
+
+async def run_agent(client, body, user_id, stats):
+    """POST one run and collect its events.
+
+    Retries 429/503 after Retry-After, and a keep-alive connection the server
+    closed before any event arrived, as a browser would.
+    """
+    while True:
+        started = time.perf_counter()
+        events, ttfb = [], None
+        try:
+            async with client.stream("POST", "/", json=body, headers={"x-user-id": user_id}) as response:
+                if response.status_code in (429, 503):
+                    stats.rejected[response.status_code] += 1
+                    await response.aread()
+                    await asyncio.sleep(float(response.headers.get("retry-after", "1")) * random.uniform(0.5, 1.5))
+                    continue
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    if ttfb is None:
+                        ttfb = time.perf_counter() - started
+                    event = json.loads(line[5:])
+                    events.append(event)
+                    if event["type"] in ("RUN_FINISHED", "RUN_ERROR"):
+                        break
+        except (httpx.ReadError, httpx.RemoteProtocolError):
+            if events:
+                raise
+            stats.connection_resets += 1
+            continue
+        return events, ttfb, time.perf_counter() - started
+
+
+def history_from(events, messages):
+    """Rebuild the assistant/tool messages the frontend would hold after a run."""
+    calls, results = {}, []
+    for event in events:
+        if event["type"] == "TOOL_CALL_START":
+            calls[event["toolCallId"]] = {"name": event["toolCallName"], "arguments": ""}
+        elif event["type"] == "TOOL_CALL_ARGS":
+            calls[event["toolCallId"]]["arguments"] += event["delta"]
+        elif event["type"] == "TOOL_CALL_RESULT":
+            results.append({"id": event["messageId"], "role": "tool", "toolCallId": event["toolCallId"],
+                            "content": event["content"]})
+    if calls:
+        messages.append({
+            "id": f"msg_{uuid.uuid4().hex[:12]}", "role": "assistant",
+            "toolCalls": [{"id": cid, "type": "function", "function": fn} for cid, fn in calls.items()],
+        })
+    messages.extend(results)
+    return calls
+
+
+async def simulate_user(n, client, args, stats):
+    await asyncio.sleep(random.uniform(0, args.ramp))
+    user_id, thread_id = f"load-user-{n}", f"load-thread-{n}-{uuid.uuid4().hex[:8]}"
+    messages = [{"id": f"msg_{uuid.uuid4().hex[:12]}", "role": "user",
+                 "content": f"What's the weather in {random.choice(LOCATIONS)}?"}]
+
+    def body():
+        return {"threadId": thread_id, "runId": f"run_{uuid.uuid4().hex[:12]}", "state": {},
+                "messages": messages, "tools": [], "context": [], "forwardedProps": {}}
+
+    try:
+        events, _, total = await run_agent(client, body(), user_id, stats)
+        stats.first_run.append(total)
+        calls = history_from(events, messages)
+        confirm = next(((cid, json.loads(fn["arguments"])) for cid, fn in calls.items()
+                        if fn["name"] == HITL_TOOL_NAME), None)
+        if confirm is None:
+            raise RuntimeError(f"no {HITL_TOOL_NAME} call: {[e['type'] for e in events]}")
+
+        # The run is now suspended on the confirmation card
+        stats.suspended += 1
+        await asyncio.sleep(random.uniform(args.think_min, args.think_max))
+        stats.suspended -= 1
+
+        call_id, confirm_args = confirm
+        messages.append({"id": f"msg_{uuid.uuid4().hex[:12]}", "role": "tool", "toolCallId": call_id,
+                         "content": json.dumps({
+                             "accepted": True, "selected_actions": ["forecast", "alerts"],
+                             **{k: confirm_args.get(k) for k in ("latitude", "longitude", "state_code", "display_name")},
+                         })})
+        events, ttfb, total = await run_agent(client, body(), user_id, stats)
+        if events[-1]["type"] != "RUN_FINISHED":
+            raise RuntimeError(events[-1])
+        stats.resume_ttfb.append(ttfb)
+        stats.resume_total.append(total)
+        stats.completed += 1
+    except Exception as e:  # noqa: BLE001 - counted and reported
+        stats.failed += 1
+        if stats.failed <= 3:
+            print(f"⚠️  user {n}: {e!r}")
+
+
+# ----- process sampling -----------------------------------------------------
+
+def rss_mb():
+    """Resident set size of this process (Linux /proc; ru_maxrss elsewhere)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def pending_sessions():
+    """ADK sessions holding pending HITL tool calls."""
+    return sum(
+        1
+        for users in backend.session_service.sessions.values()
+        for sessions in users.values()
+        for session in sessions.values()
+        if session.state.get("pending_tool_calls")
+    )
+
+
+async def sample(server, stats, samples, stop):
+    while not stop.is_set():
+        samples.append({
+            "rss_mb": rss_mb(),
+            "connections": len(server.server_state.connections),
+            "suspended_users": stats.suspended,
+            "pending_sessions": pending_sessions(),
+            "session_bytes": backend.session_service.metrics()["resident_bytes"],
+        })
+        await asyncio.sleep(0.5)
+
+
+# ----- report ---------------------------------------------------------------
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def print_latency(label, values):
+    if not values:
+        print(f"   {label}: no samples")
+        return
+    ms = [v * 1000 for v in values]
+    print(f"   {label}: p50 {percentile(ms, 50):.0f} ms, p95 {percentile(ms, 95):.0f} ms, "
+          f"p99 {percentile(ms, 99):.0f} ms, max {max(ms):.0f} ms")
+
+
+def report(args, stats, samples, baseline_rss, elapsed):
+    peak = max(samples, key=lambda s: s["suspended_users"]) if samples else None
+    print("=" * 80)
+    print(f"👥 {args.users} users in {elapsed:.1f} s: {stats.completed} completed, {stats.failed} failed")
+    print(f"🚦 Admission rejections (retried): 429={stats.rejected[429]} 503={stats.rejected[503]}, "
+          f"keep-alive resets (retried): {stats.connection_resets}")
+    print("⏱️  Latency")
+    print_latency("first run (to confirmation)", stats.first_run)
+    print_latency("resume time to first byte", stats.resume_ttfb)
+    print_latency("resume total", stats.resume_total)
+    if peak:
+        print(f"⏸️  Peak suspended HITL runs: {peak['suspended_users']} "
+              f"({peak['pending_sessions']} sessions with pending tool calls)")
+        print(f"🧠 RSS: baseline {baseline_rss:.0f} MB, at peak suspension {peak['rss_mb']:.0f} MB, "
+              f"max {max(s['rss_mb'] for s in samples):.0f} MB")
+        if peak["suspended_users"]:
+            per_user = (peak["rss_mb"] - baseline_rss) * 1024 / peak["suspended_users"]
+            print(f"   ≈ {per_user:.1f} KB RSS per suspended run; resident session bytes "
+                  f"{peak['session_bytes'] / 1024:.0f} KB at peak")
+        print(f"🔌 Server connections: at peak suspension {peak['connections']}, "
+              f"max {max(s['connections'] for s in samples)}")
+    print(f"📊 /metrics sessions: {backend.session_service.metrics()}")
+    print(f"📊 /metrics admission: {backend.admission_controller.metrics()}")
+    if backend.alerts_feed is not None:
+        print(f"📊 /metrics alerts_feed: {backend.alerts_feed.metrics()}")
+
+
+async def main(args):
+    install_stubs(args.llm_latency_ms / 1000, args.upstream_latency_ms / 1000)
+    config = uvicorn.Config(backend.app, host="127.0.0.1", port=args.port, log_level="warning",
+                            limit_concurrency=None, backlog=max(2048, args.users))
+    server = uvicorn.Server(config)
+    serve = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    stats, samples, stop = Stats(), [], asyncio.Event()
+    baseline_rss = rss_mb()
+    sampler = asyncio.create_task(sample(server, stats, samples, stop))
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    started = time.perf_counter()
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", limits=limits,
+                                 timeout=httpx.Timeout(args.timeout)) as client:
+        await asyncio.gather(*(simulate_user(n, client, args, stats) for n in range(args.users)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await sampler
+
+    report(args, stats, samples, baseline_rss, elapsed)
+    server.should_exit = True
+    await serve
+    return stats.failed == 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, default=2000, help="concurrent simulated users")
+    parser.add_argument("--ramp", type=float, default=10.0, help="seconds over which users arrive")
+    parser.add_argument("--think-min", type=float, default=5.0, help="min seconds on the confirmation card")
+    parser.add_argument("--think-max", type=float, default=30.0, help="max seconds on the confirmation card")
+    parser.add_argument("--llm-latency-ms", type=float, default=50.0, help="stub model latency per turn")
+    parser.add_argument("--upstream-latency-ms", type=float, default=100.0, help="fake tool latency")
+    parser.add_argument("--timeout", type=float, default=300.0, help="per-request timeout in seconds")
+    parser.add_argument("--port", type=int, default=8765)
+    ok = asyncio.run(main(parser.parse_args()))
+    print("✅ Load test completed" if ok else "❌ Some users failed")
+    sys.exit(0 if ok else 1)
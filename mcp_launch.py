@@ -0,0 +1,116 @@
+"""How the backend spawns the weather MCP server.
+
+``uv run`` resolves (and with ``UV_NO_CACHE=1`` re-installs) the project
+environment on every spawn, which dominates MCP server cold start. The
+preflight here does that work once, from the backend's startup hook --
+``uv sync`` with bytecode compilation when ``weather/.venv`` is missing or
+was synced from a different ``uv.lock``/``pyproject.toml`` -- and then spawns
+the venv's interpreter directly. ``uv run`` remains the fallback when no
+venv can be prepared.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import shutil
+import subprocess
+import sys
+
+from mcp import StdioServerParameters
+
+logger = logging.getLogger(__name__)
+
+WEATHER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "weather")
+WEATHER_SCRIPT = os.path.join(WEATHER_DIR, "weather.py")
+
+# The MCP stdio client only passes a minimal environment to the child, so
+# settings the weather server reads are forwarded explicitly.
+FORWARDED_ENV = ("GAZETTEER_PATH", "WEATHER_CACHE_SNAPSHOT")
+
+# Where successive server processes hand over their warm caches
+DEFAULT_CACHE_SNAPSHOT = os.path.join(WEATHER_DIR, ".cache_snapshot.json")
+
+# Written into the venv after a successful sync: hash of the files below
+SYNC_STAMP = ".uv-sync-stamp"
+SYNC_INPUTS = ("uv.lock", "pyproject.toml")
+
+
+def venv_python(project_dir: str = WEATHER_DIR) -> str | None:
+    """Interpreter of the project's ``.venv``, if it exists."""
+    bin_dir = "Scripts" if sys.platform == "win32" else "bin"
+    exe = "python.exe" if sys.platform == "win32" else "python"
+    path = os.path.join(project_dir, ".venv", bin_dir, exe)
+    return path if os.path.exists(path) else None
+
+
+def project_hash(project_dir: str = WEATHER_DIR) -> str:
+    """Hash of the project's lockfile and ``pyproject.toml``."""
+    digest = hashlib.sha256()
+    for name in SYNC_INPUTS:
+        try:
+            with open(os.path.join(project_dir, name), "rb") as f:
+                digest.update(f.read())
+        except OSError:
+            pass
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _read_stamp(project_dir: str) -> str | None:
+    try:
+        with open(os.path.join(project_dir, ".venv", SYNC_STAMP)) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def preflight(project_dir: str = WEATHER_DIR) -> str | None:
+    """Make sure the weather venv exists and matches the lockfile; return its interpreter or ``None``.
+
+    Blocks for up to five minutes while ``uv sync`` runs; call it off the event loop.
+    """
+    python = venv_python(project_dir)
+    if shutil.which("uv") is None:
+        return python
+    expected = project_hash(project_dir)
+    if python is not None and _read_stamp(project_dir) == expected:
+        return python
+    try:
+        subprocess.run(
+            ["uv", "sync", "--frozen", "--compile-bytecode", "--project", project_dir],
+            check=True,
+            capture_output=True,
+            timeout=300,
+        )
+    except (OSError, subprocess.SubprocessError):
+        logger.warning("uv sync preflight failed; MCP server will be spawned with uv run", exc_info=True)
+        return None
+    try:
+        with open(os.path.join(project_dir, ".venv", SYNC_STAMP), "w") as f:
+            f.write(expected)
+    except OSError:
+        logger.warning("Could not record the uv sync stamp; the next start will sync again", exc_info=True)
+    return venv_python(project_dir)
+
+
+def weather_server_params(script: str = WEATHER_SCRIPT, sync: bool = False) -> StdioServerParameters:
+    """Stdio parameters for the weather MCP server, skipping ``uv`` when possible.
+
+    ``WEATHER_MCP_PYTHON`` overrides the interpreter (e.g. a prebuilt image's
+    Python); otherwise ``weather/.venv`` is used, after ``preflight`` when
+    ``sync`` is set (blocking).
+    """
+    env = {key: os.environ[key] for key in FORWARDED_ENV if key in os.environ}
+    env.setdefault("WEATHER_CACHE_SNAPSHOT", DEFAULT_CACHE_SNAPSHOT)
+    python = os.getenv("WEATHER_MCP_PYTHON")
+    if not python:
+        project_dir = os.path.dirname(script)
+        python = preflight(project_dir) if sync else venv_python(project_dir)
+    if python:
+        return StdioServerParameters(command=python, args=[script], env=env or None)
+    return StdioServerParameters(
+        command="uv",
+        args=["run", "python", script],
+        env={"UV_NO_CACHE": "1", **env},
+    )
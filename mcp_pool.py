@@ -0,0 +1,365 @@
+"""Warm standby and zero-downtime reload for the weather MCP server.
+
+A single stdio MCP subprocess is a single point of failure: if it dies,
+every tool call fails until a new process has started (and its caches are
+cold), and replacing it for a deploy has the same effect. ``McpServerPool``
+keeps an initialized standby process next to the active one:
+
+- on a failed call whose server no longer answers pings, the standby is
+  promoted, loads the cache snapshot, the call is retried on it, and a new
+  standby is started in the background;
+- on ``reload()`` (``SIGHUP``), the active server saves its caches to the
+  ``WEATHER_CACHE_SNAPSHOT`` file, a fresh process starts from that
+  snapshot, new calls switch to it, and the old process is closed once its
+  in-flight calls have drained.
+
+The pool exposes ``call_tool``/``list_tools`` like an MCP ``ClientSession``,
+so the agent's ``McpTool``s (via ``PooledMcpToolset``) and the backend's own
+``McpToolClient`` share it.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import signal
+from typing import Any
+
+from google.adk.agents.readonly_context import ReadonlyContext
+from google.adk.tools.base_tool import BaseTool
+from google.adk.tools.base_toolset import BaseToolset
+from google.adk.tools.mcp_tool import McpTool
+
+logger = logging.getLogger(__name__)
+
+# Internal weather server tool that saves/loads the warm-cache snapshot
+SNAPSHOT_TOOL = "cache_snapshot_control"
+
+# Tools the agent may call; the snapshot tool stays hidden from the model
+AGENT_TOOLS = ["geocode_location", "get_alerts", "get_forecast"]
+
+
+class _Server:
+    """One weather MCP server process and its initialized client session.
+
+    The stdio transport and session are entered and exited inside a single
+    task, as anyio requires, so the process outlives the call that started it.
+    """
+
+    def __init__(self, server_params, generation: int):
+        self.server_params = server_params
+        self.generation = generation
+        self.session = None
+        self.in_flight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._stop = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    async def start(self, timeout: float) -> "_Server":
+        ready = asyncio.get_running_loop().create_future()
+        self._task = asyncio.create_task(self._run(ready))
+        try:
+            self.session = await asyncio.wait_for(asyncio.shield(ready), timeout)
+        except BaseException:
+            await self.stop()
+            raise
+        return self
+
+    async def _run(self, ready: asyncio.Future) -> None:
+        from mcp import ClientSession
+        from mcp.client.stdio import stdio_client
+
+        try:
+            async with stdio_client(self.server_params) as (read, write):
+                async with ClientSession(read, write) as session:
+                    await session.initialize()
+                    ready.set_result(session)
+                    await self._stop.wait()
+        except Exception as e:
+            if not ready.done():
+                ready.set_exception(e)
+            else:
+                logger.warning("MCP server generation %d exited with an error", self.generation, exc_info=True)
+
+    async def call(self, method: str, *args, **kwargs) -> Any:
+        """Run a session request, failing fast if the server process goes away.
+
+        When the process dies, ``ClientSession`` is meant to fail pending
+        requests with ``CONNECTION_CLOSED``, but if requests are still being
+        sent its receive loop can crash before doing so and leave them
+        waiting forever; racing the request against the server task bounds that.
+        """
+        self.in_flight += 1
+        self._idle.clear()
+        request = asyncio.ensure_future(getattr(self.session, method)(*args, **kwargs))
+        try:
+            await asyncio.wait((request, self._task), return_when=asyncio.FIRST_COMPLETED)
+            if not request.done():
+                raise ConnectionError(f"MCP server generation {self.generation} exited")
+            return request.result()
+        finally:
+            if not request.done():
+                request.cancel()
+            self.in_flight -= 1
+            if self.in_flight == 0:
+                self._idle.set()
+
+    async def alive(self, timeout: float) -> bool:
+        if self.session is None or self._task is None or self._task.done():
+            return False
+        try:
+            await asyncio.wait_for(self.session.send_ping(), timeout)
+        except Exception:
+            return False
+        return True
+
+    async def drain(self, timeout: float) -> bool:
+        """Wait for in-flight calls to finish; ``False`` if some were still running."""
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), 5)
+        except Exception:
+            self._task.cancel()
+
+
+class McpServerPool:
+    """Active + warm standby weather MCP servers with failover and reload."""
+
+    def __init__(
+        self,
+        server_params,
+        standby: bool = True,
+        drain_seconds: float = 30.0,
+        snapshot_seconds: float = 60.0,
+        start_timeout: float = 30.0,
+        ping_timeout: float = 2.0,
+    ):
+        self.server_params = server_params
+        self.standby_enabled = standby
+        self.drain_seconds = drain_seconds
+        self.snapshot_seconds = snapshot_seconds
+        self.start_timeout = start_timeout
+        self.ping_timeout = ping_timeout
+
+        self._active: _Server | None = None
+        self._standby: _Server | None = None
+        self._standby_task: asyncio.Task | None = None
+        self._snapshot_task: asyncio.Task | None = None
+        self._lock = asyncio.Lock()
+        self._reload_lock = asyncio.Lock()
+        self._generation = 0
+
+        # Metrics
+        self._failovers = 0
+        self._cold_failovers = 0
+        self._reloads = 0
+        self._retried_calls = 0
+        self._failed_calls = 0
+        self._undrained = 0
+
+    @classmethod
+    def from_env(cls, server_params) -> "McpServerPool":
+        """Build a pool from ``MCP_*`` environment variables."""
+        return cls(
+            server_params,
+            standby=os.getenv("MCP_STANDBY_ENABLED", "1") == "1",
+            drain_seconds=float(os.getenv("MCP_DRAIN_SECONDS", "30")),
+            snapshot_seconds=float(os.getenv("MCP_SNAPSHOT_SECONDS", "60")),
+        )
+
+    # ----- ClientSession-compatible API -------------------------------------
+
+    async def call_tool(self, name: str, arguments: dict[str, Any] | None = None, **kwargs) -> Any:
+        return await self._call("call_tool", name, arguments, **kwargs)
+
+    async def list_tools(self, *args, **kwargs) -> Any:
+        return await self._call("list_tools", *args, **kwargs)
+
+    async def _call(self, method: str, *args, **kwargs) -> Any:
+        server = await self._active_server()
+        try:
+            return await server.call(method, *args, **kwargs)
+        except Exception:
+            if self._active is server and await server.alive(self.ping_timeout):
+                self._failed_calls += 1
+                raise  # the server is fine; the call itself failed
+        # The weather tools are read-only, so retrying on the new server is safe
+        await self._failover(server)
+        self._retried_calls += 1
+        server = await self._active_server()
+        try:
+            return await server.call(method, *args, **kwargs)
+        except Exception:
+            self._failed_calls += 1
+            raise
+
+    # ----- server lifecycle -------------------------------------------------
+
+    async def _start(self) -> _Server:
+        self._generation += 1
+        return await _Server(self.server_params, self._generation).start(self.start_timeout)
+
+    async def _active_server(self) -> _Server:
+        server = self._active
+        if server is not None:
+            return server
+        async with self._lock:
+            if self._active is None:
+                self._active = await self._start()
+                self._spawn_standby()
+                if self._snapshot_task is None and self.snapshot_seconds > 0:
+                    self._snapshot_task = asyncio.create_task(self._snapshot_loop())
+            return self._active
+
+    def _spawn_standby(self) -> None:
+        if not self.standby_enabled or self._standby is not None:
+            return
+        if self._standby_task is not None and not self._standby_task.done():
+            return
+        self._standby_task = asyncio.create_task(self._start_standby())
+
+    async def _start_standby(self) -> None:
+        try:
+            self._standby = await self._start()
+        except Exception:
+            logger.warning("Could not start standby MCP server", exc_info=True)
+
+    async def _failover(self, failed: _Server) -> None:
+        async with self._lock:
+            if self._active is not failed:
+                return  # another call already swapped servers
+            logger.warning("MCP server generation %d stopped responding; failing over", failed.generation)
+            standby, self._standby = self._standby, None
+            if standby is not None and await standby.alive(self.ping_timeout):
+                self._active = standby
+                self._failovers += 1
+                await self._snapshot(standby, "load")
+            else:
+                if standby is not None:
+                    asyncio.create_task(standby.stop())
+                self._active = await self._start()
+                self._cold_failovers += 1
+            asyncio.create_task(failed.stop())
+            self._spawn_standby()
+
+    async def reload(self) -> None:
+        """Swap to a freshly started server without failing in-flight calls.
+
+        The new process loads the snapshot the old one saves first; the old
+        process keeps serving the calls already sent to it until they finish
+        or ``drain_seconds`` passes.
+        """
+        async with self._reload_lock:
+            old = self._active
+            if old is not None:
+                await self._snapshot(old, "save")
+            new = await self._start()
+            async with self._lock:
+                old, self._active = self._active, new
+                old_standby, self._standby = self._standby, None
+            self._reloads += 1
+            logger.info("MCP server reloaded (generation %d)", new.generation)
+            # The standby runs the previous code too; replace it
+            if old_standby is not None:
+                await old_standby.stop()
+            self._spawn_standby()
+            if old is not None:
+                if not await old.drain(self.drain_seconds):
+                    self._undrained += old.in_flight
+                    logger.warning("Closing MCP server generation %d with %d calls in flight",
+                                   old.generation, old.in_flight)
+                await old.stop()
+
+    def install_reload_signal(self, signum: int | None = None) -> bool:
+        """Reload on ``signum`` (default ``SIGHUP``); needs the running event loop."""
+        signum = signum if signum is not None else getattr(signal, "SIGHUP", None)
+        if signum is None:
+            return False
+        try:
+            asyncio.get_running_loop().add_signal_handler(signum, lambda: asyncio.create_task(self.reload()))
+        except (NotImplementedError, RuntimeError, ValueError):
+            return False
+        return True
+
+    async def _snapshot(self, server: _Server, action: str) -> None:
+        try:
+            result = await server.call("call_tool", SNAPSHOT_TOOL, {"action": action})
+            text = result.content[0].text if result.content else "{}"
+            if "error" in json.loads(text):
+                logger.debug("MCP cache snapshot %s skipped: %s", action, text)
+        except Exception:
+            logger.warning("MCP cache snapshot %s failed", action, exc_info=True)
+
+    async def _snapshot_loop(self) -> None:
+        """Save the active server's caches so a failover starts warm."""
+        while True:
+            await asyncio.sleep(self.snapshot_seconds)
+            if self._active is not None:
+                await self._snapshot(self._active, "save")
+
+    async def close(self) -> None:
+        for task in (self._snapshot_task, self._standby_task):
+            if task is not None:
+                task.cancel()
+        servers = [s for s in (self._active, self._standby) if s is not None]
+        self._active = self._standby = None
+        for server in servers:
+            await server.stop()
+
+    def metrics(self) -> dict[str, Any]:
+        return {
+            "active_generation": self._active.generation if self._active else None,
+            "active_in_flight": self._active.in_flight if self._active else 0,
+            "standby_ready": self._standby is not None,
+            "failovers_total": self._failovers,
+            "cold_failovers_total": self._cold_failovers,
+            "reloads_total": self._reloads,
+            "retried_calls_total": self._retried_calls,
+            "failed_calls_total": self._failed_calls,
+            "undrained_calls_total": self._undrained,
+        }
+
+
+class _PoolSessionManager:
+    """The session manager ``McpTool`` takes: every session is the pool."""
+
+    def __init__(self, pool: McpServerPool):
+        self.pool = pool
+
+    async def create_session(self, headers: dict[str, str] | None = None) -> McpServerPool:
+        return self.pool
+
+    async def close(self) -> None:
+        await self.pool.close()
+
+
+class PooledMcpToolset(BaseToolset):
+    """Weather MCP tools for the agent, called through an ``McpServerPool``.
+
+    Built from ADK's public toolset API: it lists the tools on the pool and
+    wraps each in an ``McpTool`` whose session manager hands out the pool.
+    """
+
+    def __init__(self, pool: McpServerPool, tool_filter: list[str] | None = None):
+        super().__init__(tool_filter=tool_filter if tool_filter is not None else AGENT_TOOLS)
+        self.pool = pool
+        self._session_manager = _PoolSessionManager(pool)
+
+    async def get_tools(self, readonly_context: ReadonlyContext | None = None) -> list[BaseTool]:
+        result = await self.pool.list_tools()
+        tools = [McpTool(mcp_tool=tool, mcp_session_manager=self._session_manager) for tool in result.tools]
+        return [tool for tool in tools if self._is_tool_selected(tool, readonly_context)]
+
+    async def close(self) -> None:
+        await self.pool.close()
@@ -0,0 +1,71 @@
+"""Per-turn prompt size and model latency for the ADK agent.
+
+An ADK plugin that records, for every Gemini call the agent makes, the
+input token count, how much of it was served from the context cache, and
+the time from request to final response. ``GET /metrics`` reports the
+aggregates so prompt changes can be compared before/after.
+"""
+from __future__ import annotations
+
+import time
+from collections import deque
+from typing import Any, Optional
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.adk.plugins.base_plugin import BasePlugin
+
+
+class PromptStatsPlugin(BasePlugin):
+    """Collects input tokens, cached tokens and latency per model turn."""
+
+    def __init__(self, window: int = 500):
+        super().__init__(name="prompt_stats")
+        self._started: dict[str, float] = {}
+        self._turns: deque[tuple[int, int, float]] = deque(maxlen=window)
+        self.turns_total = 0
+
+    async def before_model_callback(
+        self, *, callback_context: CallbackContext, llm_request: LlmRequest
+    ) -> Optional[LlmResponse]:
+        self._started[callback_context.invocation_id] = time.monotonic()
+        return None
+
+    async def after_model_callback(
+        self, *, callback_context: CallbackContext, llm_response: LlmResponse
+    ) -> Optional[LlmResponse]:
+        if llm_response.partial:
+            return None
+        started = self._started.pop(callback_context.invocation_id, None)
+        usage = llm_response.usage_metadata
+        if started is None or usage is None:
+            return None
+        self._turns.append((
+            usage.prompt_token_count or 0,
+            usage.cached_content_token_count or 0,
+            time.monotonic() - started,
+        ))
+        self.turns_total += 1
+        return None
+
+    async def on_model_error_callback(
+        self, *, callback_context: CallbackContext, llm_request: LlmRequest, error: Exception
+    ) -> Optional[LlmResponse]:
+        self._started.pop(callback_context.invocation_id, None)
+        return None
+
+    def metrics(self) -> dict[str, Any]:
+        turns = list(self._turns)
+        if not turns:
+            return {"turns_total": self.turns_total}
+        count = len(turns)
+        prompt = sum(t[0] for t in turns)
+        cached = sum(t[1] for t in turns)
+        return {
+            "turns_total": self.turns_total,
+            "avg_input_tokens_per_turn": round(prompt / count, 1),
+            "avg_cached_tokens_per_turn": round(cached / count, 1),
+            "cached_token_ratio": round(cached / prompt, 4) if prompt else 0.0,
+            "avg_model_latency_ms": round(sum(t[2] for t in turns) / count * 1000, 1),
+        }
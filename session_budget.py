@@ -0,0 +1,309 @@
+"""Memory-bounded in-memory session storage for the ADK agent.
+
+``InMemorySessionService`` keeps every session's full event history
+(including large MCP tool result JSON) resident until the session times out,
+so RSS grows with traffic. ``BoundedSessionService`` keeps the same storage
+but accounts for the serialized size of each session and enforces:
+
+- a per-session byte budget: tool results the model has already answered
+  from are truncated to a short preview, then the oldest whole turns are
+  dropped;
+- a global byte budget: least recently used idle sessions are evicted.
+  Sessions paused on a HITL confirmation (``pending_tool_calls``) are kept.
+
+Evicted sessions are recreated empty on the next request; the frontend
+still has the conversation, only the model's view of earlier turns is lost.
+
+Sizes are tracked incrementally: each event is serialized once when it is
+appended (and again only if its tool results are truncated), and each tool
+result is checked for truncation once, by the first model event after it.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from google.adk.events import Event
+from google.adk.memory.base_memory_service import BaseMemoryService, SearchMemoryResponse
+from google.adk.sessions import InMemorySessionService, Session
+from google.genai import types
+
+logger = logging.getLogger(__name__)
+
+# Characters of a truncated tool result kept for the model's context.
+TOOL_RESULT_PREVIEW_CHARS = 256
+
+
+def _state_bytes(state: dict[str, Any]) -> int:
+    return len(json.dumps(state, default=str))
+
+
+def _event_bytes(event: Event) -> int:
+    return len(event.model_dump_json(exclude_none=True))
+
+
+def _is_user_turn(event: Event) -> bool:
+    """A user text message, i.e. the start of a conversation turn."""
+    if event.author != "user" or not event.content or not event.content.parts:
+        return False
+    return any(part.text for part in event.content.parts) and not event.get_function_responses()
+
+
+def _answers_tool(event: Event) -> bool:
+    """A model event written after the tool results it was given."""
+    return event.author != "user" and bool(event.content and event.content.parts)
+
+
+@dataclass
+class _SessionSize:
+    """Serialized bytes of one session, kept up to date as it changes."""
+
+    state: int = 0
+    events: dict[str, int] = field(default_factory=dict)  # event id -> bytes
+    events_total: int = 0
+    scanned: int = 0  # leading events whose tool results were already checked
+
+    @property
+    def total(self) -> int:
+        return self.state + self.events_total
+
+    def set_event(self, event: Event) -> None:
+        size = _event_bytes(event)
+        self.events_total += size - self.events.get(event.id, 0)
+        self.events[event.id] = size
+
+    def drop_event(self, event: Event) -> None:
+        self.events_total -= self.events.pop(event.id, 0)
+
+
+def _truncated_response(response: dict[str, Any], size: int) -> dict[str, Any]:
+    text = json.dumps(response, default=str)
+    return {
+        "truncated": True,
+        "original_bytes": size,
+        "preview": text[:TOOL_RESULT_PREVIEW_CHARS],
+    }
+
+
+class BoundedSessionService(InMemorySessionService):
+    """InMemorySessionService with per-session and global byte budgets."""
+
+    def __init__(
+        self,
+        max_session_bytes: int = 256 * 1024,
+        max_total_bytes: int = 256 * 1024 * 1024,
+        tool_result_keep_bytes: int = 1024,
+        min_idle_seconds: float = 60.0,
+    ):
+        super().__init__()
+        self.max_session_bytes = max_session_bytes
+        self.max_total_bytes = max_total_bytes
+        self.tool_result_keep_bytes = tool_result_keep_bytes
+        self.min_idle_seconds = min_idle_seconds
+
+        # (app_name, user_id, session_id) -> resident bytes, least recently used first
+        self._sizes: OrderedDict[tuple[str, str, str], int] = OrderedDict()
+        self._accounts: dict[tuple[str, str, str], _SessionSize] = {}
+        self._total = 0
+
+        # Metrics
+        self._evicted = 0
+        self._truncated = 0
+        self._dropped_events = 0
+        self._over_budget = 0
+
+    @classmethod
+    def from_env(cls) -> "BoundedSessionService":
+        """Build a service from ``SESSION_*`` environment variables."""
+        return cls(
+            max_session_bytes=int(os.getenv("SESSION_MAX_BYTES", str(256 * 1024))),
+            max_total_bytes=int(os.getenv("SESSION_MAX_TOTAL_BYTES", str(256 * 1024 * 1024))),
+            tool_result_keep_bytes=int(os.getenv("SESSION_TOOL_RESULT_KEEP_BYTES", "1024")),
+            min_idle_seconds=float(os.getenv("SESSION_MIN_IDLE_SECONDS", "60")),
+        )
+
+    # ----- accounting -------------------------------------------------------
+
+    def _set_size(self, key: tuple[str, str, str], size: int) -> None:
+        self._total += size - self._sizes.pop(key, 0)
+        self._sizes[key] = size
+
+    def _forget(self, key: tuple[str, str, str]) -> None:
+        self._total -= self._sizes.pop(key, 0)
+        self._accounts.pop(key, None)
+
+    def _account(self, key: tuple[str, str, str], storage: Session) -> _SessionSize:
+        """Size record for a stored session, measured in full only when first seen."""
+        account = self._accounts.get(key)
+        if account is None:
+            account = self._accounts[key] = _SessionSize(state=_state_bytes(storage.state))
+            for event in storage.events:
+                account.set_event(event)
+        return account
+
+    def _storage(self, key: tuple[str, str, str]) -> Session | None:
+        app_name, user_id, session_id = key
+        return self.sessions.get(app_name, {}).get(user_id, {}).get(session_id)
+
+    # ----- session service API ----------------------------------------------
+
+    async def create_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        state: Optional[dict[str, Any]] = None,
+        session_id: Optional[str] = None,
+    ) -> Session:
+        session = await super().create_session(
+            app_name=app_name, user_id=user_id, state=state, session_id=session_id
+        )
+        key = (app_name, user_id, session.id)
+        self._accounts.pop(key, None)
+        self._set_size(key, self._account(key, self._storage(key)).total)
+        self._enforce_total(keep=key)
+        return session
+
+    async def get_session(self, *, app_name: str, user_id: str, session_id: str, config=None) -> Session | None:
+        session = await super().get_session(
+            app_name=app_name, user_id=user_id, session_id=session_id, config=config
+        )
+        key = (app_name, user_id, session_id)
+        if session is not None and key in self._sizes:
+            self._sizes.move_to_end(key)
+        return session
+
+    async def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        await super().delete_session(app_name=app_name, user_id=user_id, session_id=session_id)
+        self._forget((app_name, user_id, session_id))
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        event = await super().append_event(session, event)
+        key = (session.app_name, session.user_id, session.id)
+        storage = self._storage(key)
+        if event.partial or storage is None:
+            return event
+
+        account = self._account(key, storage)
+        if storage.events and storage.events[-1] is event and event.id not in account.events:
+            account.set_event(event)
+        if event.actions and event.actions.state_delta:
+            account.state = _state_bytes(storage.state)
+        if _answers_tool(event):
+            self._truncate_tool_results(storage, account)
+        if account.total > self.max_session_bytes:
+            self._drop_oldest_turns(storage, account)
+        self._set_size(key, account.total)
+        self._enforce_total(keep=key)
+        return event
+
+    # ----- budgets ----------------------------------------------------------
+
+    def _truncate_tool_results(self, storage: Session, account: _SessionSize) -> None:
+        """Shrink tool results that a later model event has already consumed.
+
+        Only events appended since the last call are checked; earlier ones
+        were either small enough or already truncated.
+        """
+        end = len(storage.events) - 1
+        for i in range(min(account.scanned, end), end):
+            event = storage.events[i]
+            responses = event.get_function_responses()
+            if not responses:
+                continue
+            oversized = {
+                id(r): size
+                for r in responses
+                if r.response and not r.response.get("truncated")
+                and (size := len(json.dumps(r.response, default=str))) > self.tool_result_keep_bytes
+            }
+            if not oversized:
+                continue
+            # The runner may still hold the original event, so store a copy
+            parts = []
+            for part in event.content.parts:
+                fr = part.function_response
+                if fr is not None and id(fr) in oversized:
+                    part = types.Part(function_response=types.FunctionResponse(
+                        id=fr.id, name=fr.name, response=_truncated_response(fr.response, oversized[id(fr)]),
+                    ))
+                parts.append(part)
+            storage.events[i] = event.model_copy(
+                update={"content": types.Content(role=event.content.role, parts=parts)}
+            )
+            account.set_event(storage.events[i])
+            self._truncated += len(oversized)
+        account.scanned = max(account.scanned, end)
+
+    def _drop_oldest_turns(self, storage: Session, account: _SessionSize) -> None:
+        """Drop whole turns from the front until the session fits its budget."""
+        events = storage.events
+        while account.total > self.max_session_bytes:
+            start = next((i for i in range(1, len(events)) if _is_user_turn(events[i])), None)
+            if start is None:
+                # A single turn larger than the budget; keep it rather than break it
+                self._over_budget += 1
+                break
+            for event in events[:start]:
+                account.drop_event(event)
+            account.scanned = max(0, account.scanned - start)
+            self._dropped_events += start
+            del events[:start]
+
+    def _enforce_total(self, keep: tuple[str, str, str]) -> None:
+        """Evict least recently used idle sessions until under the global budget."""
+        if self._total <= self.max_total_bytes:
+            return
+        now = time.time()
+        for key in list(self._sizes):
+            if self._total <= self.max_total_bytes:
+                return
+            storage = self._storage(key)
+            if key == keep or storage is None:
+                continue
+            if now - storage.last_update_time < self.min_idle_seconds:
+                continue
+            if storage.state.get("pending_tool_calls"):
+                continue  # paused on a HITL confirmation
+            app_name, user_id, session_id = key
+            self._delete_session_impl(app_name=app_name, user_id=user_id, session_id=session_id)
+            self._forget(key)
+            self._evicted += 1
+        if self._total > self.max_total_bytes:
+            logger.warning(
+                "Resident session bytes %d exceed budget %d; no idle sessions to evict",
+                self._total, self.max_total_bytes,
+            )
+
+    def metrics(self) -> dict[str, Any]:
+        return {
+            "sessions": len(self._sizes),
+            "resident_bytes": self._total,
+            "largest_session_bytes": max(self._sizes.values(), default=0),
+            "max_session_bytes": self.max_session_bytes,
+            "max_total_bytes": self.max_total_bytes,
+            "evicted_sessions_total": self._evicted,
+            "truncated_tool_results_total": self._truncated,
+            "dropped_events_total": self._dropped_events,
+            "over_budget_turns_total": self._over_budget,
+        }
+
+
+class DiscardingMemoryService(BaseMemoryService):
+    """Memory service that keeps nothing.
+
+    The session manager copies every expired or evicted session into the
+    memory service; the default in-memory one holds them forever. The agent
+    has no memory tools, so nothing would ever read them back.
+    """
+
+    async def add_session_to_memory(self, session: Session) -> None:
+        return None
+
+    async def search_memory(self, *, app_name: str, user_id: str, query: str) -> SearchMemoryResponse:
+        return SearchMemoryResponse()
@@ -0,0 +1,169 @@
+"""Record runs answered outside the ADK runner in the ADK session.
+
+The fast path and answer-cache hits emit AG-UI events without running the
+ADK agent. ag_ui_adk only forwards messages it has not processed yet to the
+agent, and the agent only sees what is in its session, so such a turn has to
+be written back or the next message replays it: the agent would re-run the
+original question, and a ``confirm_weather_query`` call left pending in the
+session would be submitted again.
+
+``record_turn`` appends the turn to the session as ADK events (user text,
+function calls, function responses, model text), resolves pending HITL tool
+calls the turn answered, tracks tool calls left waiting on the client, and
+marks every message and tool call id of the turn as processed.
+"""
+from __future__ import annotations
+
+import json
+import time
+from typing import Any
+
+from ag_ui.core import AssistantMessage, BaseEvent, EventType, RunAgentInput, ToolMessage, UserMessage
+from google.adk.events import Event
+from google.genai import types
+
+from answer_cache import EVENT_ID_FIELDS
+
+
+def _response_dict(content: Any) -> dict[str, Any]:
+    """A tool result as the ``FunctionResponse.response`` dict ADK stores."""
+    if isinstance(content, str):
+        try:
+            content = json.loads(content)
+        except ValueError:
+            return {"result": content}
+    return content if isinstance(content, dict) else {"result": content}
+
+
+def _tool_names(input: RunAgentInput) -> dict[str, str]:
+    return {
+        call.id: call.function.name
+        for message in input.messages
+        if isinstance(message, AssistantMessage)
+        for call in message.tool_calls or []
+    }
+
+
+def _input_events(input: RunAgentInput, unseen: list[Any]) -> list[Event]:
+    """User text and client tool results this run brought in."""
+    names = _tool_names(input)
+    events: list[Event] = []
+    for message in unseen:
+        if isinstance(message, UserMessage) and isinstance(message.content, str):
+            content = types.Content(role="user", parts=[types.Part(text=message.content)])
+        elif isinstance(message, ToolMessage) and message.tool_call_id in names:
+            content = types.Content(role="user", parts=[types.Part(function_response=types.FunctionResponse(
+                id=message.tool_call_id, name=names[message.tool_call_id],
+                response=_response_dict(message.content),
+            ))])
+        else:
+            continue  # assistant messages were recorded when they were produced
+        events.append(Event(invocation_id=input.run_id, author="user", content=content))
+    return events
+
+
+def _output_events(agent, input: RunAgentInput, emitted: list[BaseEvent]) -> tuple[list[Event], list[str]]:
+    """ADK events for what the run emitted, plus the ids of calls left without a result."""
+    author = agent._adk_agent.name
+    calls: dict[str, list[str]] = {}  # tool call id -> [name, args json]
+    batch: list[str] = []             # calls not yet written to an event
+    answered: set[str] = set()
+    texts: dict[str, list[str]] = {}
+    events: list[Event] = []
+
+    def flush_calls() -> None:
+        if not batch:
+            return
+        parts = []
+        for call_id in batch:
+            name, args = calls[call_id]
+            try:
+                parsed = json.loads(args) if args else {}
+            except ValueError:
+                parsed = {}
+            parts.append(types.Part(function_call=types.FunctionCall(id=call_id, name=name, args=parsed)))
+        events.append(Event(
+            invocation_id=input.run_id, author=author,
+            content=types.Content(role="model", parts=parts),
+            long_running_tool_ids=set(batch),
+        ))
+        batch.clear()
+
+    for event in emitted:
+        if event.type == EventType.TOOL_CALL_START:
+            calls[event.tool_call_id] = [event.tool_call_name, ""]
+            batch.append(event.tool_call_id)
+        elif event.type == EventType.TOOL_CALL_ARGS and event.tool_call_id in calls:
+            calls[event.tool_call_id][1] += event.delta
+        elif event.type == EventType.TOOL_CALL_RESULT and event.tool_call_id in calls:
+            flush_calls()
+            answered.add(event.tool_call_id)
+            events.append(Event(
+                invocation_id=input.run_id, author=author,
+                content=types.Content(role="user", parts=[types.Part(function_response=types.FunctionResponse(
+                    id=event.tool_call_id, name=calls[event.tool_call_id][0],
+                    response=_response_dict(event.content),
+                ))]),
+            ))
+        elif event.type in (EventType.TEXT_MESSAGE_CONTENT, EventType.TEXT_MESSAGE_CHUNK) and event.delta:
+            flush_calls()
+            texts.setdefault(event.message_id, []).append(event.delta)
+        elif event.type == EventType.TEXT_MESSAGE_END and event.message_id in texts:
+            events.append(Event(
+                invocation_id=input.run_id, author=author,
+                content=types.Content(role="model", parts=[types.Part(text="".join(texts.pop(event.message_id)))]),
+            ))
+    flush_calls()
+    for message_id, chunks in texts.items():  # unterminated text messages
+        events.append(Event(
+            invocation_id=input.run_id, author=author,
+            content=types.Content(role="model", parts=[types.Part(text="".join(chunks))]),
+        ))
+
+    # Calls without a result wait on the client (confirm_weather_query)
+    waiting = [call_id for call_id in calls if call_id not in answered]
+    for adk_event in events:
+        if adk_event.long_running_tool_ids is not None:
+            adk_event.long_running_tool_ids &= set(waiting)
+    return events, waiting
+
+
+async def record_turn(agent, input: RunAgentInput, emitted: list[BaseEvent]) -> None:
+    """Write a run ``agent`` did not execute into its ADK session.
+
+    ``agent`` is the ``ADKAgent`` serving the thread; ``emitted`` is every
+    event the run sent to the client.
+    """
+    app_name = agent._get_app_name(input)
+    user_id = agent._get_user_id(input)
+    session_manager = agent._session_manager
+
+    unseen = await agent._get_unseen_messages(input)
+    session = await agent._ensure_session_exists(app_name, user_id, input.thread_id, input.state)
+    output, waiting = _output_events(agent, input, emitted)
+    for event in _input_events(input, unseen) + output:
+        event.timestamp = time.time()
+        await session_manager._session_service.append_event(session, event)
+
+    # HITL calls this run answered are no longer pending; new ones are
+    resolved = [m.tool_call_id for m in unseen if isinstance(m, ToolMessage)]
+    for tool_call_id in resolved:
+        await agent._remove_pending_tool_call(input.thread_id, tool_call_id)
+    for tool_call_id in waiting:
+        await agent._add_pending_tool_call_with_context(input.thread_id, tool_call_id, app_name, user_id)
+    if resolved and not await agent._has_pending_tool_calls(input.thread_id):
+        # The execution suspended on the answered confirmation is finished
+        async with agent._execution_lock:
+            execution = agent._active_executions.get(input.thread_id)
+            if execution is not None and execution.is_complete:
+                del agent._active_executions[input.thread_id]
+
+    # Tool messages are matched on their tool call id as well; calls still
+    # waiting on the client must stay unseen until their result arrives.
+    ids = {m.id for m in input.messages if m.id}
+    for event in emitted:
+        for name in EVENT_ID_FIELDS:
+            value = getattr(event, name, None)
+            if value:
+                ids.add(value)
+    session_manager.mark_messages_processed(app_name, input.thread_id, ids - set(waiting))
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""Unit tests for the agent endpoint's admission controller."""
+import asyncio
+import sys
+
+import pytest
+
+from admission import PRIORITY_RESUME, AdmissionController, AdmissionRejected, is_hitl_resume
+
+
+async def _pending(controller, user_id, priority=1):
+    """Start an ``acquire`` and let it reach the queue."""
+    task = asyncio.create_task(controller.acquire(user_id, priority))
+    await asyncio.sleep(0)
+    return task
+
+
+def test_admits_up_to_the_global_limit():
+    async def scenario():
+        controller = AdmissionController(max_concurrent_runs=2, max_runs_per_user=2)
+        await controller.acquire("a")
+        await controller.acquire("b")
+        third = await _pending(controller, "c")
+        assert not third.done() and controller.queue_depth == 1
+        controller.release("a")
+        await asyncio.wait_for(third, 1)
+        assert controller.running == 2 and controller.queue_depth == 0
+
+    asyncio.run(scenario())
+
+
+def test_user_over_their_limit_does_not_block_others():
+    """A queued run blocked only by its user's cap must not hold up other users."""
+    async def scenario():
+        controller = AdmissionController(max_concurrent_runs=8, max_runs_per_user=2, max_wait_seconds=1)
+        await controller.acquire("a")
+        await controller.acquire("a")
+        a_third = await _pending(controller, "a")
+        assert not a_third.done()
+
+        await asyncio.wait_for(controller.acquire("b"), 0.5)
+        assert controller.running == 3 and controller.queue_depth == 1
+
+        controller.release("a")
+        await asyncio.wait_for(a_third, 1)
+        assert controller.queue_depth == 0
+
+    asyncio.run(scenario())
+
+
+def test_resumes_jump_the_queue():
+    async def scenario():
+        controller = AdmissionController(max_concurrent_runs=1, max_runs_per_user=1)
+        await controller.acquire("a")
+        normal = await _pending(controller, "b")
+        resume = await _pending(controller, "c", PRIORITY_RESUME)
+        controller.release("a")
+        await asyncio.wait_for(resume, 1)
+        assert not normal.done()
+        controller.release("c")
+        await asyncio.wait_for(normal, 1)
+
+    asyncio.run(scenario())
+
+
+def test_sheds_load_when_queues_are_full():
+    async def scenario():
+        controller = AdmissionController(
+            max_concurrent_runs=1, max_runs_per_user=1, max_queue_depth=2, max_queued_per_user=1
+        )
+        await controller.acquire("a")
+        queued = [await _pending(controller, "b"), await _pending(controller, "c")]
+
+        with pytest.raises(AdmissionRejected) as per_user:
+            await controller.acquire("b")
+        assert per_user.value.status_code == 429
+
+        with pytest.raises(AdmissionRejected) as full:
+            await controller.acquire("d")
+        assert full.value.status_code == 503 and full.value.retry_after >= 1
+
+        # Resumes are never shed for queue depth
+        resume = await _pending(controller, "e", PRIORITY_RESUME)
+        assert not resume.done()
+
+        for task in (*queued, resume):
+            task.cancel()
+        await asyncio.gather(*queued, resume, return_exceptions=True)
+        assert controller.queue_depth == 0
+        metrics = controller.metrics()
+        assert metrics["rejected_429_total"] == 1 and metrics["rejected_503_total"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_times_out_waiting_for_a_slot():
+    async def scenario():
+        controller = AdmissionController(max_concurrent_runs=1, max_wait_seconds=0.05)
+        await controller.acquire("a")
+        with pytest.raises(AdmissionRejected) as timed_out:
+            await controller.acquire("b")
+        assert timed_out.value.status_code == 503
+        assert controller.queue_depth == 0 and controller.metrics()["queue_timeouts_total"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_is_hitl_resume():
+    confirm = {"role": "assistant", "toolCalls": [{"id": "t1", "function": {"name": "confirm_weather_query"}}]}
+    other = {"role": "assistant", "toolCalls": [{"id": "t2", "function": {"name": "get_forecast"}}]}
+    assert is_hitl_resume({"messages": [confirm, {"role": "tool", "toolCallId": "t1"}]})
+    assert not is_hitl_resume({"messages": [other, {"role": "tool", "toolCallId": "t2"}]})
+    assert not is_hitl_resume({"messages": [{"role": "user", "content": "hi"}]})
+
+
+@pytest.mark.parametrize("body, resume", [
+    ([], False), ("x", False), (None, False), ({"messages": "x"}, False), ({"messages": [1]}, False),
+    # A trailing tool result is still a resume when the rest is unreadable
+    ({"messages": [1, {"role": "tool", "toolCallId": "t1"}]}, True),
+    ({"messages": [{"role": "assistant", "toolCalls": "x"}, {"role": "tool", "toolCallId": "t1"}]}, True),
+])
+def test_is_hitl_resume_tolerates_malformed_bodies(body, resume):
+    assert is_hitl_resume(body) is resume
+
+
+def test_middleware_passes_malformed_bodies_through():
+    """A non-object body reaches the endpoint (which answers 422) instead of failing with a 500."""
+    from starlette.applications import Starlette
+    from starlette.responses import JSONResponse
+    from starlette.routing import Route
+    from starlette.testclient import TestClient
+
+    from admission import AdmissionMiddleware
+
+    async def endpoint(request):
+        return JSONResponse({"detail": "invalid"}, status_code=422)
+
+    app = Starlette(routes=[Route("/", endpoint, methods=["POST"])])
+    app.add_middleware(AdmissionMiddleware, controller=AdmissionController(), path="/")
+    client = TestClient(app)
+    for body in ([], {"messages": "x"}, {"messages": [1]}):
+        assert client.post("/", json=body).status_code == 422
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
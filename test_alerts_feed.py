@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""Unit tests for per-thread alert deltas and their interaction with the answer cache."""
+import asyncio
+import json
+import sys
+
+import pytest
+from ag_ui.core import (
+    EventType,
+    RunAgentInput,
+    TextMessageContentEvent,
+    ToolCallResultEvent,
+    ToolCallStartEvent,
+    ToolMessage,
+)
+
+from alerts_feed import AlertsFeed, diff_alerts, mcp_result
+from answer_cache import AnswerCache, cached_run
+
+
+def _alert(alert_id, event="Heat Advisory", replaces=()):
+    return {"id": alert_id, "event": event, "area": "Travis", "severity": "Moderate",
+            "description": f"{event} in effect.", "replaces": list(replaces)}
+
+
+def test_diff_alerts():
+    delivered = {"a": _alert("a"), "b": _alert("b"), "c": _alert("c")}
+    current = [_alert("a"), _alert("b", "Excessive Heat Warning"), _alert("c2", replaces=["c"]), _alert("d")]
+    new, updated, unchanged, expired = diff_alerts(delivered, current)
+    assert [a["id"] for a in new] == ["d"]
+    assert [a["id"] for a in updated] == ["b", "c2"]
+    assert [a["id"] for a in unchanged] == ["a"]
+    assert expired == []
+
+    _, _, _, expired = diff_alerts(delivered, [_alert("a")])
+    assert [a["id"] for a in expired] == ["b", "c"]
+
+
+def test_each_thread_gets_its_own_delta():
+    active = [_alert("a"), _alert("b")]
+
+    async def fetch(state):
+        return list(active)
+
+    async def scenario():
+        feed = AlertsFeed(fetch)
+        first = await feed.tool_result("thread-1", "tx")
+        assert [a["id"] for a in first["new"]] == ["a", "b"]
+
+        again = await feed.tool_result("thread-1", "TX")
+        assert "new" not in again and [a["id"] for a in again["unchanged"]] == ["a", "b"]
+
+        other = await feed.tool_result("thread-2", "TX")
+        assert [a["id"] for a in other["new"]] == ["a", "b"]
+        assert feed.metrics()["upstream_fetches_total"] == 1
+
+    asyncio.run(scenario())
+
+
+def _confirmed_input(thread_id, actions):
+    answer = {"accepted": True, "selected_actions": actions, "latitude": 30.27, "longitude": -97.74,
+              "state_code": "TX"}
+    return RunAgentInput(
+        thread_id=thread_id, run_id=f"run-{thread_id}", state={}, tools=[], context=[],
+        messages=[ToolMessage(id=f"msg-{thread_id}", role="tool", tool_call_id="confirm", content=json.dumps(answer))],
+        forwarded_props={"answerCache": True},
+    )
+
+
+def _run_with(tool_name, payload):
+    async def run(input):
+        yield ToolCallStartEvent(type=EventType.TOOL_CALL_START, tool_call_id="t1", tool_call_name=tool_name)
+        yield ToolCallResultEvent(type=EventType.TOOL_CALL_RESULT, message_id="m1", tool_call_id="t1",
+                                  content=json.dumps(mcp_result(payload)))
+        yield TextMessageContentEvent(type=EventType.TEXT_MESSAGE_CONTENT, message_id="m2", delta="Summary.")
+    return run
+
+
+async def _collect(cache, run, input):
+    return [event async for event in cached_run(cache, run, input)]
+
+
+@pytest.mark.parametrize("actions", [["alerts"], ["forecast", "alerts"]])
+def test_answers_with_alerts_are_not_cached(actions):
+    async def scenario():
+        cache = AnswerCache()
+        run = _run_with("get_alerts", {"state": "TX", "new": [_alert("a")]})
+        await _collect(cache, run, _confirmed_input("thread-1", actions))
+        await _collect(cache, run, _confirmed_input("thread-2", actions))
+        assert cache.metrics()["entries"] == 0 and cache.metrics()["hits_total"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_get_alerts_results_are_never_stored():
+    """Even a forecast-only answer is not stored if the model called ``get_alerts``."""
+    async def scenario():
+        cache = AnswerCache()
+        await _collect(cache, _run_with("get_alerts", {"state": "TX"}), _confirmed_input("thread-1", ["forecast"]))
+        assert cache.metrics()["entries"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_forecast_answers_are_cached():
+    async def scenario():
+        cache = AnswerCache()
+        run = _run_with("get_forecast", {"location": "Austin, TX", "periods": []})
+        await _collect(cache, run, _confirmed_input("thread-1", ["forecast"]))
+        await _collect(cache, run, _confirmed_input("thread-2", ["forecast"]))
+        assert cache.metrics()["hits_total"] == 1
+
+    asyncio.run(scenario())
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""Follow-up turns after runs that did not go through the ADK runner.
+
+Drives ``backend_tool_rendering.weather_adk_agent`` in-process with the
+scripted model and fake tools from ``load_test_hitl.py``: a conversation is
+answered from the answer cache or the fast path, then the user asks a
+follow-up. The agent must see the earlier turn in its session and handle
+only the new message.
+"""
+import asyncio
+import json
+import sys
+import uuid
+from typing import ClassVar
+
+import pytest
+from ag_ui.core import (
+    AssistantMessage, EventType, FunctionCall, RunAgentInput, Tool, ToolCall, ToolMessage, UserMessage,
+)
+
+import load_test_hitl
+from alerts_feed import mcp_result
+from fast_path import FastPathRouter
+from load_test_hitl import HITL_TOOL_NAME, ScriptedLlm, backend, install_stubs
+
+agent = backend.weather_adk_agent
+
+
+class RecordingLlm(ScriptedLlm):
+    """ScriptedLlm that keeps the contents of every request it gets."""
+
+    requests: ClassVar[list] = []
+
+    async def generate_content_async(self, llm_request, stream=False):
+        RecordingLlm.requests.append(list(llm_request.contents))
+        async for response in super().generate_content_async(llm_request, stream):
+            yield response
+
+
+def setup_module():
+    install_stubs(llm_latency=0, upstream_latency=0)
+    agent._adk_agent = agent._adk_agent.model_copy(update={"model": RecordingLlm(model="scripted", latency=0)})
+
+
+def _id():
+    return uuid.uuid4().hex[:12]
+
+
+class Conversation:
+    """One thread, holding the message history the frontend would keep."""
+
+    def __init__(self, answer_cache=False):
+        self.thread_id = f"thread-{_id()}"
+        self.messages = []
+        self.answer_cache = answer_cache
+
+    async def send(self, message):
+        self.messages.append(message)
+        input = RunAgentInput(
+            thread_id=self.thread_id, run_id=f"run-{_id()}", state={}, messages=list(self.messages),
+            tools=[], context=[], forwarded_props={"answerCache": self.answer_cache},
+        )
+        events = [event async for event in agent.run(input)]
+        assert events[-1].type == EventType.RUN_FINISHED, events[-1]
+        self._append_history(events)
+        return events
+
+    async def ask(self, text):
+        return await self.send(UserMessage(id=f"msg-{_id()}", role="user", content=text))
+
+    async def confirm(self, events, actions=("forecast",)):
+        call = next(e for e in events if e.type == EventType.TOOL_CALL_START and e.tool_call_name == HITL_TOOL_NAME)
+        args = json.loads("".join(e.delta for e in events
+                                  if e.type == EventType.TOOL_CALL_ARGS and e.tool_call_id == call.tool_call_id))
+        answer = {"accepted": True, "selected_actions": list(actions),
+                  **{k: args.get(k) for k in ("latitude", "longitude", "state_code", "display_name")}}
+        return await self.send(ToolMessage(id=f"msg-{_id()}", role="tool", tool_call_id=call.tool_call_id,
+                                           content=json.dumps(answer)))
+
+    def _append_history(self, events):
+        """Rebuild assistant and tool messages from the run's events, as the client does."""
+        assistants, calls, results = {}, {}, []
+        for event in events:
+            if event.type == EventType.TOOL_CALL_START:
+                message_id = event.parent_message_id or event.tool_call_id
+                assistants.setdefault(message_id, {"content": "", "calls": []})["calls"].append(event.tool_call_id)
+                calls[event.tool_call_id] = [event.tool_call_name, ""]
+            elif event.type == EventType.TOOL_CALL_ARGS:
+                calls[event.tool_call_id][1] += event.delta
+            elif event.type == EventType.TOOL_CALL_RESULT:
+                results.append(ToolMessage(id=event.message_id, role="tool", tool_call_id=event.tool_call_id,
+                                           content=event.content))
+            elif event.type == EventType.TEXT_MESSAGE_CONTENT:
+                assistants.setdefault(event.message_id, {"content": "", "calls": []})["content"] += event.delta
+        for message_id, message in assistants.items():
+            tool_calls = [ToolCall(id=c, type="function", function=FunctionCall(name=calls[c][0], arguments=calls[c][1]))
+                          for c in message["calls"]]
+            self.messages.append(AssistantMessage(id=message_id, role="assistant",
+                                                  content=message["content"] or None, tool_calls=tool_calls or None))
+        self.messages.extend(results)
+
+
+def _tool_calls(events):
+    return [e.tool_call_name for e in events if e.type == EventType.TOOL_CALL_START]
+
+
+def _function_responses(contents):
+    return [p.function_response.name for c in contents for p in c.parts or [] if p.function_response]
+
+
+class FakeToolClient:
+    """``McpToolClient`` stand-in backed by the load test's fake tools."""
+
+    async def call_tool(self, name, arguments, progress_callback=None):
+        payload = await getattr(load_test_hitl, name)(**arguments)
+        return json.dumps(mcp_result(payload))
+
+
+async def _summary(question, results):
+    yield "It's 22°C (72°F) and partly cloudy."
+
+
+async def _pending_tool_calls(thread_id):
+    return await agent._get_pending_tool_call_ids(thread_id) or []
+
+
+def test_follow_up_after_answer_cache_hit():
+    async def scenario():
+        # Populate the cache from one conversation
+        first = Conversation(answer_cache=True)
+        await first.confirm(await first.ask("What's the weather in Austin?"))
+
+        hits = agent.answer_cache.metrics()["hits_total"]
+        second = Conversation(answer_cache=True)
+        replayed = await second.confirm(await second.ask("What's the weather in Austin?"))
+        assert agent.answer_cache.metrics()["hits_total"] == hits + 1
+        assert "get_forecast" in _tool_calls(replayed)
+        assert await _pending_tool_calls(second.thread_id) == []
+
+        RecordingLlm.requests.clear()
+        follow_up = await second.ask("Is it windy?")
+        contents = RecordingLlm.requests[0]
+        assert contents[-1].parts[0].text == "Is it windy?"
+        # The replayed answer is in the model's context and the confirmation
+        # is not submitted a second time
+        responses = _function_responses(contents)
+        assert responses.count(HITL_TOOL_NAME) == 1 and "get_forecast" in responses
+        assert "get_forecast" not in _tool_calls(follow_up)
+
+    asyncio.run(scenario())
+
+
+def test_follow_up_after_fast_path():
+    async def scenario():
+        router = FastPathRouter(FakeToolClient())
+        router._summarize = _summary
+        agent.fast_path = router
+        try:
+            conversation = Conversation()
+            await conversation.confirm(await conversation.ask("What's the weather in Austin?"))
+            metrics = router.metrics()
+            assert metrics["fast_path_intent_runs"] == 1 and metrics["fast_path_resume_runs"] == 1
+            assert await _pending_tool_calls(conversation.thread_id) == []
+
+            RecordingLlm.requests.clear()
+            follow_up = await conversation.ask("Is it windy?")
+        finally:
+            agent.fast_path = None
+
+        # The agent handles only the new message, with the fast-path turn as context
+        contents = RecordingLlm.requests[0]
+        texts = [p.text for c in contents for p in c.parts or [] if p.text]
+        assert texts[0] == "What's the weather in Austin?" and texts[-1] == "Is it windy?"
+        assert texts.count("What's the weather in Austin?") == 1
+        responses = _function_responses(contents)
+        assert responses == ["geocode_location", HITL_TOOL_NAME, "get_forecast"]
+        assert router.metrics()["fallback_runs_total"] == 1
+        assert "get_forecast" not in _tool_calls(follow_up)
+
+    asyncio.run(scenario())
+
+
+def test_agent_resumes_a_fast_path_confirmation():
+    """A confirmation the fast path no longer tracks is answered by the agent."""
+    async def scenario():
+        router = FastPathRouter(FakeToolClient())
+        agent.fast_path = router
+        try:
+            conversation = Conversation()
+            intent = await conversation.ask("What's the weather in Austin?")
+            assert len(await _pending_tool_calls(conversation.thread_id)) == 1
+            router._pending.clear()  # e.g. evicted, or the backend restarted
+
+            RecordingLlm.requests.clear()
+            resumed = await conversation.confirm(intent)
+        finally:
+            agent.fast_path = None
+
+        assert _function_responses(RecordingLlm.requests[0]) == ["geocode_location", HITL_TOOL_NAME]
+        assert _tool_calls(resumed) == ["get_forecast"]
+        assert await _pending_tool_calls(conversation.thread_id) == []
+
+    asyncio.run(scenario())
+
+
+def _confirmation_answer(conversation, events, answer):
+    call = next(e for e in events if e.type == EventType.TOOL_CALL_START and e.tool_call_name == HITL_TOOL_NAME)
+    conversation.messages.append(ToolMessage(id=f"msg-{_id()}", role="tool", tool_call_id=call.tool_call_id,
+                                             content=answer))
+    return RunAgentInput(
+        thread_id=conversation.thread_id, run_id=f"run-{_id()}", state={}, messages=list(conversation.messages),
+        tools=[], context=[], forwarded_props={},
+    )
+
+
+def test_fast_path_rejects_a_malformed_confirmation():
+    async def scenario():
+        router = FastPathRouter(FakeToolClient())
+        agent.fast_path = router
+        try:
+            conversation = Conversation()
+            input = _confirmation_answer(conversation, await conversation.ask("What's the weather in Austin?"), "true")
+            events = [event async for event in agent.run(input)]
+        finally:
+            agent.fast_path = None
+
+        assert events[0].type == EventType.RUN_STARTED
+        assert events[-1].type == EventType.RUN_ERROR and events[-1].code == "INVALID_CONFIRMATION"
+        assert _tool_calls(events) == []
+
+    asyncio.run(scenario())
+
+
+def test_fast_path_resume_falls_back_to_the_confirmed_location():
+    """An answer without usable coordinates uses the ones the user was asked to confirm."""
+    async def scenario():
+        router = FastPathRouter(FakeToolClient())
+        router._summarize = _summary
+        agent.fast_path = router
+        calls = []
+        call_tool = FakeToolClient.call_tool
+
+        async def recording_call_tool(self, name, arguments, progress_callback=None):
+            calls.append((name, arguments))
+            return await call_tool(self, name, arguments, progress_callback)
+
+        FakeToolClient.call_tool = recording_call_tool
+        try:
+            conversation = Conversation()
+            intent = await conversation.ask("What's the weather in Austin?")
+            call = next(e for e in intent if e.type == EventType.TOOL_CALL_START
+                        and e.tool_call_name == HITL_TOOL_NAME)
+            confirm_args = json.loads("".join(e.delta for e in intent if e.type == EventType.TOOL_CALL_ARGS
+                                              and e.tool_call_id == call.tool_call_id))
+            answer = json.dumps({"accepted": True, "selected_actions": ["forecast"], "latitude": True})
+            events = [event async for event in agent.run(_confirmation_answer(conversation, intent, answer))]
+        finally:
+            FakeToolClient.call_tool = call_tool
+            agent.fast_path = None
+
+        assert events[-1].type == EventType.RUN_FINISHED
+        assert calls[-1] == ("get_forecast", {"latitude": confirm_args["latitude"],
+                                              "longitude": confirm_args["longitude"]})
+
+    asyncio.run(scenario())
+
+
+def test_backend_confirm_tool_replaces_the_frontend_declaration():
+    frontend_confirm = Tool(name=HITL_TOOL_NAME, description="Confirm", parameters={"type": "object"})
+    other = Tool(name="change_theme", description="Change the theme color", parameters={"type": "object"})
+    input = RunAgentInput(thread_id="t", run_id="r", state={}, messages=[], tools=[frontend_confirm, other],
+                          context=[], forwarded_props={})
+
+    tools = backend.with_confirm_tool(input).tools
+    assert [t.name for t in tools] == ["change_theme", HITL_TOOL_NAME]
+    assert tools[0] == other
+    confirm = backend.CONFIRM_WEATHER_TOOL["function"]
+    assert tools[1].parameters == confirm["parameters"] and tools[1].description == confirm["description"]
+    assert input.tools == [frontend_confirm, other]  # the request itself is left alone
+
+    assert [t.name for t in backend.with_confirm_tool(input.model_copy(update={"tools": []})).tools] == [HITL_TOOL_NAME]
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
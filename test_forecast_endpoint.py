@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""Request validation of the backend's ``POST /forecast`` route."""
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+from starlette.testclient import TestClient
+
+os.environ.setdefault("GEMINI_API_KEY", "test")  # never used: no model is called
+import backend_tool_rendering as backend  # noqa: E402
+
+
+@pytest.fixture
+def client(monkeypatch):
+    calls = []
+
+    async def call_tool(name, arguments=None, **kwargs):
+        calls.append((name, arguments))
+        return SimpleNamespace(content=[SimpleNamespace(text='{"conditions":"clear"}')], isError=False)
+
+    monkeypatch.setattr(backend.mcp_pool, "call_tool", call_tool)
+    return TestClient(backend.app), calls
+
+
+def test_forecast_calls_the_pooled_server(client):
+    http, calls = client
+    response = http.post("/forecast", json={"latitude": 30.27, "longitude": -97})
+    assert response.status_code == 200 and response.json() == {"result": '{"conditions":"clear"}'}
+    assert calls == [("get_forecast", {"latitude": 30.27, "longitude": -97})]
+
+
+@pytest.mark.parametrize("body", [
+    [30.27, -97.74],
+    "Austin",
+    {"latitude": 30.27},
+    {"latitude": True, "longitude": -97.74},
+    {"latitude": "30.27", "longitude": -97.74},
+    {"latitude": 91, "longitude": -97.74},
+    {"latitude": 30.27, "longitude": -180.5},
+])
+def test_forecast_rejects_bad_coordinates(client, body):
+    http, calls = client
+    response = http.post("/forecast", json=body)
+    assert response.status_code == 400 and "error" in response.json()
+    assert calls == []
+
+
+@pytest.mark.parametrize("content", [b"{not json", b"\xff\xfe", b""])
+def test_forecast_rejects_invalid_json(client, content):
+    http, calls = client
+    response = http.post("/forecast", content=content, headers={"content-type": "application/json"})
+    assert response.status_code == 400
+    assert calls == []
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
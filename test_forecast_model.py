@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""Unit tests for the parsed NWS forecast model and get_forecast's progress stages."""
+import asyncio
+import json
+import sys
+
+import pytest
+
+from mcp_launch import WEATHER_DIR
+
+sys.path.insert(0, WEATHER_DIR)
+import weather  # noqa: E402
+from forecast_model import Forecast, fahrenheit_to_celsius, feels_like_f, mph_to_kmh, parse_wind  # noqa: E402
+from grid_cache import GridCache  # noqa: E402
+
+FORECAST = {
+    "geometry": None,
+    "properties": {
+        "updateTime": "2025-07-01T10:00:00+00:00",
+        "periods": [
+            {"name": "This Afternoon", "startTime": "2025-07-01T12:00:00-05:00", "endTime": "2025-07-01T18:00:00-05:00",
+             "temperature": 95, "temperatureUnit": "F", "windSpeed": "5 to 10 mph", "windDirection": "S",
+             "probabilityOfPrecipitation": {"unitCode": "wmoUnit:percent", "value": 20},
+             "shortForecast": "Sunny", "detailedForecast": "Sunny, with a high near 95."},
+            {"name": "Tonight", "startTime": "2025-07-01T18:00:00-05:00", "endTime": "2025-07-02T06:00:00-05:00",
+             "temperature": 40, "temperatureUnit": "F", "windSpeed": "15 mph", "windDirection": "N",
+             "shortForecast": "Rain Showers", "detailedForecast": "Rain showers likely."},
+        ],
+    },
+}
+
+HOURLY = {"properties": {"periods": [
+    {"startTime": "2025-07-01T12:00:00-05:00", "relativeHumidity": {"value": 50}},
+    {"startTime": "2025-07-01T18:00:00-05:00", "relativeHumidity": {"value": 80}},
+]}}
+
+
+def test_conversions():
+    assert fahrenheit_to_celsius([32, 212]) == [0, 100]
+    assert mph_to_kmh([10]) == [pytest.approx(16.09344)]
+    assert parse_wind("5 to 10 mph") == (5, 10)
+    assert parse_wind("16 km/h") == (10, 10)
+    assert parse_wind(None) == (0, 0)
+
+
+def test_parses_periods():
+    forecast = Forecast.from_nws(FORECAST, "Austin, TX", HOURLY)
+    afternoon, tonight = forecast.periods
+    assert afternoon.temperature_c == 35.0 and afternoon.wind_max_kmh == 16.1
+    assert afternoon.precipitation == 20 and afternoon.humidity == 50
+    assert (afternoon.conditions, tonight.conditions) == ("clear", "rain")
+    assert afternoon.feels_like_c == round((feels_like_f(95, 50, 10) - 32) * 5 / 9, 1)
+    assert tonight.feels_like_c < tonight.temperature_c  # wind chill
+    assert forecast.current_summary()["validUntil"] == "2025-07-01T18:00:00-05:00"
+
+
+def test_hourly_data_can_arrive_later():
+    forecast = Forecast.from_nws(FORECAST, "Austin, TX")
+    before = json.loads(forecast.to_json())
+    assert "humidity" not in before and forecast.current.feels_like_c == forecast.current.temperature_c
+
+    forecast.add_hourly(HOURLY)
+    after = json.loads(forecast.to_json())
+    assert after["humidity"] == 50 and after["feelsLike"] > after["temperature"]
+    assert forecast.to_json() == Forecast.from_nws(FORECAST, "Austin, TX", HOURLY).to_json()
+
+
+def test_missing_temperature_stays_unknown():
+    data = json.loads(json.dumps(FORECAST))
+    del data["properties"]["periods"][0]["temperature"]
+    forecast = Forecast.from_nws(data, "Austin, TX", HOURLY)
+    afternoon, tonight = forecast.periods
+    assert afternoon.temperature_f is None and afternoon.temperature_c is None and afternoon.feels_like_c is None
+    assert tonight.temperature_c == 4.4 and tonight.feels_like_c < tonight.temperature_c
+    assert afternoon.summary()["temperature"] is None
+    result = json.loads(forecast.to_json())
+    assert not {"temperature", "temperature_f", "feelsLike"} & set(result)
+    assert result["conditions"] == "clear" and result["periods"][1]["temperature"] == 40
+    assert feels_like_f(None, 50, 10) is None
+
+
+class RecordingContext:
+    """Stands in for FastMCP's ``Context``, recording progress stages."""
+
+    def __init__(self):
+        self.stages = []
+        self.current_reported = asyncio.Event()
+
+    async def report_progress(self, progress, total, message):
+        stage = json.loads(message)["stage"]
+        self.stages.append(stage)
+        if stage == "current":
+            self.current_reported.set()
+
+
+def test_current_conditions_do_not_wait_for_the_hourly_forecast(monkeypatch):
+    ctx = RecordingContext()
+    points = {"properties": {
+        "gridId": "EWX", "gridX": 156, "gridY": 91,
+        "forecast": "https://nws.test/forecast", "forecastHourly": "https://nws.test/forecast/hourly",
+        "relativeLocation": {"properties": {"city": "Austin", "state": "TX"}},
+    }}
+
+    async def fake_request(url):
+        if url.endswith("/hourly"):
+            await ctx.current_reported.wait()  # would deadlock if "current" waited for it
+            return HOURLY
+        return FORECAST if url.endswith("/forecast") else points
+
+    monkeypatch.setattr(weather, "make_nws_request", fake_request)
+    monkeypatch.setattr(weather, "grid_cache", GridCache())
+    result = asyncio.run(asyncio.wait_for(weather.get_forecast(30.2672, -97.7431, ctx), 2))
+
+    assert ctx.stages == ["location", "current", "periods"]
+    assert json.loads(result)["humidity"] == 50
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""get_forecast progress notifications, from the MCP server to agent state deltas.
+
+The fast path turns each progress notification into a ``STATE_DELTA`` patch
+on ``/forecast_progress``. A stub tool client covers the patch contents and
+dropped or unreadable progress; the last test runs the real weather server's
+``get_forecast`` in-process over MCP memory streams with NWS stubbed out.
+"""
+import asyncio
+import json
+import sys
+
+import pytest
+from ag_ui.core import EventType
+from mcp.shared.memory import create_connected_server_and_client_session
+
+from fast_path import FORECAST_PROGRESS_STATE_KEY, FastPathRouter, McpToolClient
+from mcp_launch import WEATHER_DIR
+
+sys.path.insert(0, WEATHER_DIR)
+import weather  # noqa: E402
+from grid_cache import GridCache  # noqa: E402
+
+ARGS = {"latitude": 30.2672, "longitude": -97.7431}
+RESULT = json.dumps({"content": [{"type": "text", "text": '{"conditions":"clear"}'}], "isError": False})
+
+
+class ProgressToolClient:
+    """Tool client that sends ``messages`` as progress before returning ``RESULT``."""
+
+    def __init__(self, messages):
+        self.messages = messages
+
+    async def call_tool(self, name, arguments, progress_callback=None):
+        for i, message in enumerate(self.messages, 1):
+            if progress_callback is not None:
+                await progress_callback(i, len(self.messages), message)
+            await asyncio.sleep(0)
+        return RESULT
+
+
+async def _stream(tool_client):
+    router = FastPathRouter(tool_client)
+    return [event async for event in router._call_streaming("get_forecast", dict(ARGS), "call-1")]
+
+
+def _patches(events):
+    return [op for e in events if not isinstance(e, str) and e.type == EventType.STATE_DELTA
+            for op in e.model_dump(mode="json")["delta"]]
+
+
+def test_progress_becomes_state_deltas():
+    messages = [
+        json.dumps({"stage": "location", "location": "Austin, TX"}),
+        json.dumps({"stage": "current", "temperature": 35.0, "conditions": "clear"}),
+    ]
+    events = asyncio.run(_stream(ProgressToolClient(messages)))
+
+    patches = _patches(events)
+    assert [p["path"] for p in patches] == [f"/{FORECAST_PROGRESS_STATE_KEY}"] * 2
+    assert patches[0]["value"] == {"toolCallId": "call-1", **ARGS, "stage": "location", "location": "Austin, TX"}
+    # Later stages add to what the card already has
+    assert patches[1]["value"]["location"] == "Austin, TX" and patches[1]["value"]["temperature"] == 35.0
+    assert events[-1] == RESULT
+
+
+@pytest.mark.parametrize("messages", [[], [None, "not json", "[1]"]])
+def test_result_arrives_without_usable_progress(messages):
+    events = asyncio.run(_stream(ProgressToolClient(messages)))
+    assert _patches(events) == []
+    assert events == [RESULT]
+
+
+def test_weather_server_reports_stages_in_order(monkeypatch):
+    points = {"properties": {
+        "gridId": "EWX", "gridX": 156, "gridY": 91,
+        "forecast": "https://nws.test/forecast", "forecastHourly": "https://nws.test/forecast/hourly",
+        "relativeLocation": {"properties": {"city": "Austin", "state": "TX"}},
+    }}
+    forecast = {"properties": {"periods": [
+        {"name": "Today", "startTime": "2025-07-01T12:00:00-05:00", "endTime": "2025-07-01T18:00:00-05:00",
+         "temperature": 95, "temperatureUnit": "F", "windSpeed": "10 mph", "windDirection": "S",
+         "shortForecast": "Sunny", "detailedForecast": "Sunny, with a high near 95."},
+    ]}}
+    hourly = {"properties": {"periods": [
+        {"startTime": "2025-07-01T12:00:00-05:00", "relativeHumidity": {"value": 50}},
+    ]}}
+
+    async def fake_request(url):
+        if url.endswith("/hourly"):
+            return hourly
+        return forecast if url.endswith("/forecast") else points
+
+    monkeypatch.setattr(weather, "make_nws_request", fake_request)
+    monkeypatch.setattr(weather, "grid_cache", GridCache())
+
+    async def scenario():
+        async with create_connected_server_and_client_session(weather.mcp._mcp_server) as session:
+            return await _stream(McpToolClient(session))
+
+    events = asyncio.run(asyncio.wait_for(scenario(), 10))
+    stages = [p["value"]["stage"] for p in _patches(events)]
+    assert stages == ["location", "current", "periods"]
+    result = json.loads(json.loads(events[-1])["content"][0]["text"])
+    assert result["location"] == "Austin, TX" and result["humidity"] == 50
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
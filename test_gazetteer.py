@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""Unit tests for the weather server's offline gazetteer."""
+import asyncio
+import json
+import os
+import sys
+import threading
+
+import pytest
+
+from mcp_launch import WEATHER_DIR
+
+sys.path.insert(0, WEATHER_DIR)
+from gazetteer import Gazetteer, is_typo_of  # noqa: E402
+
+# name, latitude, longitude, country code, admin1 code, population
+CITIES = [
+    ("Austin", 30.26715, -97.74306, "US", "TX", 961855),
+    ("San Francisco", 37.77493, -122.41942, "US", "CA", 864816),
+    ("Springfield", 39.80172, -89.64371, "US", "IL", 116250),
+    ("Springfield", 37.21533, -93.29824, "US", "MO", 166810),
+    ("Portland", 45.52345, -122.67621, "US", "OR", 652503),
+    ("Portland", 43.65737, -70.2589, "US", "ME", 66881),
+    ("New York City", 40.71427, -74.00597, "US", "NY", 8804190),
+    ("Newark", 40.73566, -74.17237, "US", "NJ", 281944),
+    ("Kansas City", 39.09973, -94.57857, "US", "MO", 508090),
+    ("Salt Lake City", 40.76078, -111.89105, "US", "UT", 200133),
+    ("Paris", 48.85341, 2.3488, "FR", "11", 2138551),
+]
+
+
+def _write_cities(directory):
+    rows = []
+    for i, (name, lat, lon, country, admin1, population) in enumerate(CITIES):
+        fields = [str(i), name, name, "", str(lat), str(lon), "P", "PPL", country, "", admin1,
+                  "", "", "", str(population), "", "", "America/Chicago", "2024-01-01"]
+        rows.append("\t".join(fields))
+    path = directory / "cities15000.txt"
+    path.write_text("\n".join(rows) + "\n")
+    return str(path)
+
+
+@pytest.fixture
+def gazetteer(tmp_path):
+    return Gazetteer(_write_cities(tmp_path))
+
+
+def test_exact_and_qualified_names(gazetteer):
+    austin = gazetteer.lookup("Austin")
+    assert austin["display_name"] == "Austin, Texas, United States" and austin["state_code"] == "TX"
+    assert gazetteer.lookup("Springfield")["state_code"] == "MO"  # the larger one
+    assert gazetteer.lookup("Springfield, IL")["state_code"] == "IL"
+    assert gazetteer.lookup("Portland, Maine")["state_code"] == "ME"
+    assert gazetteer.lookup("New York, NY")["state_code"] == "NY"
+    assert gazetteer.lookup("Salt Lake")["state_code"] == "UT"
+
+
+def test_corrects_typos(gazetteer):
+    assert gazetteer.lookup("Austn")["state_code"] == "TX"
+    assert gazetteer.lookup("San Fransisco")["state_code"] == "CA"
+
+
+@pytest.mark.parametrize("query", ["San Francisco Airport", "Springfield Mall", "Austin Texas Capitol", "Aspen"])
+def test_leaves_other_places_to_nominatim(gazetteer, query):
+    assert gazetteer.lookup(query) is None
+
+
+@pytest.mark.parametrize("query", ["New", "Kansas", "New York", "Salt"])
+def test_partial_and_state_names_go_to_nominatim(gazetteer, query):
+    assert gazetteer.lookup(query) is None
+
+
+def test_is_typo_of():
+    assert is_typo_of("portlnd", "portland")
+    assert not is_typo_of("portland oregon", "portland")
+    assert not is_typo_of("austin", "boston")
+
+
+def test_non_us_names_without_geonames_name_files(gazetteer):
+    paris = gazetteer.lookup("Paris, FR")
+    assert paris["display_name"] == "Paris, FR" and paris["state_code"] is None
+
+
+def test_non_us_names_from_geonames_name_files(tmp_path):
+    path = _write_cities(tmp_path)
+    (tmp_path / "admin1CodesASCII.txt").write_text("FR.11\tÎle-de-France\tIle-de-France\t3012874\n")
+    (tmp_path / "countryInfo.txt").write_text(
+        "#ISO\tISO3\tISO-Numeric\tfips\tCountry\n"
+        "FR\tFRA\t250\tFR\tFrance\n"
+    )
+    paris = Gazetteer(path).lookup("Paris, France")
+    assert paris["display_name"] == "Paris, Île-de-France, France"
+    assert Gazetteer(path).lookup("Paris, Ile de France")["latitude"] == 48.85341
+
+
+def test_index_sidecar_is_reused_until_the_cities_file_changes(tmp_path):
+    path = _write_cities(tmp_path)
+    assert Gazetteer(path).lookup("Austin")["state_code"] == "TX"
+    index = os.stat(path + ".idx")
+
+    reopened = Gazetteer(path)
+    assert reopened.lookup("Portland, ME")["state_code"] == "ME"
+    assert os.stat(path + ".idx").st_mtime_ns == index.st_mtime_ns
+
+    CITIES.append(("Boise", 43.6135, -116.20345, "US", "ID", 235684))
+    try:
+        _write_cities(tmp_path)
+    finally:
+        CITIES.pop()
+    os.utime(path, ns=(index.st_mtime_ns + 10**9, index.st_mtime_ns + 10**9))
+    assert Gazetteer(path).lookup("Boise")["state_code"] == "ID"
+
+
+def test_index_stays_in_memory_when_the_sidecar_cannot_be_written(tmp_path, monkeypatch):
+    path = _write_cities(tmp_path)
+    monkeypatch.setattr(Gazetteer, "_write_index", lambda self, data: None)
+    assert Gazetteer(path).lookup("Austn")["state_code"] == "TX"
+    assert not os.path.exists(path + ".idx")
+
+
+def test_geocode_location_loads_the_index_off_the_event_loop(tmp_path, monkeypatch):
+    import weather
+
+    gazetteer = Gazetteer(_write_cities(tmp_path))
+    threads = []
+    load = gazetteer.load
+    monkeypatch.setattr(gazetteer, "load", lambda: (threads.append(threading.get_ident()), load()))
+    monkeypatch.setattr(weather, "gazetteer", gazetteer)
+
+    result = json.loads(asyncio.run(weather.geocode_location("Austin")))
+    assert result["source"] == "gazetteer" and result["state_code"] == "TX"
+    assert threads and threads[0] != threading.get_ident()
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""Unit tests for the weather server's per-grid-cell forecast cache."""
+import sys
+
+import pytest
+
+from mcp_launch import WEATHER_DIR
+
+sys.path.insert(0, WEATHER_DIR)
+from grid_cache import GridCache  # noqa: E402
+
+
+def _points(office, x, y, city="Austin", state="TX"):
+    return {"properties": {
+        "gridId": office, "gridX": x, "gridY": y,
+        "forecast": f"https://api.weather.gov/gridpoints/{office}/{x},{y}/forecast",
+        "forecastHourly": f"https://api.weather.gov/gridpoints/{office}/{x},{y}/forecast/hourly",
+        "relativeLocation": {"properties": {"city": city, "state": state}},
+    }}
+
+
+def _square(lat, lon, size=0.02):
+    """GeoJSON polygon for a ``size``-degree square with its SW corner at ``(lat, lon)``."""
+    ring = [[lon, lat], [lon + size, lat], [lon + size, lat + size], [lon, lat + size], [lon, lat]]
+    return {"type": "Polygon", "coordinates": [ring]}
+
+
+def test_reuses_a_cell_only_for_the_same_point_without_an_outline():
+    cache = GridCache()
+    cell = cache.add_points(30.2672, -97.7431, _points("EWX", 156, 91), now=0)
+    assert cache.lookup(30.2672, -97.7431, now=1) is cell
+    # A few hundred metres away may already be another cell
+    assert cache.lookup(30.2700, -97.7431, now=1) is None
+
+
+def test_reuses_a_cell_for_points_inside_its_outline():
+    cache = GridCache()
+    cell = cache.add_points(30.2672, -97.7431, _points("EWX", 156, 91), now=0)
+    cache.store_forecast(cell, "forecast", _square(30.26, -97.75), now=0)
+    assert cache.lookup(30.2750, -97.7350, now=1) is cell
+    assert cache.lookup(30.2850, -97.7431, now=1) is None
+
+
+def test_forecasts_expire_and_are_released():
+    cache = GridCache(forecast_ttl=60)
+    cell = cache.add_points(30.2672, -97.7431, _points("EWX", 156, 91), now=0)
+    cache.store_forecast(cell, "forecast", None, now=0)
+    assert cache.fresh_forecast(cell, now=30) == "forecast"
+
+    other = cache.add_points(32.7767, -96.7970, _points("FWD", 80, 108, "Dallas"), now=100)
+    cache.lookup(32.7767, -96.7970, now=100)
+    assert cell.forecast is None and other.forecast is None
+    assert cache.fresh_forecast(cell, now=100) is None
+    assert cache.stats()["forecast_hits"] == 1 and cache.stats()["forecast_misses"] == 1
+
+
+def test_resolutions_expire():
+    cache = GridCache(points_ttl=60)
+    cache.add_points(30.2672, -97.7431, _points("EWX", 156, 91), now=0)
+    assert cache.lookup(30.2672, -97.7431, now=61) is None
+    assert cache.stats()["cells"] == 0
+
+
+def test_evicts_least_recently_used_cells():
+    cache = GridCache(max_cells=2)
+    first = cache.add_points(30.0, -97.0, _points("EWX", 1, 1), now=0)
+    cache.store_forecast(first, "forecast", _square(29.99, -97.01), now=0)
+    cache.add_points(31.0, -97.0, _points("EWX", 2, 2), now=0)
+    assert cache.lookup(30.0, -97.0, now=1) is first  # now the most recently used
+    cache.add_points(32.0, -97.0, _points("EWX", 3, 3), now=1)
+
+    assert cache.stats()["cells"] == 2
+    assert cache.lookup(31.0, -97.0, now=1) is None
+    assert cache.lookup(30.0, -97.0, now=1) is first
+
+
+def test_export_and_import_round_trip():
+    cache = GridCache()
+    cell = cache.add_points(30.2672, -97.7431, _points("EWX", 156, 91), now=0)
+    cache.store_forecast(cell, "forecast", _square(30.26, -97.75), now=0)
+
+    restored = GridCache()
+    assert restored.import_cells(cache.export_cells(now=1), now=1) == 1
+    copy = restored.lookup(30.2750, -97.7350, now=1)
+    assert copy.key == cell.key and copy.location_name == "Austin, TX"
+    assert copy.forecast is None  # forecasts are not carried over
+    assert restored.lookup(30.2672, -97.7431, now=1) is copy
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
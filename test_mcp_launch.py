@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""Unit tests for the weather MCP server launch preflight."""
+import os
+import subprocess
+import sys
+
+import pytest
+
+import mcp_launch
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    """A weather project whose ``uv sync`` is recorded instead of run."""
+    (tmp_path / "uv.lock").write_text("version = 1\n")
+    (tmp_path / "pyproject.toml").write_text("[project]\nname = 'weather'\n")
+    syncs = []
+
+    def fake_run(args, **kwargs):
+        syncs.append(args)
+        bin_dir = tmp_path / ".venv" / ("Scripts" if sys.platform == "win32" else "bin")
+        bin_dir.mkdir(parents=True, exist_ok=True)
+        (bin_dir / ("python.exe" if sys.platform == "win32" else "python")).write_text("")
+        return subprocess.CompletedProcess(args, 0)
+
+    monkeypatch.setattr(mcp_launch.shutil, "which", lambda name: "/usr/bin/uv")
+    monkeypatch.setattr(mcp_launch.subprocess, "run", fake_run)
+    monkeypatch.delenv("WEATHER_MCP_PYTHON", raising=False)
+    return tmp_path, syncs
+
+
+def test_preflight_syncs_only_when_the_lockfile_changes(project):
+    directory, syncs = project
+    python = mcp_launch.preflight(str(directory))
+    assert python == mcp_launch.venv_python(str(directory)) and len(syncs) == 1
+
+    assert mcp_launch.preflight(str(directory)) == python
+    assert len(syncs) == 1
+
+    (directory / "uv.lock").write_text("version = 1\n# httpx bumped\n")
+    assert mcp_launch.preflight(str(directory)) == python
+    assert len(syncs) == 2
+
+
+def test_preflight_falls_back_to_uv_run_when_sync_fails(project, monkeypatch):
+    directory, _ = project
+
+    def failing_run(args, **kwargs):
+        raise subprocess.CalledProcessError(1, args)
+
+    monkeypatch.setattr(mcp_launch.subprocess, "run", failing_run)
+    assert mcp_launch.preflight(str(directory)) is None
+    params = mcp_launch.weather_server_params(os.path.join(str(directory), "weather.py"), sync=True)
+    assert params.command == "uv"
+
+
+def test_server_params_do_not_sync_unless_asked(project):
+    directory, syncs = project
+    script = os.path.join(str(directory), "weather.py")
+    assert mcp_launch.weather_server_params(script).command == "uv"
+    assert syncs == []
+
+    params = mcp_launch.weather_server_params(script, sync=True)
+    assert params.command == mcp_launch.venv_python(str(directory)) and len(syncs) == 1
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
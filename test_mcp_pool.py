@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""Failover and reload of the weather MCP server pool under load.
+
+Spawns real weather.py processes through ``McpServerPool`` while 20
+concurrent workers call ``geocode_location``, then SIGKILLs the active
+server and reloads the pool twice (once via ``SIGHUP``). Every call must
+succeed. The geocode answer is preloaded through the cache snapshot, so no
+network access is needed.
+"""
+import asyncio
+import json
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import time
+
+import pytest
+
+from mcp_launch import weather_server_params
+from mcp_pool import AGENT_TOOLS, McpServerPool, PooledMcpToolset
+
+WORKERS = 20
+
+pytestmark = pytest.mark.skipif(
+    shutil.which("pgrep") is None or not hasattr(signal, "SIGHUP"), reason="needs pgrep and SIGHUP"
+)
+
+
+@pytest.fixture
+def server_params(tmp_path, monkeypatch):
+    snapshot = tmp_path / "snapshot.json"
+    snapshot.write_text(json.dumps({
+        "version": 1, "saved_at": time.time(), "cells": [],
+        "geocode": [["testville", time.time(), {"latitude": 1.0, "longitude": 2.0, "display_name": "Testville"}]],
+    }))
+    monkeypatch.setenv("WEATHER_CACHE_SNAPSHOT", str(snapshot))
+    monkeypatch.setenv("WEATHER_MCP_PYTHON", sys.executable)
+    return weather_server_params()
+
+
+def _server_pids():
+    """Server processes spawned by this test, oldest first."""
+    out = subprocess.run(["pgrep", "-P", str(os.getpid())], capture_output=True, text=True).stdout.split()
+
+    def started(pid):
+        with open(f"/proc/{pid}/stat") as f:
+            return int(f.read().rsplit(")", 1)[1].split()[19])
+
+    return sorted((int(pid) for pid in out), key=started)
+
+
+async def _until(condition, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.05)
+
+
+def test_failover_and_reload_under_load(server_params):
+    async def scenario():
+        pool = McpServerPool(server_params, snapshot_seconds=0.5, drain_seconds=5)
+        calls = {"ok": 0, "errors": []}
+        stop = asyncio.Event()
+
+        async def worker():
+            while not stop.is_set():
+                try:
+                    result = await pool.call_tool("geocode_location", {"location": "Testville"})
+                    assert "Testville" in result.content[0].text, result
+                    calls["ok"] += 1
+                except Exception as e:
+                    calls["errors"].append(repr(e))
+                await asyncio.sleep(0.01)
+
+        try:
+            await pool.call_tool("geocode_location", {"location": "Testville"})
+            await _until(lambda: pool.metrics()["standby_ready"])
+            workers = [asyncio.create_task(worker()) for _ in range(WORKERS)]
+            await asyncio.sleep(0.5)
+
+            # Kill the active server: the standby takes over
+            os.kill(_server_pids()[0], signal.SIGKILL)
+            await _until(lambda: pool.metrics()["failovers_total"] == 1)
+            await _until(lambda: pool.metrics()["standby_ready"])
+            await asyncio.sleep(0.5)
+
+            await pool.reload()
+            assert pool.install_reload_signal()
+            os.kill(os.getpid(), signal.SIGHUP)
+            await _until(lambda: pool.metrics()["reloads_total"] == 2)
+            await _until(lambda: pool.metrics()["standby_ready"])
+            await asyncio.sleep(0.5)
+
+            stop.set()
+            await asyncio.gather(*workers)
+        finally:
+            asyncio.get_running_loop().remove_signal_handler(signal.SIGHUP)
+            await pool.close()
+
+        metrics = pool.metrics()
+        assert calls["errors"] == []
+        assert calls["ok"] > 0
+        assert metrics["failed_calls_total"] == 0 and metrics["cold_failovers_total"] == 0
+        assert metrics["undrained_calls_total"] == 0
+        await _until(lambda: not _server_pids(), timeout=10)
+
+    asyncio.run(scenario())
+
+
+def test_pooled_toolset_lists_the_agent_tools(server_params):
+    async def scenario():
+        pool = McpServerPool(server_params, standby=False, snapshot_seconds=0)
+        toolset = PooledMcpToolset(pool)
+        try:
+            tools = await toolset.get_tools()
+            assert sorted(tool.name for tool in tools) == sorted(AGENT_TOOLS)
+        finally:
+            await toolset.close()
+
+    asyncio.run(scenario())
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
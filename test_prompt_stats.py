@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""Unit tests for the per-turn prompt size and latency plugin."""
+import asyncio
+import sys
+from types import SimpleNamespace
+
+import pytest
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+
+from prompt_stats import PromptStatsPlugin
+
+
+def _response(prompt=None, cached=None, partial=False, usage=True):
+    metadata = types.GenerateContentResponseUsageMetadata(
+        prompt_token_count=prompt, cached_content_token_count=cached
+    ) if usage else None
+    return LlmResponse(usage_metadata=metadata, partial=partial)
+
+
+async def _turn(plugin, invocation_id, *responses):
+    context = SimpleNamespace(invocation_id=invocation_id)
+    await plugin.before_model_callback(callback_context=context, llm_request=LlmRequest())
+    for response in responses:
+        await plugin.after_model_callback(callback_context=context, llm_response=response)
+
+
+def test_records_prompt_and_cached_tokens():
+    async def scenario():
+        plugin = PromptStatsPlugin()
+        # Streaming chunks are skipped; the final response carries the usage
+        await _turn(plugin, "a", _response(prompt=10, partial=True), _response(prompt=1000, cached=750))
+        await _turn(plugin, "b", _response(prompt=600))  # nothing served from the cache
+        return plugin.metrics()
+
+    metrics = asyncio.run(scenario())
+    assert metrics["turns_total"] == 2
+    assert metrics["avg_input_tokens_per_turn"] == 800.0
+    assert metrics["avg_cached_tokens_per_turn"] == 375.0
+    assert metrics["cached_token_ratio"] == round(750 / 1600, 4)
+    assert metrics["avg_model_latency_ms"] >= 0
+
+
+def test_turns_without_usage_metadata_are_not_counted():
+    async def scenario():
+        plugin = PromptStatsPlugin()
+        await _turn(plugin, "a", _response(usage=False))
+        await _turn(plugin, "b", _response())  # usage metadata without counts
+        # A response after the turn was already recorded (or errored) has no start time
+        await plugin.after_model_callback(callback_context=SimpleNamespace(invocation_id="a"),
+                                          llm_response=_response(prompt=5))
+        return plugin
+
+    plugin = asyncio.run(scenario())
+    assert plugin.metrics()["turns_total"] == 1
+    assert plugin.metrics()["avg_input_tokens_per_turn"] == 0.0
+    assert plugin.metrics()["cached_token_ratio"] == 0.0
+    assert plugin._started == {}
+
+
+def test_model_errors_drop_the_start_time():
+    async def scenario():
+        plugin = PromptStatsPlugin()
+        context = SimpleNamespace(invocation_id="a")
+        await plugin.before_model_callback(callback_context=context, llm_request=LlmRequest())
+        await plugin.on_model_error_callback(callback_context=context, llm_request=LlmRequest(),
+                                             error=RuntimeError("quota"))
+        return plugin
+
+    plugin = asyncio.run(scenario())
+    assert plugin._started == {} and plugin.metrics() == {"turns_total": 0}
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""Unit tests for the memory-bounded session service."""
+import asyncio
+import json
+import sys
+
+import pytest
+from google.adk.events import Event
+from google.genai import types
+
+import session_budget
+from session_budget import BoundedSessionService
+
+
+def _user(text):
+    return Event(author="user", content=types.Content(role="user", parts=[types.Part(text=text)]))
+
+
+def _tool_result(payload_bytes):
+    response = {"forecast": "x" * payload_bytes}
+    part = types.Part(function_response=types.FunctionResponse(id="call", name="get_forecast", response=response))
+    return Event(author="user", content=types.Content(role="user", parts=[part]))
+
+
+def _model(text):
+    return Event(author="default", content=types.Content(role="model", parts=[types.Part(text=text)]))
+
+
+def _full_size(service, session):
+    storage = service._storage((session.app_name, session.user_id, session.id))
+    return session_budget._state_bytes(storage.state) + sum(session_budget._event_bytes(e) for e in storage.events)
+
+
+def _session(service):
+    return asyncio.run(service.create_session(app_name="app", user_id="u", session_id="s"))
+
+
+def test_sizes_match_a_full_measurement():
+    service = BoundedSessionService(tool_result_keep_bytes=100)
+    session = _session(service)
+
+    async def scenario():
+        for turn in range(3):
+            for event in (_user(f"question {turn}"), _tool_result(2000), _model(f"answer {turn}")):
+                await service.append_event(session, event)
+                assert service.metrics()["resident_bytes"] == _full_size(service, session)
+
+    asyncio.run(scenario())
+    assert service.metrics()["truncated_tool_results_total"] == 3
+
+
+def test_earlier_tool_results_are_checked_once(monkeypatch):
+    service = BoundedSessionService(tool_result_keep_bytes=100)
+    session = _session(service)
+    dumps = []
+    real_dumps = json.dumps
+    monkeypatch.setattr(session_budget.json, "dumps", lambda obj, **kw: dumps.append(obj) or real_dumps(obj, **kw))
+
+    async def scenario():
+        for turn in range(5):
+            for event in (_user(f"question {turn}"), _tool_result(50), _model(f"answer {turn}")):
+                await service.append_event(session, event)
+
+    asyncio.run(scenario())
+    assert len([obj for obj in dumps if "forecast" in obj]) == 5
+
+
+def test_drops_oldest_turns_over_the_session_budget():
+    service = BoundedSessionService(max_session_bytes=3000, tool_result_keep_bytes=10_000)
+    session = _session(service)
+
+    async def scenario():
+        for turn in range(4):
+            for event in (_user(f"question {turn}"), _tool_result(800), _model(f"answer {turn}")):
+                await service.append_event(session, event)
+
+    asyncio.run(scenario())
+    metrics = service.metrics()
+    assert metrics["dropped_events_total"] > 0
+    assert metrics["resident_bytes"] == _full_size(service, session) <= 3000
+
+
+def test_deleted_sessions_release_their_bytes():
+    service = BoundedSessionService()
+    session = _session(service)
+    asyncio.run(service.append_event(session, _user("hello")))
+    asyncio.run(service.delete_session(app_name="app", user_id="u", session_id="s"))
+    assert service.metrics()["resident_bytes"] == 0 and service.metrics()["sessions"] == 0
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -24,7 +24,9 @@ weather_toolset = McpToolset(
             command="uv",
             args=["run", "python", weather_script_path]
         )
-    )
+    ),
+    # cache_snapshot_control is for the backend's server pool only
+    tool_filter=["geocode_location", "get_alerts", "get_forecast"],
 )
 
 # Create the agent with weather toolset
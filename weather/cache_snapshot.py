@@ -0,0 +1,120 @@
+"""Warm-cache snapshot shared by successive weather MCP server processes.
+
+A restarted server would otherwise start with empty caches and re-hit
+Nominatim (1 req/s) and ``/points`` for every location it already knew.
+The snapshot holds the geocode answers and the ``/points`` cell resolutions
+(not forecasts, which go stale within the hour) as JSON at
+``WEATHER_CACHE_SNAPSHOT``. It is written atomically (temp file + rename), so
+a process loading it never sees a half-written file.
+"""
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import time
+from collections import OrderedDict
+from typing import Any
+
+from grid_cache import GridCache
+
+SNAPSHOT_VERSION = 1
+
+# Place names move rarely; keep answers for a week
+GEOCODE_TTL_SECONDS = 7 * 24 * 3600
+GEOCODE_MAX_ENTRIES = 5000
+
+
+class GeocodeCache:
+    """LRU of geocode results keyed by normalized query."""
+
+    def __init__(self, ttl: float = GEOCODE_TTL_SECONDS, max_entries: int = GEOCODE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, dict[str, Any]]] = OrderedDict()
+
+    @staticmethod
+    def _key(query: str) -> str:
+        return " ".join(query.lower().split())
+
+    def get(self, query: str, now: float | None = None) -> dict[str, Any] | None:
+        key = self._key(query)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        now = time.time() if now is None else now
+        if now - entry[0] > self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, query: str, result: dict[str, Any], now: float | None = None) -> None:
+        key = self._key(query)
+        self._entries[key] = (time.time() if now is None else now, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def export(self) -> list[list[Any]]:
+        return [[key, at, result] for key, (at, result) in self._entries.items()]
+
+    def restore(self, items: list[list[Any]], now: float | None = None) -> int:
+        now = time.time() if now is None else now
+        added = 0
+        for key, at, result in items:
+            if key not in self._entries and now - at <= self.ttl:
+                self._entries[key] = (at, result)
+                added += 1
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return added
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def snapshot_path() -> str | None:
+    """Snapshot file from ``WEATHER_CACHE_SNAPSHOT``, or ``None`` when disabled."""
+    return os.getenv("WEATHER_CACHE_SNAPSHOT") or None
+
+
+def save(path: str, geocode: GeocodeCache, grid: GridCache) -> dict[str, int]:
+    """Write both caches to ``path`` atomically."""
+    data = {
+        "version": SNAPSHOT_VERSION,
+        "saved_at": time.time(),
+        "geocode": geocode.export(),
+        "cells": grid.export_cells(),
+    }
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(prefix=".snapshot-", dir=directory)
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+    return {"geocode": len(data["geocode"]), "cells": len(data["cells"])}
+
+
+def load(path: str, geocode: GeocodeCache, grid: GridCache) -> dict[str, int]:
+    """Merge a snapshot written by ``save`` into the caches; missing or bad files load nothing."""
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {"geocode": 0, "cells": 0}
+    if data.get("version") != SNAPSHOT_VERSION:
+        return {"geocode": 0, "cells": 0}
+    try:
+        return {
+            "geocode": geocode.restore(data.get("geocode") or []),
+            "cells": grid.import_cells(data.get("cells") or []),
+        }
+    except (KeyError, TypeError, ValueError):
+        return {"geocode": len(geocode), "cells": 0}
@@ -0,0 +1,229 @@
+"""Typed forecast model built once per NWS forecast.
+
+``Forecast.from_nws`` parses the ``/forecast`` periods into ``__slots__``
+objects; ``Forecast.add_hourly`` fills in relative humidity (and the feels-like
+temperatures that depend on it) from the ``/forecast/hourly`` periods once they
+arrive. A period without a temperature keeps ``None`` (no feels-like either)
+rather than a made-up 0 °F. ``GridCache`` stores the parsed model, so cache hits skip parsing, and
+the compact JSON a tool returns is serialized once per forecast as well.
+
+Unit conversions are plain per-value loops over the ~14 periods of a
+forecast: numpy is not a dependency of the server, and for so few values
+its import cost would outweigh any gain.
+"""
+from __future__ import annotations
+
+import json
+import re
+from bisect import bisect_right
+from datetime import datetime
+from typing import Any, Sequence
+
+# "10 mph", "5 to 10 mph", "10 to 15 km/h"
+WIND_PATTERN = re.compile(r"(\d+)(?:\s*to\s*(\d+))?\s*(mph|km/h)?", re.IGNORECASE)
+
+# Periods included in tool results
+RESULT_PERIODS = 5
+
+
+def fahrenheit_to_celsius(values: Sequence[float]) -> list[float]:
+    return [(v - 32) * 5 / 9 for v in values]
+
+
+def mph_to_kmh(values: Sequence[float]) -> list[float]:
+    return [v * 1.609344 for v in values]
+
+
+def parse_wind(text: str | None) -> tuple[int, int]:
+    """``(min, max)`` wind speed in mph from NWS text such as "5 to 10 mph"."""
+    match = WIND_PATTERN.search(text or "")
+    if not match:
+        return 0, 0
+    low = int(match.group(1))
+    high = int(match.group(2) or low)
+    if (match.group(3) or "").lower() == "km/h":
+        low, high = round(low / 1.609344), round(high / 1.609344)
+    return low, high
+
+
+def classify_conditions(detailed: str) -> str:
+    """Map a detailed forecast onto the card themes (rain, cloudy, snow, storm, clear)."""
+    text = detailed.lower()
+    if "rain" in text or "shower" in text:
+        return "rain"
+    if "cloud" in text or "overcast" in text:
+        return "cloudy"
+    if "snow" in text:
+        return "snow"
+    if "storm" in text or "thunder" in text:
+        return "storm"
+    return "clear"
+
+
+def feels_like_f(temp_f: float | None, humidity: float | None, wind_mph: float) -> float | None:
+    """NWS heat index or wind chill, falling back to the air temperature."""
+    if temp_f is None:
+        return None
+    if temp_f >= 80 and humidity is not None:
+        t, rh = temp_f, humidity
+        return (-42.379 + 2.04901523 * t + 10.14333127 * rh - 0.22475541 * t * rh
+                - 6.83783e-3 * t * t - 5.481717e-2 * rh * rh + 1.22874e-3 * t * t * rh
+                + 8.5282e-4 * t * rh * rh - 1.99e-6 * t * t * rh * rh)
+    if temp_f <= 50 and wind_mph > 3:
+        v = wind_mph ** 0.16
+        return 35.74 + 0.6215 * temp_f - 35.75 * v + 0.4275 * temp_f * v
+    return temp_f
+
+
+def _value(field: Any) -> float | None:
+    """Value of an NWS quantitative field (``{"unitCode": ..., "value": ...}``)."""
+    if isinstance(field, dict):
+        return field.get("value")
+    return field
+
+
+def _timestamp(value: str | None) -> float:
+    try:
+        return datetime.fromisoformat(value).timestamp() if value else 0.0
+    except ValueError:
+        return 0.0
+
+
+class Period:
+    """One NWS forecast period with derived fields."""
+
+    __slots__ = (
+        "name", "start_time", "end_time", "is_daytime",
+        "temperature_f", "temperature_c", "feels_like_c",
+        "wind_min_mph", "wind_max_mph", "wind_max_kmh", "wind_text", "wind_direction",
+        "precipitation", "humidity", "short_forecast", "detailed_forecast", "conditions",
+    )
+
+    def __init__(self, raw: dict[str, Any]):
+        self.name = raw.get("name", "")
+        self.start_time = raw.get("startTime")
+        self.end_time = raw.get("endTime")
+        self.is_daytime = bool(raw.get("isDaytime", True))
+        temperature = raw.get("temperature")
+        if raw.get("temperatureUnit") == "C" and temperature is not None:
+            temperature = temperature * 9 / 5 + 32
+        self.temperature_f = float(temperature) if temperature is not None else None
+        self.wind_text = raw.get("windSpeed") or ""
+        self.wind_min_mph, self.wind_max_mph = parse_wind(self.wind_text)
+        self.wind_direction = raw.get("windDirection") or ""
+        self.precipitation = _value(raw.get("probabilityOfPrecipitation"))
+        self.humidity = _value(raw.get("relativeHumidity"))
+        self.short_forecast = raw.get("shortForecast") or ""
+        self.detailed_forecast = raw.get("detailedForecast") or ""
+        self.conditions = classify_conditions(self.detailed_forecast)
+        # Filled in by Forecast
+        self.temperature_c: float | None = None
+        self.feels_like_c: float | None = None
+        self.wind_max_kmh = 0.0
+
+    def summary(self) -> dict[str, Any]:
+        """Compact per-period fields for tool results."""
+        data = {
+            "name": self.name,
+            "temperature": round(self.temperature_f) if self.temperature_f is not None else None,
+            "temperatureUnit": "F",
+            "windSpeed": self.wind_text,
+            "windDirection": self.wind_direction,
+            "forecast": self.detailed_forecast,
+            "conditions": self.conditions,
+        }
+        if self.precipitation is not None:
+            data["precipitation"] = self.precipitation
+        if self.humidity is not None:
+            data["humidity"] = self.humidity
+        return data
+
+
+class Forecast:
+    """Parsed NWS forecast for one grid cell."""
+
+    __slots__ = ("location", "updated", "periods", "_json")
+
+    def __init__(self, location: str, updated: str | None, periods: list[Period]):
+        self.location = location
+        self.updated = updated
+        self.periods = periods
+        self._json: str | None = None
+
+    @classmethod
+    def from_nws(
+        cls,
+        forecast_data: dict[str, Any],
+        location: str,
+        hourly_data: dict[str, Any] | None = None,
+    ) -> "Forecast":
+        props = forecast_data.get("properties") or {}
+        periods = [Period(raw) for raw in props.get("periods") or []]
+        for period, wind_kmh in zip(periods, mph_to_kmh([p.wind_max_mph for p in periods])):
+            period.wind_max_kmh = round(wind_kmh, 1)
+        known = [p for p in periods if p.temperature_f is not None]
+        for period, temp_c in zip(known, fahrenheit_to_celsius([p.temperature_f for p in known])):
+            period.temperature_c = round(temp_c, 1)
+        forecast = cls(location, props.get("updateTime") or props.get("generatedAt"), periods)
+        forecast.add_hourly(hourly_data)
+        return forecast
+
+    def add_hourly(self, hourly_data: dict[str, Any] | None) -> None:
+        """Fill humidity from the hourly forecast and (re)compute feels-like temperatures."""
+        if hourly_data:
+            _fill_humidity(self.periods, (hourly_data.get("properties") or {}).get("periods") or [])
+        known = [p for p in self.periods if p.temperature_f is not None]
+        feels_c = fahrenheit_to_celsius([feels_like_f(p.temperature_f, p.humidity, p.wind_max_mph) for p in known])
+        for period, feel_c in zip(known, feels_c):
+            period.feels_like_c = round(feel_c, 1)
+        self._json = None
+
+    @property
+    def current(self) -> Period | None:
+        return self.periods[0] if self.periods else None
+
+    def current_summary(self) -> dict[str, Any]:
+        """Headline fields the forecast card renders."""
+        current = self.current
+        return {
+            "temperature": current.temperature_c,  # Celsius is primary to match the card
+            "temperature_f": round(current.temperature_f) if current.temperature_f is not None else None,
+            "conditions": current.conditions,
+            "humidity": current.humidity,
+            "precipitation": current.precipitation,
+            "windSpeed": current.wind_max_mph,
+            "windSpeedText": current.wind_text,
+            "windDirection": current.wind_direction,
+            "feelsLike": current.feels_like_c,
+            "location": self.location,
+            "updated": self.updated,
+            "validUntil": current.end_time,
+        }
+
+    def period_summaries(self, limit: int = RESULT_PERIODS) -> list[dict[str, Any]]:
+        return [p.summary() for p in self.periods[:limit]]
+
+    def to_json(self) -> str:
+        """Compact tool result JSON, serialized once per forecast."""
+        if self._json is None:
+            result = {**self.current_summary(), "periods": self.period_summaries()}
+            self._json = json.dumps({k: v for k, v in result.items() if v is not None}, separators=(",", ":"))
+        return self._json
+
+
+def _fill_humidity(periods: list[Period], hourly: list[dict[str, Any]]) -> None:
+    """Set each period's humidity from the hourly forecast hour it starts in."""
+    hours = sorted(
+        (_timestamp(h.get("startTime")), _value(h.get("relativeHumidity")))
+        for h in hourly
+        if _value(h.get("relativeHumidity")) is not None
+    )
+    if not hours:
+        return
+    starts = [start for start, _ in hours]
+    for period in periods:
+        if period.humidity is not None:
+            continue
+        # The current period can start before the first hourly entry
+        i = bisect_right(starts, _timestamp(period.start_time)) - 1
+        period.humidity = hours[max(i, 0)][1]
@@ -0,0 +1,423 @@
+"""Offline gazetteer for ``geocode_location``.
+
+Answers common place names from a local GeoNames ``cities*.txt`` dump
+(tab-separated: geonameid, name, asciiname, alternatenames, latitude,
+longitude, feature class, feature code, country code, cc2, admin1 code, ...,
+population, ...) so most lookups skip Nominatim's 1 req/s limit.
+
+The file is memory-mapped and indexed lazily on the first lookup. The index
+holds row offsets, coordinates and populations, the sorted names for exact
+matches and trigram postings for fuzzy matches; the row text itself stays in
+the mapped file. It is written once to a ``<cities file>.idx`` sidecar and
+memory-mapped from there, so other processes and restarts open it without
+re-parsing the dump. The sidecar is rebuilt when the cities file's size or
+mtime changes, and kept in memory when its directory is not writable.
+
+A name only matches a longer city name when the rest is one of
+``NAME_SUFFIXES`` ("Salt Lake" -> "Salt Lake City"), and never for a bare US
+state name ("Kansas" is the state, not Kansas City).
+
+Fuzzy matching only corrects typos ("Austn", "San Fransisco"): the candidate
+must have the same words as the query, each within one or two edits. Anything
+else ("San Francisco Airport", "Springfield Mall") is left to Nominatim.
+
+Region and country names come from GeoNames' ``admin1CodesASCII.txt`` and
+``countryInfo.txt`` when they sit next to the cities file; without them only
+US state names are known and other regions are left out of ``display_name``.
+"""
+from __future__ import annotations
+
+import bisect
+import difflib
+import mmap
+import os
+import re
+import struct
+import sys
+import tempfile
+import threading
+import unicodedata
+from array import array
+from typing import Any
+
+US_STATE_NAMES = {
+    "AL": "Alabama", "AK": "Alaska", "AZ": "Arizona", "AR": "Arkansas",
+    "CA": "California", "CO": "Colorado", "CT": "Connecticut", "DE": "Delaware",
+    "DC": "District of Columbia", "FL": "Florida", "GA": "Georgia", "HI": "Hawaii",
+    "ID": "Idaho", "IL": "Illinois", "IN": "Indiana", "IA": "Iowa", "KS": "Kansas",
+    "KY": "Kentucky", "LA": "Louisiana", "ME": "Maine", "MD": "Maryland",
+    "MA": "Massachusetts", "MI": "Michigan", "MN": "Minnesota", "MS": "Mississippi",
+    "MO": "Missouri", "MT": "Montana", "NE": "Nebraska", "NV": "Nevada",
+    "NH": "New Hampshire", "NJ": "New Jersey", "NM": "New Mexico", "NY": "New York",
+    "NC": "North Carolina", "ND": "North Dakota", "OH": "Ohio", "OK": "Oklahoma",
+    "OR": "Oregon", "PA": "Pennsylvania", "RI": "Rhode Island", "SC": "South Carolina",
+    "SD": "South Dakota", "TN": "Tennessee", "TX": "Texas", "UT": "Utah",
+    "VT": "Vermont", "VA": "Virginia", "WA": "Washington", "WV": "West Virginia",
+    "WI": "Wisconsin", "WY": "Wyoming", "PR": "Puerto Rico",
+}
+_US_STATE_CODES = {name.lower(): code for code, name in US_STATE_NAMES.items()}
+_US_ALIASES = {"us", "usa", "united states", "united states of america"}
+
+# Minimum similarity (difflib ratio) between a query and a fuzzy match, on
+# top of the per-word edit limit below.
+FUZZY_THRESHOLD = 0.85
+
+# Admin1 and country name files from the GeoNames dump
+ADMIN1_FILE = "admin1CodesASCII.txt"
+COUNTRY_FILE = "countryInfo.txt"
+
+# Words a city name may carry beyond what people type ("New York City")
+NAME_SUFFIXES = ("city",)
+
+# Index sidecar: magic (format version and byte order), cities file size and
+# mtime, then section lengths
+INDEX_SUFFIX = ".idx"
+_INDEX_MAGIC = b"GAZIDX1" + sys.byteorder[0].encode()
+_INDEX_HEADER = struct.Struct("<8sQq7Q")
+
+# GeoNames column positions
+_NAME, _ASCIINAME, _LAT, _LON, _COUNTRY, _ADMIN1, _POPULATION = 1, 2, 4, 5, 8, 10, 14
+
+
+def normalize(text: str) -> str:
+    """Lowercase, strip accents and collapse punctuation/whitespace."""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = re.sub(r"\bst\.?\s", "saint ", text.lower())
+    return " ".join(re.sub(r"[^a-z0-9 ]+", " ", text).split())
+
+
+def _trigrams(name: str) -> set[str]:
+    padded = f"  {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _max_edits(word: str) -> int:
+    return 1 if len(word) < 8 else 2
+
+
+def _within_edits(a: str, b: str, limit: int) -> bool:
+    """Whether the Levenshtein distance between ``a`` and ``b`` is at most ``limit``."""
+    if abs(len(a) - len(b)) > limit:
+        return False
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return False
+        previous = current
+    return previous[-1] <= limit
+
+
+def is_typo_of(query: str, name: str) -> bool:
+    """Whether ``query`` is ``name`` with a few typos, word for word."""
+    words, name_words = query.split(), name.split()
+    if len(words) != len(name_words):
+        return False
+    if not all(_within_edits(w, n, _max_edits(n)) for w, n in zip(words, name_words)):
+        return False
+    return difflib.SequenceMatcher(None, query, name).ratio() >= FUZZY_THRESHOLD
+
+
+def _padded(data: bytes) -> bytes:
+    return data + bytes(-len(data) % 8)
+
+
+class _Strings:
+    """Sorted ASCII strings packed into one buffer, indexable for ``bisect``."""
+
+    def __init__(self, blob: memoryview, starts: memoryview):
+        self._blob = blob
+        self._starts = starts
+
+    def __len__(self) -> int:
+        return len(self._starts) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return bytes(self._blob[self._starts[i]:self._starts[i + 1]]).decode("ascii")
+
+
+def _find(strings: _Strings, key: str) -> int | None:
+    i = bisect.bisect_left(strings, key)
+    return i if i < len(strings) and strings[i] == key else None
+
+
+def _read_names(path: str, key_column: int, name_column: int) -> dict[str, str]:
+    """Code -> name from a tab-separated GeoNames file; empty when missing."""
+    names: dict[str, str] = {}
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("#"):
+                    continue
+                fields = line.rstrip("\n").split("\t")
+                if len(fields) > max(key_column, name_column):
+                    names[fields[key_column]] = fields[name_column]
+    except OSError:
+        pass
+    return names
+
+
+class Gazetteer:
+    """Lazily loaded, memory-mapped city index."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.index_path = path + INDEX_SUFFIX
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._file = None
+        self._mm: mmap.mmap | None = None
+        self._index: mmap.mmap | bytes | None = None
+        self._offsets: memoryview | None = None
+        self._populations: memoryview | None = None
+        self._lats: memoryview | None = None
+        self._lons: memoryview | None = None
+        self._names: _Strings | None = None     # sorted normalized names
+        self._row_starts: memoryview | None = None  # rows of names[i] are name_rows[starts[i]:starts[i + 1]]
+        self._name_rows: memoryview | None = None
+        self._grams: _Strings | None = None     # sorted trigrams
+        self._posting_starts: memoryview | None = None
+        self._postings: memoryview | None = None  # name ids per trigram
+        self._admin1_names: dict[str, str] = {}   # "FR.11" -> "Île-de-France"
+        self._country_names: dict[str, str] = {}  # "FR" -> "France"
+
+    @classmethod
+    def from_env(cls) -> "Gazetteer | None":
+        """Gazetteer at ``GAZETTEER_PATH``, or ``None`` when not configured."""
+        path = os.getenv("GAZETTEER_PATH")
+        if not path or not os.path.exists(path):
+            return None
+        return cls(path)
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def load(self) -> None:
+        """Open the index, building the sidecar first if needed. Blocking; safe from any thread."""
+        with self._lock:
+            if not self._loaded:
+                self._load()
+
+    def _load(self) -> None:
+        self._file = open(self.path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        stat = os.fstat(self._file.fileno())
+        index = self._open_index(stat)
+        if index is None:
+            data = self._build_index(stat)
+            index = self._write_index(data) or data
+            self._attach(index)
+        self._index = index
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        self._admin1_names = _read_names(os.path.join(directory, ADMIN1_FILE), 0, 1)
+        self._country_names = _read_names(os.path.join(directory, COUNTRY_FILE), 0, 4)
+        self._loaded = True
+
+    def _open_index(self, stat: os.stat_result) -> mmap.mmap | None:
+        """The sidecar, attached, if it was built from this version of the cities file."""
+        try:
+            with open(self.index_path, "rb") as f:
+                index = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        try:
+            magic, size, mtime_ns = _INDEX_HEADER.unpack_from(index)[:3]
+            if (magic, size, mtime_ns) != (_INDEX_MAGIC, stat.st_size, stat.st_mtime_ns):
+                raise ValueError("stale gazetteer index")
+            self._attach(index)
+        except (struct.error, TypeError, ValueError):
+            index.close()
+            return None
+        return index
+
+    def _write_index(self, data: bytes) -> mmap.mmap | None:
+        """Write the sidecar atomically and map it; ``None`` when the directory is read-only."""
+        try:
+            fd, tmp = tempfile.mkstemp(prefix=".gazetteer-", dir=os.path.dirname(os.path.abspath(self.index_path)))
+        except OSError:
+            return None
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, self.index_path)
+            with open(self.index_path, "rb") as f:
+                return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except OSError:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            return None
+
+    def _build_index(self, stat: os.stat_result) -> bytes:
+        """Parse the cities file into the sidecar layout read by ``_attach``."""
+        offsets, populations = array("Q"), array("Q")
+        lats, lons = array("f"), array("f")
+        by_name: dict[str, list[int]] = {}
+        pos = 0
+        size = len(self._mm)
+        while pos < size:
+            end = self._mm.find(b"\n", pos)
+            if end == -1:
+                end = size
+            fields = self._mm[pos:end].split(b"\t")
+            if len(fields) > _POPULATION:
+                row = len(offsets)
+                offsets.append(pos)
+                lats.append(float(fields[_LAT]))
+                lons.append(float(fields[_LON]))
+                populations.append(int(fields[_POPULATION] or 0))
+                for raw in {fields[_NAME], fields[_ASCIINAME]}:
+                    name = normalize(raw.decode("utf-8", "replace"))
+                    if name:
+                        by_name.setdefault(name, []).append(row)
+            pos = end + 1
+
+        names = sorted(by_name)
+        name_starts, row_starts, name_rows = array("Q", [0]), array("Q", [0]), array("I")
+        postings: dict[str, list[int]] = {}
+        for i, name in enumerate(names):
+            name_starts.append(name_starts[-1] + len(name))
+            name_rows.extend(by_name[name])
+            row_starts.append(len(name_rows))
+            for gram in _trigrams(name):
+                postings.setdefault(gram, []).append(i)
+        grams = sorted(postings)
+        gram_starts, posting_starts, posting_ids = array("Q", [0]), array("Q", [0]), array("I")
+        for gram in grams:
+            gram_starts.append(gram_starts[-1] + len(gram))
+            posting_ids.extend(postings[gram])
+            posting_starts.append(len(posting_ids))
+
+        names_blob = "".join(names).encode("ascii")
+        grams_blob = "".join(grams).encode("ascii")
+        header = _INDEX_HEADER.pack(
+            _INDEX_MAGIC, stat.st_size, stat.st_mtime_ns, len(offsets), len(names), len(name_rows),
+            len(grams), len(posting_ids), len(names_blob), len(grams_blob),
+        )
+        sections = (header, offsets, populations, lats, lons, name_starts, row_starts, name_rows,
+                    gram_starts, posting_starts, posting_ids, names_blob, grams_blob)
+        return b"".join(_padded(bytes(section)) for section in sections)
+
+    def _attach(self, index: mmap.mmap | bytes) -> None:
+        view = memoryview(index)
+        rows, names, name_rows, grams, postings, names_len, grams_len = _INDEX_HEADER.unpack_from(view)[3:]
+        pos = _INDEX_HEADER.size
+
+        def take(typecode: str, count: int) -> memoryview:
+            nonlocal pos
+            size = count * array(typecode).itemsize
+            section = view[pos:pos + size].cast(typecode)
+            pos += size + -size % 8
+            return section
+
+        self._offsets = take("Q", rows)
+        self._populations = take("Q", rows)
+        self._lats = take("f", rows)
+        self._lons = take("f", rows)
+        name_starts = take("Q", names + 1)
+        self._row_starts = take("Q", names + 1)
+        self._name_rows = take("I", name_rows)
+        gram_starts = take("Q", grams + 1)
+        self._posting_starts = take("Q", grams + 1)
+        self._postings = take("I", postings)
+        self._names = _Strings(take("B", names_len), name_starts)
+        self._grams = _Strings(take("B", grams_len), gram_starts)
+        if pos != len(view):
+            raise ValueError("truncated gazetteer index")
+
+    def _row_fields(self, row: int) -> list[str]:
+        start = self._offsets[row]
+        end = self._mm.find(b"\n", start)
+        line = self._mm[start:end if end != -1 else len(self._mm)]
+        return line.decode("utf-8", "replace").split("\t")
+
+    def _rows(self, entry: int) -> memoryview:
+        return self._name_rows[self._row_starts[entry]:self._row_starts[entry + 1]]
+
+    def _candidates(self, name: str, expand: bool) -> list[int]:
+        """Row ids for an exact name match, else ``name`` plus one of ``NAME_SUFFIXES``
+        (when ``expand``), else the closest typo match."""
+        entry = _find(self._names, name)
+        if entry is None and expand:
+            # "new york" -> "new york city", but not "new" -> "new york city"
+            for suffix in NAME_SUFFIXES:
+                entry = _find(self._names, f"{name} {suffix}")
+                if entry is not None:
+                    break
+        if entry is not None:
+            return list(self._rows(entry))
+
+        # Names sharing at least half of the query's trigrams are candidates
+        grams = _trigrams(name)
+        counts: dict[int, int] = {}
+        for gram in grams:
+            i = _find(self._grams, gram)
+            if i is None:
+                continue
+            for entry in self._postings[self._posting_starts[i]:self._posting_starts[i + 1]]:
+                counts[entry] = counts.get(entry, 0) + 1
+        scored = []
+        for entry, shared in counts.items():
+            candidate = self._names[entry]
+            if 2 * shared >= len(grams) and is_typo_of(name, candidate):
+                scored.append((difflib.SequenceMatcher(None, name, candidate).ratio(), entry))
+        if not scored:
+            return []
+        best = max(score for score, _ in scored)
+        return [row for score, entry in scored if score == best for row in self._rows(entry)]
+
+    def lookup(self, query: str) -> dict[str, Any] | None:
+        """Resolve ``query`` ("Austin", "Portland, ME", "Paris, FR") or ``None``."""
+        if not self._loaded:
+            self.load()
+
+        parts = [normalize(p) for p in query.split(",")]
+        name, qualifiers = parts[0], [q for q in parts[1:] if q]
+        if not name:
+            return None
+
+        # A bare state name means the state ("Kansas", "New York"); Nominatim answers it
+        expand = bool(qualifiers) or name not in _US_STATE_CODES
+        best = None
+        for row in self._candidates(name, expand):
+            fields = self._row_fields(row)
+            country, admin1 = fields[_COUNTRY], fields[_ADMIN1]
+            if not all(self._qualifies(q, country, admin1) for q in qualifiers):
+                continue
+            if best is None or self._populations[row] > self._populations[best[0]]:
+                best = (row, fields)
+        if best is None:
+            return None
+
+        row, fields = best
+        country, admin1 = fields[_COUNTRY], fields[_ADMIN1]
+        is_us = country == "US"
+        if is_us:
+            region, country_name = US_STATE_NAMES.get(admin1), "United States"
+        else:
+            region = self._admin1_names.get(f"{country}.{admin1}")
+            country_name = self._country_names.get(country, country)
+        display = [fields[_NAME], region, country_name]
+        return {
+            "latitude": round(float(self._lats[row]), 5),
+            "longitude": round(float(self._lons[row]), 5),
+            "display_name": ", ".join(p for p in display if p),
+            "state_code": admin1 if is_us and admin1 in US_STATE_NAMES else None,
+            "location_type": "city",
+            "importance": self._populations[row],
+            "source": "gazetteer",
+        }
+
+    def _qualifies(self, qualifier: str, country: str, admin1: str) -> bool:
+        if country == "US":
+            if qualifier in _US_ALIASES:
+                return True
+            return _US_STATE_CODES.get(qualifier, qualifier.upper()) == admin1
+        names = (self._country_names.get(country), self._admin1_names.get(f"{country}.{admin1}"))
+        return qualifier.upper() in (country, admin1) or qualifier in {normalize(n) for n in names if n}
@@ -0,0 +1,240 @@
+"""Grid-aware cache for NWS forecasts.
+
+NWS forecasts are issued per 2.5 km grid cell (office, gridX, gridY), so two
+users a block apart want the same forecast. ``GridCache`` remembers which
+cell each ``/points`` lookup resolved to, indexes the cell outlines returned
+with each forecast in a coarse tile hash, and stores forecasts per cell (as
+parsed ``forecast_model.Forecast`` objects) so nearby coordinates share one
+upstream fetch and one parse.
+
+A point is only served from a cell whose outline contains it, or whose
+``/points`` lookup was for exactly that point: grid cells are irregular, so
+being near an earlier lookup says nothing about which cell a point is in.
+Cells are kept in an LRU capped at ``MAX_CELLS``, and parsed forecasts are
+released once their TTL has passed.
+"""
+from __future__ import annotations
+
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any
+
+# Index tile size in degrees (~5.5 km of latitude); each tile lists the
+# cells whose bounding box overlaps it.
+TILE_DEGREES = 0.05
+
+# /points answers are stable, forecasts are reissued roughly hourly.
+POINTS_TTL_SECONDS = 24 * 3600
+FORECAST_TTL_SECONDS = 15 * 60
+
+# Exact /points coordinates remembered per cell (rounded by the caller)
+MAX_ANCHORS_PER_CELL = 16
+MAX_CELLS = 5000
+
+GridKey = tuple[str, int, int]
+
+
+@dataclass
+class GridCell:
+    key: GridKey
+    forecast_url: str
+    location_name: str
+    resolved_at: float
+    hourly_url: str | None = None
+    polygon: list[tuple[float, float]] | None = None  # (lon, lat) ring
+    forecast: Any = None
+    forecast_at: float = 0.0
+    anchors: list[tuple[float, float]] = field(default_factory=list)  # (lat, lon)
+
+
+def _tile(lat: float, lon: float) -> tuple[int, int]:
+    return (math.floor(lat / TILE_DEGREES), math.floor(lon / TILE_DEGREES))
+
+
+def _contains(polygon: list[tuple[float, float]], lat: float, lon: float) -> bool:
+    """Ray-casting point-in-polygon test on a (lon, lat) ring."""
+    inside = False
+    j = len(polygon) - 1
+    for i in range(len(polygon)):
+        xi, yi = polygon[i]
+        xj, yj = polygon[j]
+        if (yi > lat) != (yj > lat) and lon < (xj - xi) * (lat - yi) / (yj - yi) + xi:
+            inside = not inside
+        j = i
+    return inside
+
+
+class GridCache:
+    """Maps coordinates to NWS grid cells and caches forecasts per cell."""
+
+    def __init__(
+        self,
+        points_ttl: float = POINTS_TTL_SECONDS,
+        forecast_ttl: float = FORECAST_TTL_SECONDS,
+        max_cells: int = MAX_CELLS,
+    ):
+        self.points_ttl = points_ttl
+        self.forecast_ttl = forecast_ttl
+        self.max_cells = max_cells
+        self._cells: OrderedDict[GridKey, GridCell] = OrderedDict()
+        self._polygon_index: dict[tuple[int, int], set[GridKey]] = {}
+        self._anchors: dict[tuple[float, float], GridKey] = {}
+        # Cells holding a forecast, oldest forecast first
+        self._forecasts: OrderedDict[GridKey, None] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, lat: float, lon: float, now: float | None = None) -> GridCell | None:
+        """Return the cached cell containing ``(lat, lon)``, if known and fresh."""
+        now = time.time() if now is None else now
+        self._expire_forecasts(now)
+        for key in self._polygon_index.get(_tile(lat, lon), ()):
+            cell = self._cells[key]
+            if _contains(cell.polygon, lat, lon):
+                return self._fresh(cell, now)
+        key = self._anchors.get((lat, lon))
+        return self._fresh(self._cells[key], now) if key is not None else None
+
+    def _fresh(self, cell: GridCell, now: float) -> GridCell | None:
+        if now - cell.resolved_at > self.points_ttl:
+            self._drop(cell.key)
+            return None
+        self._cells.move_to_end(cell.key)
+        return cell
+
+    def add_points(self, lat: float, lon: float, points_data: dict[str, Any], now: float | None = None) -> GridCell:
+        """Register a ``/points`` response for ``(lat, lon)``."""
+        now = time.time() if now is None else now
+        props = points_data["properties"]
+        key = (props.get("gridId") or props.get("cwa", ""), int(props.get("gridX", 0)), int(props.get("gridY", 0)))
+        relative = props.get("relativeLocation", {}).get("properties", {})
+        city, state = relative.get("city", ""), relative.get("state", "")
+        location_name = f"{city}, {state}" if city and state else f"{lat}, {lon}"
+
+        cell = self._cells.get(key)
+        if cell is None:
+            cell = GridCell(key, props["forecast"], location_name, now, props.get("forecastHourly"))
+            self._cells[key] = cell
+        else:
+            cell.forecast_url = props["forecast"]
+            cell.hourly_url = props.get("forecastHourly")
+            cell.resolved_at = now
+            self._cells.move_to_end(key)
+        self._add_anchor(cell, lat, lon)
+        self._evict()
+        return cell
+
+    def _add_anchor(self, cell: GridCell, lat: float, lon: float) -> None:
+        if self._anchors.get((lat, lon)) == cell.key or len(cell.anchors) >= MAX_ANCHORS_PER_CELL:
+            return
+        cell.anchors.append((lat, lon))
+        self._anchors[(lat, lon)] = cell.key
+
+    def fresh_forecast(self, cell: GridCell, now: float | None = None) -> Any:
+        now = time.time() if now is None else now
+        self._expire_forecasts(now)
+        if cell.forecast is not None:
+            self.hits += 1
+            return cell.forecast
+        self.misses += 1
+        return None
+
+    def _expire_forecasts(self, now: float) -> None:
+        """Release parsed forecasts older than the forecast TTL."""
+        while self._forecasts:
+            key = next(iter(self._forecasts))
+            cell = self._cells.get(key)
+            if cell is not None and now - cell.forecast_at <= self.forecast_ttl:
+                break
+            del self._forecasts[key]
+            if cell is not None:
+                cell.forecast = None
+
+    def store_forecast(
+        self, cell: GridCell, forecast: Any, geometry: dict[str, Any] | None, now: float | None = None
+    ) -> None:
+        """Cache a parsed forecast for ``cell`` and index the cell outline from its geometry."""
+        cell.forecast = forecast
+        cell.forecast_at = time.time() if now is None else now
+        self._forecasts[cell.key] = None
+        self._forecasts.move_to_end(cell.key)
+        geometry = geometry or {}
+        if cell.polygon is None and geometry.get("type") == "Polygon" and geometry.get("coordinates"):
+            cell.polygon = [(float(x), float(y)) for x, y in geometry["coordinates"][0]]
+            self._index_polygon(cell)
+
+    @staticmethod
+    def _polygon_tiles(polygon: list[tuple[float, float]]):
+        lons = [p[0] for p in polygon]
+        lats = [p[1] for p in polygon]
+        lo, hi = _tile(min(lats), min(lons)), _tile(max(lats), max(lons))
+        for t_lat in range(lo[0], hi[0] + 1):
+            for t_lon in range(lo[1], hi[1] + 1):
+                yield (t_lat, t_lon)
+
+    def _index_polygon(self, cell: GridCell) -> None:
+        for tile in self._polygon_tiles(cell.polygon):
+            self._polygon_index.setdefault(tile, set()).add(cell.key)
+
+    def export_cells(self, now: float | None = None) -> list[dict[str, Any]]:
+        """Fresh ``/points`` resolutions as JSON-friendly dicts (forecasts excluded)."""
+        now = time.time() if now is None else now
+        return [
+            {
+                "key": list(cell.key),
+                "forecast_url": cell.forecast_url,
+                "hourly_url": cell.hourly_url,
+                "location_name": cell.location_name,
+                "resolved_at": cell.resolved_at,
+                "polygon": cell.polygon,
+                "anchors": cell.anchors,
+            }
+            for cell in self._cells.values()
+            if now - cell.resolved_at <= self.points_ttl
+        ]
+
+    def import_cells(self, items: list[dict[str, Any]], now: float | None = None) -> int:
+        """Restore cells exported by ``export_cells``; returns how many were added."""
+        now = time.time() if now is None else now
+        added = 0
+        for item in items:
+            key = (str(item["key"][0]), int(item["key"][1]), int(item["key"][2]))
+            if key in self._cells or now - item["resolved_at"] > self.points_ttl:
+                continue
+            cell = GridCell(
+                key, item["forecast_url"], item["location_name"], item["resolved_at"], item.get("hourly_url"),
+                polygon=[(float(x), float(y)) for x, y in item["polygon"]] if item.get("polygon") else None,
+            )
+            self._cells[key] = cell
+            if cell.polygon:
+                self._index_polygon(cell)
+            for lat, lon in item.get("anchors") or []:
+                self._add_anchor(cell, float(lat), float(lon))
+            added += 1
+        self._evict()
+        return added
+
+    def _evict(self) -> None:
+        while len(self._cells) > self.max_cells:
+            self._drop(next(iter(self._cells)))
+
+    def _drop(self, key: GridKey) -> None:
+        cell = self._cells.pop(key, None)
+        if cell is None:
+            return
+        self._forecasts.pop(key, None)
+        for anchor in cell.anchors:
+            if self._anchors.get(anchor) == key:
+                del self._anchors[anchor]
+        if cell.polygon:
+            for tile in self._polygon_tiles(cell.polygon):
+                keys = self._polygon_index.get(tile)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self._polygon_index[tile]
+
+    def stats(self) -> dict[str, Any]:
+        return {"cells": len(self._cells), "forecast_hits": self.hits, "forecast_misses": self.misses}
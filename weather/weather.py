@@ -1,9 +1,14 @@
 from typing import Any
+import asyncio
 import json
+import threading
 
-import httpx
+from mcp.server.fastmcp import Context, FastMCP
 
-from mcp.server.fastmcp import FastMCP
+import cache_snapshot
+from forecast_model import Forecast
+from gazetteer import Gazetteer
+from grid_cache import GridCache
 
 # Initialize FastMCP server
 mcp = FastMCP("weather")
@@ -12,17 +17,39 @@ mcp = FastMCP("weather")
 NWS_API_BASE = "https://api.weather.gov"
 USER_AGENT = "weather-app/1.0"
 
+# Forecasts are cached per NWS grid cell so nearby coordinates share them
+grid_cache = GridCache()
+
+# Optional offline gazetteer (GAZETTEER_PATH); Nominatim answers the misses
+gazetteer = Gazetteer.from_env()
+
+# Nominatim answers, carried across restarts with the grid cells through
+# the WEATHER_CACHE_SNAPSHOT file
+geocode_cache = cache_snapshot.GeocodeCache()
+
+# Shared HTTP client, created on first request so server startup stays fast
+_http_client = None
+
+
+def get_http_client():
+    """Return the pooled httpx client, importing httpx on first use."""
+    global _http_client
+    if _http_client is None:
+        import httpx
+
+        _http_client = httpx.AsyncClient(timeout=30.0)
+    return _http_client
+
 
 async def make_nws_request(url: str) -> dict[str, Any] | None:
     """Make a request to the NWS API with proper error handling."""
     headers = {"User-Agent": USER_AGENT, "Accept": "application/geo+json"}
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(url, headers=headers, timeout=30.0)
-            response.raise_for_status()
-            return response.json()
-        except Exception:
-            return None
+    try:
+        response = await get_http_client().get(url, headers=headers)
+        response.raise_for_status()
+        return response.json()
+    except Exception:
+        return None
 
 
 async def make_nominatim_request(url: str) -> dict[str, Any] | None:
@@ -31,19 +58,46 @@ async def make_nominatim_request(url: str) -> dict[str, Any] | None:
         "User-Agent": USER_AGENT,
         "Accept": "application/json"
     }
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(url, headers=headers, timeout=30.0)
-            response.raise_for_status()
-            return response.json()
-        except Exception:
-            return None
+    try:
+        response = await get_http_client().get(url, headers=headers)
+        response.raise_for_status()
+        return response.json()
+    except Exception:
+        return None
+
+
+# get_forecast progress stages, reported in this order
+FORECAST_STAGES = ("location", "current", "periods")
+
+
+async def report_stage(ctx: Context | None, stage: str, data: dict) -> None:
+    """Send a partial result as an MCP progress notification.
+
+    The message carries the partial JSON so clients that pass a progress
+    token can render the location and current conditions before the full
+    result arrives. No-op for direct calls and clients without a token.
+    """
+    if ctx is None:
+        return
+    try:
+        await ctx.report_progress(
+            FORECAST_STAGES.index(stage) + 1,
+            len(FORECAST_STAGES),
+            json.dumps({"stage": stage, **data}),
+        )
+    except Exception:
+        pass
 
 
 def format_alert(feature: dict) -> dict:
     """Format an alert feature into a structured dict."""
     props = feature["properties"]
     return {
+        "id": props.get("id") or feature.get("id"),
+        "sent": props.get("sent"),
+        "expires": props.get("expires"),
+        # Alerts an update supersedes, so clients can replace rather than add
+        "replaces": [ref["identifier"] for ref in props.get("references") or [] if ref.get("identifier")],
         "event": props.get("event", "Unknown"),
         "area": props.get("areaDesc", "Unknown"),
         "severity": props.get("severity", "Unknown"),
@@ -61,8 +115,19 @@ async def geocode_location(location: str) -> str:
         location: The location name, city, address, or place (e.g., "San Francisco", "New York, NY", "Paris, France")
     
     Returns:
-        JSON string with latitude, longitude, and display name of the location
+        JSON string with latitude, longitude, display name and (for US locations) the state code
     """
+    if gazetteer is not None:
+        if not gazetteer.loaded:
+            # Building the index parses the whole cities file; keep the event loop free
+            await asyncio.to_thread(gazetteer.load)
+        local = gazetteer.lookup(location)
+        if local is not None:
+            return json.dumps(local)
+    cached = geocode_cache.get(location)
+    if cached is not None:
+        return json.dumps(cached)
+
     # OpenStreetMap Nominatim API endpoint
     base_url = "https://nominatim.openstreetmap.org/search"
     
@@ -87,14 +152,25 @@ async def geocode_location(location: str) -> str:
     
     # Get the first (best) result
     result = data[0]
-    
-    return json.dumps({
+
+    # US states come back as ISO 3166-2 codes, e.g. "US-CA"
+    address = result.get("address", {})
+    state_code = None
+    if address.get("country_code") == "us":
+        iso_code = address.get("ISO3166-2-lvl4", "")
+        if iso_code.startswith("US-"):
+            state_code = iso_code[3:]
+
+    geocoded = {
         "latitude": float(result["lat"]),
         "longitude": float(result["lon"]),
         "display_name": result.get("display_name", location),
+        "state_code": state_code,
         "location_type": result.get("type", "unknown"),
         "importance": result.get("importance", 0)
-    })
+    }
+    geocode_cache.put(location, geocoded)
+    return json.dumps(geocoded)
 
 
 @mcp.tool()
@@ -118,7 +194,7 @@ async def get_alerts(state: str) -> str:
 
 
 @mcp.tool()
-async def get_forecast(latitude: float, longitude: float) -> str:
+async def get_forecast(latitude: float, longitude: float, ctx: Context | None = None) -> str:
     """Get weather forecast for a location. Returns JSON data.
 
     Args:
@@ -128,88 +204,80 @@ async def get_forecast(latitude: float, longitude: float) -> str:
     # Round coordinates to 4 decimal places (NWS API is sensitive)
     lat = round(latitude, 4)
     lon = round(longitude, 4)
-    
-    # First get the forecast grid endpoint
-    points_url = f"{NWS_API_BASE}/points/{lat},{lon}"
-    points_data = await make_nws_request(points_url)
 
-    if not points_data:
-        return json.dumps({"error": "Unable to fetch forecast data for this location."})
+    # Reuse the grid cell (and its forecast) of an earlier nearby lookup
+    cell = grid_cache.lookup(lat, lon)
+    if cell is None:
+        # First get the forecast grid endpoint
+        points_url = f"{NWS_API_BASE}/points/{lat},{lon}"
+        points_data = await make_nws_request(points_url)
 
-    # Extract location information from points data
-    city = points_data["properties"].get("relativeLocation", {}).get("properties", {}).get("city", "")
-    state = points_data["properties"].get("relativeLocation", {}).get("properties", {}).get("state", "")
-    location_name = f"{city}, {state}" if city and state else f"{latitude}, {longitude}"
+        if not points_data:
+            return json.dumps({"error": "Unable to fetch forecast data for this location."})
 
-    # Get the forecast URL from the points response
-    forecast_url = points_data["properties"]["forecast"]
-    forecast_data = await make_nws_request(forecast_url)
+        cell = grid_cache.add_points(lat, lon, points_data)
 
-    if not forecast_data:
-        return json.dumps({"error": "Unable to fetch detailed forecast."})
+    location_name = cell.location_name
+    await report_stage(ctx, "location", {"location": location_name})
 
-    # Format the periods into structured JSON data
-    periods = forecast_data["properties"]["periods"]
-    
-    # Extract current weather from first period
-    current = periods[0] if periods else None
-    if not current:
+    forecast = grid_cache.fresh_forecast(cell)
+    if forecast is None:
+        # Daily periods, plus hourly ones for relative humidity. The current
+        # conditions are reported as soon as the daily forecast is in.
+        hourly = asyncio.create_task(make_nws_request(cell.hourly_url)) if cell.hourly_url else None
+        try:
+            forecast_data = await make_nws_request(cell.forecast_url)
+            if not forecast_data:
+                return json.dumps({"error": "Unable to fetch detailed forecast."})
+
+            forecast = Forecast.from_nws(forecast_data, location_name)
+            if forecast.current is None:
+                return json.dumps({"error": "No forecast data available."})
+            await report_stage(ctx, "current", forecast.current_summary())
+
+            if hourly is not None:
+                forecast.add_hourly(await hourly)
+        finally:
+            if hourly is not None and not hourly.done():
+                hourly.cancel()
+        grid_cache.store_forecast(cell, forecast, forecast_data.get("geometry"))
+    elif forecast.current is None:
         return json.dumps({"error": "No forecast data available."})
-    
-    # NWS provides temperature in Fahrenheit
-    temp_f = current["temperature"]
-    temp_c = round((temp_f - 32) * 5 / 9, 1)
-    
-    # Extract conditions from the detailed forecast
-    detailed = current["detailedForecast"].lower()
-    conditions = "clear"
-    if "rain" in detailed or "shower" in detailed:
-        conditions = "rain"
-    elif "cloud" in detailed or "overcast" in detailed:
-        conditions = "cloudy"
-    elif "snow" in detailed:
-        conditions = "snow"
-    elif "storm" in detailed or "thunder" in detailed:
-        conditions = "storm"
-    elif "sunny" in detailed or "clear" in detailed:
-        conditions = "clear"
-    
-    # Extract wind speed (just the number)
-    wind_speed = 0
-    wind_text = current["windSpeed"]
-    import re
-    wind_match = re.search(r'(\d+)', wind_text)
-    if wind_match:
-        wind_speed = int(wind_match.group(1))
-    
-    result = {
-        "temperature": temp_c, # Send Celsius as primary to match reference
-        "temperature_f": temp_f,
-        "conditions": conditions,
-        "humidity": 0,
-        "windSpeed": wind_speed,
-        "windSpeedText": wind_text,
-        "windDirection": current["windDirection"],
-        "feelsLike": temp_c,
-        "location": location_name,
-        "periods": [
-            {
-                "name": p["name"],
-                "temperature": p["temperature"],
-                "temperatureUnit": p["temperatureUnit"],
-                "windSpeed": p["windSpeed"],
-                "windDirection": p["windDirection"],
-                "forecast": p["detailedForecast"],
-                "conditions": conditions,
-            }
-            for p in periods[:5]
-        ]
-    }
-    
-    return json.dumps(result)
+    else:
+        await report_stage(ctx, "current", forecast.current_summary())
+
+    await report_stage(ctx, "periods", {"location": location_name, "periods": forecast.period_summaries()})
+
+    return forecast.to_json()
+
+
+@mcp.tool()
+async def cache_snapshot_control(action: str) -> str:
+    """Internal: "save" or "load" the warm-cache snapshot file. Not for agent use.
+
+    The backend calls this before swapping to a new server process so the
+    replacement starts with this process's geocode and grid cell caches.
+    """
+    path = cache_snapshot.snapshot_path()
+    if path is None:
+        return json.dumps({"error": "WEATHER_CACHE_SNAPSHOT is not set"})
+    if action == "save":
+        return json.dumps({"saved": cache_snapshot.save(path, geocode_cache, grid_cache)})
+    if action == "load":
+        return json.dumps({"loaded": cache_snapshot.load(path, geocode_cache, grid_cache)})
+    return json.dumps({"error": f"Unknown action: {action}"})
 
 
 def main():
+    # Start warm from the previous process's caches, if any
+    path = cache_snapshot.snapshot_path()
+    if path is not None:
+        cache_snapshot.load(path, geocode_cache, grid_cache)
+
+    # Open (or build) the gazetteer index before the first geocode needs it
+    if gazetteer is not None:
+        threading.Thread(target=gazetteer.load, name="gazetteer-load", daemon=True).start()
+
     # Initialize and run the server
     mcp.run(transport="stdio")
 